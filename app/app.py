@@ -5,10 +5,11 @@ ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 
 import streamlit as st
-import pandas as pd
 
-from src.hopsworks_client import get_hopsworks_project
-from src.batch_inference import run_batch_inference
+from src.batch_inference import MODELS, run_batch_inference
+from src.evaluate_predictions import WINDOWS, get_prediction_metrics
+from src.forecast_view import get_latest_forecast
+from src.jobs import get_job_manager
 
 # -----------------------------
 # Page config + styling
@@ -48,56 +49,64 @@ st.markdown(
 st.markdown("## 🌫️ AQI Predictor")
 st.markdown("<div class='muted'>📅 1 / 2 / 3 Day Forecast</div>", unsafe_allow_html=True)
 
-# -----------------------------
-# Hopsworks FS init
-# -----------------------------
-@st.cache_resource
-def get_fs():
-    project = get_hopsworks_project()
-    return project.get_feature_store()
-
-fs = get_fs()
-
 # -----------------------------
 # Controls
 # -----------------------------
 left, right = st.columns([1, 2], gap="large")
 
+# inference runs as a background job (one at a time for all users); the
+# status box polls it and reloads the page once the new forecast is stored
+INFERENCE_JOB = "batch_inference"
+jobs = get_job_manager()
+
+
+def job_status():
+    job = jobs.latest(INFERENCE_JOB)
+    if job is None:
+        return
+
+    if not job.done:
+        st.session_state["watching_job"] = job.id
+        st.progress(job.progress, text=f"⏳ {job.message} ({job.elapsed_s:.0f}s)")
+    elif job.status == "failed":
+        st.error(f"Prediction run failed: {job.error}")
+    else:
+        st.success(f"Last run finished in {job.elapsed_s:.0f}s")
+
+    # reload the whole page once per finished job so the cards show it
+    # (for every session that saw it running, not just the one that clicked)
+    if job.done and st.session_state.get("watching_job") == job.id:
+        st.session_state["watching_job"] = None
+        st.rerun()
+
+
 with left:
     st.markdown("<div class='section-title'>Controls</div>", unsafe_allow_html=True)
     if st.button("🚀 Run Prediction Now", use_container_width=True):
-        with st.spinner("Running batch inference..."):
-            run_batch_inference()
-        st.success("Done! Refreshing...")
-        st.rerun()
+        job = jobs.submit(INFERENCE_JOB, run_batch_inference)
+        st.session_state["watching_job"] = job.id
+
+    latest_job = jobs.latest(INFERENCE_JOB)
+    running = latest_job is not None and not latest_job.done
+    st.fragment(run_every=2 if running else None)(job_status)()
 
 with right:
     st.markdown("<div class='section-title'>Latest Results</div>", unsafe_allow_html=True)
     st.markdown("<div class='muted'>Shows the most recent inference run stored in Hopsworks.</div>", unsafe_allow_html=True)
 
 # -----------------------------
-# Read predictions from Hopsworks
+# Read the latest run (3 rows from the aqi_latest_forecast view, TTL-cached
+# process-wide; refreshed right away when a run from this app finishes)
 # -----------------------------
-pred_fg = fs.get_feature_group("aqi_predictions_v2", version=1)
-pred_df = pred_fg.read()
-
-# Parse times
-pred_df["event_time"] = pd.to_datetime(pred_df["event_time"], errors="coerce", utc=True)
-pred_df["source_feature_time"] = pd.to_datetime(pred_df["source_feature_time"], errors="coerce", utc=True)
-pred_df = pred_df.dropna(subset=["event_time", "source_feature_time"])
-
-# Pick the latest run (by source_feature_time)
-latest_run_time = pred_df["source_feature_time"].max()
-latest_df = pred_df[pred_df["source_feature_time"] == latest_run_time].copy()
-
-# Keep only next 3 horizons
-latest_df = latest_df.sort_values(["horizon"], ascending=[True]).head(3)
+latest_df = get_latest_forecast()
 
 # If empty, show help
 if latest_df.empty:
     st.warning("No predictions found yet. Click **Run Prediction Now**.")
     st.stop()
 
+latest_run_time = latest_df["source_feature_time"].max()
+
 # Model metadata (show on dashboard)
 # If different horizons use different models, show them all
 # -----------------------------
@@ -168,6 +177,30 @@ if show_table:
     show_df["event_time_local"] = show_df["event_time"].dt.tz_convert(local_tz)
     show_df = show_df[["event_time_local", "event_time", "horizon", "predicted_aqi", "model_name", "model_version", "source_feature_time"]]
     st.dataframe(show_df, width="stretch")
+
+# -----------------------------
+# Forecast accuracy (aqi_prediction_metrics, written by
+# python -m src.evaluate_predictions / the daily pipeline)
+# -----------------------------
+st.markdown("### 📊 Forecast Accuracy")
+metrics_df = get_prediction_metrics()
+metrics_df = metrics_df[metrics_df["model_name"].isin([name for name, _ in MODELS])]
+if metrics_df.empty:
+    st.caption("No scored forecasts yet (targets need a realized AQI day first).")
+else:
+    # newest version of each horizon model, MAE per trailing window pooled over
+    # locations: sum(n * mae) / sum(n), not a mean of per-location MAEs
+    newest = metrics_df.groupby("model_name")["model_version"].transform("max")
+    metrics_df = metrics_df[metrics_df["model_version"] == newest]
+    pooled = (
+        metrics_df.assign(abs_err=metrics_df["n"] * metrics_df["mae"])
+        .groupby(["horizon", "model_name", "model_version", "window"])[["abs_err", "n"]]
+        .sum()
+    )
+    mae = (pooled["abs_err"] / pooled["n"]).unstack("window")
+    mae = mae.reindex(columns=[w for w in WINDOWS if w in mae.columns]).round(2)
+    st.dataframe(mae.add_prefix("MAE ").reset_index(), width="stretch", hide_index=True)
+    st.caption(f"Evaluated against realized daily AQI up to {metrics_df['as_of'].max()}.")
 # -----------------------------
 # Footer
 # -----------------------------
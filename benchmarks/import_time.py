@@ -0,0 +1,144 @@
+# benchmarks/import_time.py
+"""
+Import-time benchmark for the pipeline entry points.
+
+    python -m benchmarks.import_time                  # measure + check
+    python -m benchmarks.import_time --save-baseline  # record the current numbers
+
+Each entry point is imported in a fresh interpreter under `python -X importtime`
+(best of --repeat runs). Two checks:
+  1) heavy libraries must not be pulled in by modules that don't use them
+     at import time (see HEAVY_MODULES / ALLOWED_HEAVY)
+  2) with a baseline present, cumulative import time must stay within
+     --tolerance of it (plus a small absolute slack for noisy runners)
+Exit code 1 on any failure.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BENCH_DIR = os.path.join("artifacts", "benchmarks")
+BASELINE_PATH = os.path.join(BENCH_DIR, "import_time_baseline.json")
+
+ENTRY_POINTS = [
+    "src.run_daily",
+    "src.feature_store_upload",
+    "src.training_dataset",
+    "src.train",
+    "src.tune",
+    "src.batch_inference",
+    "src.backfill",
+    "src.hopsworks_client",
+    "src.hourly_store",
+    "src.train_hourly",
+    "src.hourly_inference",
+    "src.evaluate_predictions",
+    "src.walk_forward",
+]
+
+# top-level packages that must only load on the code paths that use them
+HEAVY_MODULES = ["streamlit", "hopsworks", "hsfs", "hsml", "xgboost", "sklearn", "joblib"]
+
+# entry point -> heavy modules it is allowed to import eagerly (none today)
+ALLOWED_HEAVY: dict[str, set[str]] = {}
+
+DEFAULT_TOLERANCE = 0.25
+SLACK_US = 20_000
+
+
+def measure(module: str) -> dict:
+    """Cumulative import time (us) of `module` and the top-level packages it loaded."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.getcwd(),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = (p.strip() for p in line[len("import time:"):].split("|"))
+        cumulative[name.strip()] = int(cum)
+
+    return {
+        "cumulative_us": cumulative.get(module, 0),
+        "loaded": sorted({name.split(".")[0] for name in cumulative}),
+        "top": sorted(
+            ((n, us) for n, us in cumulative.items() if "." not in n and n != module),
+            key=lambda kv: -kv[1],
+        )[:5],
+    }
+
+
+def run(repeat: int = 3) -> dict:
+    results = {}
+    for module in ENTRY_POINTS:
+        runs = [measure(module) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r["cumulative_us"])
+        results[module] = best
+        top = ", ".join(f"{n} {us / 1000:.0f}ms" for n, us in best["top"])
+        print(f"  {module:<26} {best['cumulative_us'] / 1000:8.1f} ms   ({top})")
+    return results
+
+
+def check(results: dict, baseline: dict | None, tolerance: float) -> list[str]:
+    failures = []
+    for module, res in results.items():
+        heavy = set(res["loaded"]) & set(HEAVY_MODULES)
+        unexpected = heavy - ALLOWED_HEAVY.get(module, set())
+        if unexpected:
+            failures.append(f"{module} imports {sorted(unexpected)} at import time")
+
+        if baseline and module in baseline:
+            base_us = baseline[module]
+            limit = base_us * (1 + tolerance) + SLACK_US
+            if res["cumulative_us"] > limit:
+                failures.append(
+                    f"{module}: {res['cumulative_us'] / 1000:.1f} ms > "
+                    f"baseline {base_us / 1000:.1f} ms (+{tolerance:.0%})"
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure `python -X importtime` per entry point.")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per module (best is kept)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    print("⏱️ Import time (cumulative, best of", args.repeat, "runs):")
+    results = run(repeat=args.repeat)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({m: r["cumulative_us"] for m, r in results.items()}, f, indent=2)
+        print(f"✅ Saved baseline: {args.baseline}")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        print(f"No baseline at {args.baseline}; only checking for heavy imports.")
+
+    failures = check(results, baseline, args.tolerance)
+    if failures:
+        print("❌ Import-time regressions:")
+        for msg in failures:
+            print("  -", msg)
+        sys.exit(1)
+    print("✅ No import-time regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# benchmarks/pipeline.py
+"""
+Synthetic-data benchmarks for the pipeline stages.
+
+    python -m benchmarks.pipeline --locations 20 --years 2
+    python -m benchmarks.pipeline --locations 20 --years 2 --save-baseline
+
+Hourly payloads come from src/synthetic.py (no network, no feature store).
+Stages:
+  aggregate       hourly_to_daily_features, one call per location
+  aggregate_many  hourly_to_daily_features_many, all locations at once
+  labels          training_dataset.add_labels per location
+  train_fit       train._fit_models (serial, all model specs)
+  score           batch_inference.run_batch_inference (latest row, every horizon model)
+  score_many      batch_inference.run_batch_inference_many over one location's history
+
+The score stages run against a throwaway local store under
+artifacts/benchmarks/store (AQI_STORAGE_BACKEND=local is forced for this
+process), seeded with one location's daily features and the models fitted
+above, so they time the real read -> model cache -> predict -> insert path.
+
+Each stage is timed (best of --repeat) and then re-run once under tracemalloc
+for its peak Python-visible allocation. Results are compared against the
+baseline stored for the same scale; a stage slower or hungrier than
+baseline x (1 + tolerance) fails the run with exit code 1, and so does a
+missing baseline for the requested scale.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+BENCH_DIR = os.path.join("artifacts", "benchmarks")
+STORE_DIR = os.path.join(BENCH_DIR, "store")
+MODEL_CACHE_DIR = os.path.join(BENCH_DIR, "model_cache")
+
+# must be set before src.config / src.model_cache read them
+os.environ["AQI_STORAGE_BACKEND"] = "local"
+os.environ["AQI_LOCAL_STORE_DIR"] = STORE_DIR
+os.environ["AQI_MODEL_CACHE_DIR"] = MODEL_CACHE_DIR
+
+import pandas as pd
+
+from src import model_cache
+from src.batch_inference import MODELS, run_batch_inference, run_batch_inference_many
+from src.feature_store_upload import get_feature_group
+from src.schema import DAILY_COLUMNS, enforce_daily_schema
+from src.storage import get_feature_store, get_model_registry
+from src.feature_engineering import hourly_to_daily_features, hourly_to_daily_features_many
+from src.synthetic import synthetic_hourly, synthetic_locations
+from src.train import LABELS, _fit_models, _prep_df
+from src.training_dataset import add_labels
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "pipeline_baseline.json")
+RESULTS_PATH = os.path.join(BENCH_DIR, "pipeline_latest.json")
+
+DEFAULT_TIME_TOLERANCE = 0.30
+DEFAULT_MEMORY_TOLERANCE = 0.20
+MIN_SECONDS = 0.05  # stages faster than this are too noisy to fail on
+
+
+def _payloads(n_locations: int, years: float, seed: int) -> dict:
+    end = date(2025, 12, 31)
+    start = end - timedelta(days=int(round(365 * years)) - 1)
+    return {
+        f"{lat:.4f},{lon:.4f}": synthetic_hourly(lat, lon, start.isoformat(), end.isoformat())
+        for lat, lon in synthetic_locations(n_locations, seed=seed)
+    }
+
+
+def _training_frame(daily_by_loc: dict) -> pd.DataFrame:
+    frames = [add_labels(df.copy()) for df in daily_by_loc.values()]
+    return _prep_df(pd.concat(frames, ignore_index=True))
+
+
+def _seed_store(daily: pd.DataFrame, models: dict) -> tuple[str, str]:
+    """
+    Fresh local store holding `daily` (shifted so its last row is yesterday,
+    like a store the feature pipeline keeps current) and one version of each
+    scored model. Returns the stored date range.
+    """
+    import joblib
+
+    shutil.rmtree(STORE_DIR, ignore_errors=True)
+    shutil.rmtree(MODEL_CACHE_DIR, ignore_errors=True)
+    model_cache.clear_memory()
+
+    df = enforce_daily_schema(daily[DAILY_COLUMNS]).dropna()
+    yesterday = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=1)
+    df["event_time"] = df["event_time"] + (yesterday - df["event_time"].max())
+    get_feature_group(get_feature_store()).insert(df, write_options={"wait_for_job": True})
+
+    mr = get_model_registry()
+    os.makedirs(STORE_DIR, exist_ok=True)
+    for name, _ in MODELS:
+        path = os.path.join(STORE_DIR, f"{name}.joblib")
+        joblib.dump(models[name], path)
+        mr.python.create_model(name=name).save(path)
+
+    first, last = df["event_time"].min(), df["event_time"].max()
+    return first.date().isoformat(), last.date().isoformat()
+
+
+def _quiet(fn):
+    """Run `fn` with its progress prints swallowed."""
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return run
+
+
+def _measure(fn, repeat: int) -> dict:
+    """Best wall time over `repeat` runs, then one traced run for peak memory."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(min(times), 4), "peak_mb": round(peak / 2**20, 2)}
+
+
+def run(n_locations: int, years: float, repeat: int, cpus: int, seed: int = 0) -> dict:
+    print(f"Generating synthetic hourly data: {n_locations} location(s) x {years} year(s)")
+    payloads = _payloads(n_locations, years, seed)
+    n_hours = sum(len(h["time"]) for h in payloads.values())
+    print(f"  {n_hours:,} hourly rows")
+
+    daily_by_loc = {loc: hourly_to_daily_features(h) for loc, h in payloads.items()}
+    train_df = _training_frame(daily_by_loc)
+    X = train_df.drop(columns=["event_time"] + LABELS)
+    y = {lab: train_df[lab].astype(float) for lab in LABELS}
+    models, _ = _fit_models(X, y, parallel=False, cpus=cpus)
+    start, end = _seed_store(next(iter(daily_by_loc.values())), models)
+
+    stages = {
+        "aggregate": lambda: [hourly_to_daily_features(h) for h in payloads.values()],
+        "aggregate_many": lambda: hourly_to_daily_features_many(payloads),
+        "labels": lambda: [add_labels(df.copy()) for df in daily_by_loc.values()],
+        "train_fit": lambda: _fit_models(X, y, parallel=False, cpus=cpus),
+        "score": _quiet(lambda: run_batch_inference(wait=True)),
+        "score_many": _quiet(lambda: run_batch_inference_many(start_date=start, end_date=end, wait=True)),
+    }
+
+    results = {}
+    for name, fn in stages.items():
+        results[name] = _measure(fn, repeat=1 if name == "train_fit" else repeat)
+        print(f"  {name:<15} {results[name]['seconds']:9.4f}s  peak {results[name]['peak_mb']:9.2f} MB")
+    return {"hourly_rows": n_hours, "training_rows": len(train_df), "stages": results}
+
+
+def compare(current: dict, baseline: dict, time_tol: float, mem_tol: float) -> list[str]:
+    failures = []
+    for name, cur in current["stages"].items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            continue
+        if cur["seconds"] > max(base["seconds"] * (1 + time_tol), MIN_SECONDS):
+            failures.append(f"{name}: {cur['seconds']:.4f}s vs baseline {base['seconds']:.4f}s (+{time_tol:.0%})")
+        if cur["peak_mb"] > base["peak_mb"] * (1 + mem_tol) + 1.0:
+            failures.append(f"{name}: peak {cur['peak_mb']:.2f} MB vs baseline {base['peak_mb']:.2f} MB (+{mem_tol:.0%})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic data.")
+    parser.add_argument("--locations", type=int, default=10)
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cpus", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--time-tolerance", type=float, default=DEFAULT_TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    scale = f"{args.locations}x{args.years:g}y"
+    current = run(args.locations, args.years, repeat=args.repeat, cpus=args.cpus)
+
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    with open(RESULTS_PATH, "w") as f:
+        json.dump({scale: current}, f, indent=2)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines[scale] = current
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"✅ Saved baseline for {scale}: {args.baseline}")
+        return
+
+    if scale not in baselines:
+        print(f"❌ No baseline for {scale} in {args.baseline}; run with --save-baseline first.")
+        sys.exit(1)
+
+    failures = compare(current, baselines[scale], args.time_tolerance, args.memory_tolerance)
+    if failures:
+        print(f"❌ Regressions vs baseline ({scale}):")
+        for msg in failures:
+            print("  -", msg)
+        sys.exit(1)
+    print(f"✅ No regressions vs baseline ({scale})")
+
+
+if __name__ == "__main__":
+    main()
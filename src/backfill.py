@@ -0,0 +1,221 @@
+# src/backfill.py
+"""
+Historical backfill for daily_aqi_features_v2.
+
+    python -m src.backfill --start 2023-01-01 --end 2025-12-31
+
+The date range is split into chunks that are fetched in parallel (rate
+limited) and written as date-partitioned Parquet:
+
+    artifacts/backfill/data/event_date=YYYY-MM-DD/<location>.parquet
+
+Finished chunks are recorded in a checkpoint file, so a killed job resumes
+where it stopped. Once every chunk is on disk, the whole range is upserted
+into the feature group in ONE bulk insert.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+
+import pandas as pd
+
+from src.data_fetcher import DEFAULT_LAT, DEFAULT_LON, fetch_hourly, location_id
+from src.feature_engineering import hourly_to_daily_features_fast
+from src.schema import enforce_daily_schema
+
+ARTIFACT_DIR = "artifacts"
+BACKFILL_DIR = os.path.join(ARTIFACT_DIR, "backfill")
+DATA_DIR = os.path.join(BACKFILL_DIR, "data")
+CHECKPOINT_PATH = os.path.join(BACKFILL_DIR, "checkpoint.json")
+
+CHUNK_DAYS = 30
+MAX_WORKERS = 4
+MIN_REQUEST_INTERVAL_S = 0.5  # stay well below Open-Meteo's rate limits
+
+
+class _RateLimiter:
+    """Spaces out request starts across threads by at least `min_interval_s`."""
+
+    def __init__(self, min_interval_s: float):
+        self.min_interval_s = min_interval_s
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.min_interval_s
+        if start > now:
+            time.sleep(start - now)
+
+
+def _chunks(start_date: str, end_date: str, chunk_days: int) -> list[tuple[str, str]]:
+    if chunk_days <= 0:
+        raise ValueError(f"chunk_days must be positive, got {chunk_days}")
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    if end < start:
+        raise ValueError("end_date must be >= start_date")
+
+    out = []
+    cur = start
+    while cur <= end:
+        last = min(cur + timedelta(days=chunk_days - 1), end)
+        out.append((cur.isoformat(), last.isoformat()))
+        cur = last + timedelta(days=1)
+    return out
+
+
+def _chunk_key(loc: str, chunk: tuple[str, str]) -> str:
+    return f"{loc}|{chunk[0]}|{chunk[1]}"
+
+
+def _load_checkpoint(path: str = CHECKPOINT_PATH) -> set[str]:
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return set(json.load(f).get("done", []))
+
+
+def _save_checkpoint(done: set[str], path: str = CHECKPOINT_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"done": sorted(done)}, f, indent=2)
+    os.replace(tmp, path)  # atomic: a kill never leaves a half-written checkpoint
+
+
+def _partition_file(loc: str) -> str:
+    return loc.replace(",", "_") + ".parquet"
+
+
+def _write_partitions(daily: pd.DataFrame, loc: str, data_dir: str = DATA_DIR):
+    """One file per (event_date, location); rewriting a chunk is idempotent."""
+    fname = _partition_file(loc)
+    for day, part in daily.groupby(daily["event_time"].dt.strftime("%Y-%m-%d")):
+        part_dir = os.path.join(data_dir, f"event_date={day}")
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, fname)
+        part.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+
+
+def read_backfill(start_date: str, end_date: str, loc: str, data_dir: str = DATA_DIR) -> pd.DataFrame:
+    """
+    Backfilled daily rows of location `loc` with start_date <= event_date <= end_date.
+    Other locations' files in the same partitions are ignored: the feature
+    group is keyed on event_time alone, so mixing them would overwrite rows.
+    """
+    fname = _partition_file(loc)
+    files = []
+    for name in sorted(os.listdir(data_dir)) if os.path.isdir(data_dir) else []:
+        day = name.split("=", 1)[-1]
+        path = os.path.join(data_dir, name, fname)
+        if start_date <= day <= end_date and os.path.exists(path):
+            files.append(path)
+
+    if not files:
+        return pd.DataFrame()
+    # partitions written before the typed schema hold weekday names / float64
+    return enforce_daily_schema(pd.concat([pd.read_parquet(f) for f in files], ignore_index=True))
+
+
+def backfill(
+    start_date: str,
+    end_date: str,
+    lat: float = DEFAULT_LAT,
+    lon: float = DEFAULT_LON,
+    chunk_days: int = CHUNK_DAYS,
+    max_workers: int = MAX_WORKERS,
+    min_interval_s: float = MIN_REQUEST_INTERVAL_S,
+    upload: bool = True,
+):
+    loc = location_id(lat, lon)
+    chunks = _chunks(start_date, end_date, chunk_days)
+    done = _load_checkpoint()
+    pending = [c for c in chunks if _chunk_key(loc, c) not in done]
+
+    print(f"Backfill {start_date} -> {end_date}: {len(chunks)} chunks, {len(pending)} pending")
+
+    limiter = _RateLimiter(min_interval_s)
+
+    def _fetch(chunk):
+        limiter.wait()
+        hourly = fetch_hourly(lat, lon, chunk[0], chunk[1])
+        return chunk, hourly_to_daily_features_fast(hourly)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_fetch, c) for c in pending]
+        for i, fut in enumerate(as_completed(futures), start=1):
+            chunk, daily = fut.result()
+            _write_partitions(daily, loc)
+
+            # checkpoint only AFTER the chunk's partitions are on disk
+            done.add(_chunk_key(loc, chunk))
+            _save_checkpoint(done)
+            print(f"✅ Chunk {chunk[0]}..{chunk[1]} ({len(daily)} rows) [{i}/{len(pending)}]")
+
+    df = read_backfill(start_date, end_date, loc)
+    print(f"Backfilled rows on disk: {len(df)}")
+
+    if not upload or df.empty:
+        return df
+
+    from src.feature_store_upload import get_feature_group
+    from src.fg_writer import insert_with_retries
+    from src.storage import get_feature_store
+
+    df = df.dropna(subset=["event_time"]).sort_values("event_time").reset_index(drop=True)
+
+    fs = get_feature_store()
+    fg = get_feature_group(fs)
+
+    # ✅ one bulk upsert = one materialization job for the whole range
+    insert_with_retries(fg, df)
+    print(f"✅ Backfill upload completed: {len(df)} rows")
+    return df
+
+
+def _positive_int(value: str) -> int:
+    n = int(value)
+    if n <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill historical daily AQI features.")
+    parser.add_argument("--start", required=True, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", default=(date.today() - timedelta(days=1)).isoformat(),
+                        help="last day, YYYY-MM-DD (default: yesterday)")
+    parser.add_argument("--lat", type=float, default=DEFAULT_LAT)
+    parser.add_argument("--lon", type=float, default=DEFAULT_LON)
+    parser.add_argument("--chunk-days", type=_positive_int, default=CHUNK_DAYS)
+    parser.add_argument("--workers", type=_positive_int, default=MAX_WORKERS)
+    parser.add_argument("--min-interval", type=float, default=MIN_REQUEST_INTERVAL_S,
+                        help="minimum seconds between request starts")
+    parser.add_argument("--no-upload", action="store_true", help="only write local Parquet")
+    parser.add_argument("--reset", action="store_true", help="ignore the existing checkpoint")
+    args = parser.parse_args()
+
+    if args.reset and os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+
+    backfill(
+        start_date=args.start,
+        end_date=args.end,
+        lat=args.lat,
+        lon=args.lon,
+        chunk_days=args.chunk_days,
+        max_workers=args.workers,
+        min_interval_s=args.min_interval,
+        upload=not args.no_upload,
+    )
+
+
+if __name__ == "__main__":
+    main()
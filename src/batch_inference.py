@@ -1,27 +1,26 @@
 # src/batch_inference.py
-import time
-import requests
+import argparse
+import numpy as np
 import pandas as pd
-import joblib
 
-from src.hopsworks_client import get_hopsworks_project
-
-# ✅ MUST match what feature_store_upload writes to
-FEATURE_FG_NAME = "daily_aqi_features_v2"
-FEATURE_FG_VERSION = 1
+from src.fg_writer import get_writer
+from src.metrics import current, instrumented
+from src.forecast_view import get_latest_fg, publish
+from src.model_cache import load_latest_model
+from src.schema import FEATURE_FG_NAME, FEATURE_FG_VERSION, MODEL_FEATURES, enforce_daily_schema, feature_matrix
+from src.storage import get_feature_store, get_model_registry, read_feature_group
 
 PRED_FG_NAME = "aqi_predictions_v2"
 PRED_FG_VERSION = 1
 
-WEEKDAY_MAP = {
-    "Monday": 0, "Tuesday": 1, "Wednesday": 2, "Thursday": 3,
-    "Friday": 4, "Saturday": 5, "Sunday": 6,
-}
+# batch mode stores many runs / locations side by side, so it needs a wider
+# primary key than v1 (which is keyed on event_time alone)
+PRED_BATCH_FG_VERSION = 2
 
-BASE_FEATURES = [
-    "aqi_daily", "pm10_mean", "pm2_5_mean", "ozone_mean",
-    "no2_mean", "so2_mean", "co_mean", "weekday"
-]
+BASE_FEATURES = MODEL_FEATURES
+
+# inference only needs the newest row; read a short window, not the whole history
+LATEST_LOOKBACK_DAYS = 7
 
 MODELS = [
     ("aqi_xgb_day1", 1),
@@ -30,54 +29,38 @@ MODELS = [
 ]
 
 
-def _wait_for_materialization(fg, timeout_s: int = 15 * 60, poll_s: int = 15):
-    start = time.time()
-    while True:
-        try:
-            state = fg.materialization_job.get_state()
-        except Exception:
-            state = None
-
-        if state and str(state).upper() not in ("RUNNING", "STARTING"):
-            return
+def _read_latest_features(feat_fg, today_utc: pd.Timestamp) -> pd.DataFrame:
+    """
+    Last LATEST_LOOKBACK_DAYS of BASE_FEATURES + event_time, with the time
+    filter and column selection pushed down to the store. Falls back to a
+    full (still column-pruned) read only when the window is empty.
+    """
+    columns = ["event_time"] + BASE_FEATURES
+    start = today_utc - pd.Timedelta(days=LATEST_LOOKBACK_DAYS)
 
-        if time.time() - start > timeout_s:
-            raise TimeoutError("Materialization job did not finish within timeout.")
-        time.sleep(poll_s)
+    feat_df = read_feature_group(feat_fg, columns, start_time=start)
+    if feat_df.empty:
+        print(f"⚠️ No feature rows since {start}; reading full history.")
+        feat_df = read_feature_group(feat_fg, columns)
+    return feat_df
 
 
-def _safe_insert_with_wait(fg, df, max_attempts: int = 5):
-    for attempt in range(1, max_attempts + 1):
-        try:
-            fg.insert(df, write_options={"upsert": True})
-            _wait_for_materialization(fg)
-            return
-        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, OSError) as e:
-            print(f"⚠️ Insert failed (attempt {attempt}/{max_attempts}): {e}")
-            try:
-                _wait_for_materialization(fg)
-                print("✅ Insert likely succeeded (job finished after connection drop).")
-                return
-            except Exception:
-                if attempt == max_attempts:
-                    raise
-            time.sleep(min(2 ** attempt, 30))
+def _no_progress(fraction: float, message: str = ""):
+    pass
 
 
-def _load_latest_model(project, model_name: str):
-    mr = project.get_model_registry()
-    models = mr.get_models(model_name)
-    latest = max(models, key=lambda m: m.version)
+@instrumented("infer")
+def run_batch_inference(wait: bool = True, progress=None):
+    """
+    Score today's 1/2/3-day forecast from the newest feature row.
+    `progress(fraction, message)` is called as the run advances (used by
+    the dashboard's background job).
+    """
+    progress = progress or _no_progress
+    progress(0.05, "Connecting to the feature store")
 
-    model_dir = latest.download()
-    model_path = f"{model_dir}/{model_name}.joblib"
-    clf = joblib.load(model_path)
-    return clf, latest.version
-
-
-def run_batch_inference():
-    project = get_hopsworks_project()
-    fs = project.get_feature_store()
+    fs = get_feature_store()
+    mr = get_model_registry()
 
     # ✅ anchor date = today's UTC midnight
     today_local = pd.Timestamp.now().normalize()
@@ -88,9 +71,9 @@ def run_batch_inference():
     # -----------------------------
     # 1) Read latest features (FROM v2)
     # -----------------------------
+    progress(0.15, "Reading latest features")
     feat_fg = fs.get_feature_group(FEATURE_FG_NAME, version=FEATURE_FG_VERSION)
-    feat_df = feat_fg.read(read_options={"use_hive": False})
-
+    feat_df = _read_latest_features(feat_fg, today_utc)
 
     feat_df["event_time_dt"] = pd.to_datetime(feat_df["event_time"], errors="coerce", utc=True)
     feat_df = feat_df.dropna(subset=["event_time_dt"]).sort_values("event_time_dt")
@@ -108,14 +91,8 @@ def run_batch_inference():
     source_feature_time = today_utc  # show run anchor in dashboard
     print(f"✅ Latest feature row used: {latest['event_time_dt'].iloc[0]}\n")
 
-    # weekday -> int
-    latest["weekday"] = latest["weekday"].astype(str).str.strip().map(WEEKDAY_MAP)
-
-    # build X
-    X = latest[BASE_FEATURES].copy()
-    for c in X.columns:
-        X[c] = pd.to_numeric(X[c], errors="coerce")
-    X = X.dropna()
+    # build X (typed schema: float32 pollutants, int8 weekday)
+    X = enforce_daily_schema(latest[BASE_FEATURES]).dropna()
 
     if len(X) != 1:
         raise RuntimeError("Latest feature row has NaNs after numeric conversion.")
@@ -139,8 +116,9 @@ def run_batch_inference():
     #    (event_time = today_utc + (horizon-1))
     # -----------------------------
     rows = []
-    for model_name, horizon in MODELS:
-        clf, model_version = _load_latest_model(project, model_name)
+    for i, (model_name, horizon) in enumerate(MODELS):
+        progress(0.3 + 0.3 * i / len(MODELS), f"Predicting with {model_name}")
+        clf, model_version = load_latest_model(mr, model_name)
 
         # ✅ horizon mapping:
         # day1 -> today, day2 -> tomorrow, day3 -> day after
@@ -161,12 +139,153 @@ def run_batch_inference():
         )
 
     pred_df = pd.DataFrame(rows)
+    current().rows_out = len(pred_df)
+
+    # history + the small one-row-per-horizon view the dashboard reads
+    writer = get_writer()
+    handle = writer.submit(pred_fg, pred_df)
+    view_handle = writer.submit(get_latest_fg(fs), pred_df)
+    if wait:
+        progress(0.7, "Storing predictions (waiting for materialization)")
+        handle.result()
+        view_handle.result()
+        publish(pred_df)
+    else:
+        view_handle.add_done_callback(lambda f: f.exception() is None and publish(pred_df))
+    progress(1.0, "Done")
+
+    print("\n✅ Stored predictions:" if wait else "\n✅ Queued predictions:")
+    print(pred_df)
+    return handle
+
+
+def _predict_matrix(clf, X: np.ndarray) -> np.ndarray:
+    """Score a whole matrix at once; XGBoost models use in-place numpy prediction (no DMatrix)."""
+    get_booster = getattr(clf, "get_booster", None)
+    if get_booster is not None:
+        return np.asarray(get_booster().inplace_predict(X), dtype=np.float64)
+    return np.asarray(clf.predict(X), dtype=np.float64)
+
+
+def _feature_matrix(df: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+    """Rows with complete BASE_FEATURES and their float32 matrix."""
+    X = enforce_daily_schema(df[BASE_FEATURES])
+
+    ok = X.notna().all(axis=1).to_numpy()
+    dropped = int((~ok).sum())
+    if dropped:
+        print(f"⚠️ Skipping {dropped} feature row(s) with NaNs.")
+    return df[ok].reset_index(drop=True), feature_matrix(X[ok])
+
+
+@instrumented("infer", mode="many")
+def run_batch_inference_many(
+    start_date: str | None = None,
+    end_date: str | None = None,
+    locations: list[tuple[float, float]] | None = None,
+    days: int = 4,
+    wait: bool = True,
+):
+    """
+    Score many (location, date) rows in one run.
+
+    - `locations`: fetch live features for every location and score each
+      location's latest day.
+    - otherwise: score every stored feature row with event_time in
+      [start_date, end_date] (prediction backfill).
+
+    A feature row dated D anchors a run at D + 1 day, matching
+    run_batch_inference (horizon h -> event_time = anchor + h - 1).
+    Each horizon model runs ONCE over the whole matrix, and all rows go to
+    aqi_predictions_v2 v2 in a single insert.
+
+    Returns (pred_df, insert Future); with wait=False the insert is still
+    materializing when this returns.
+    """
+    from src.data_fetcher import DEFAULT_LAT, DEFAULT_LON, fetch_daily_features_many, location_id
+    fs = get_feature_store()
+    mr = get_model_registry()
 
-    _safe_insert_with_wait(pred_fg, pred_df)
+    # -----------------------------
+    # 1) One feature frame for all requested (location, date) rows
+    # -----------------------------
+    if locations:
+        feat_df = fetch_daily_features_many(locations, days=days)
+        feat_df["event_time"] = pd.to_datetime(feat_df["event_time"], errors="coerce", utc=True)
+        feat_df = feat_df.sort_values("event_time").groupby("location_id", sort=False, observed=True).tail(1)
+    else:
+        feat_fg = fs.get_feature_group(FEATURE_FG_NAME, version=FEATURE_FG_VERSION)
+        feat_df = read_feature_group(
+            feat_fg, ["event_time"] + BASE_FEATURES, start_time=start_date, end_time=end_date
+        )
+        feat_df["event_time"] = pd.to_datetime(feat_df["event_time"], errors="coerce", utc=True)
+        feat_df["location_id"] = location_id(DEFAULT_LAT, DEFAULT_LON)
 
-    print("\n✅ Stored predictions:")
-    print(pred_df)
+    feat_df, X = _feature_matrix(feat_df.dropna(subset=["event_time"]))
+    if len(X) == 0:
+        raise RuntimeError("No complete feature rows to score.")
+    print(f"✅ Scoring {len(X)} feature row(s) x {len(MODELS)} horizon(s)")
+    current().rows_in = len(X)
+
+    anchors = feat_df["event_time"].dt.normalize() + pd.Timedelta(days=1)
+
+    # -----------------------------
+    # 2) One predict call per horizon model over the whole matrix
+    # -----------------------------
+    frames = []
+    for model_name, horizon in MODELS:
+        clf, model_version = load_latest_model(mr, model_name)
+        preds = _predict_matrix(clf, X)
+
+        frames.append(
+            pd.DataFrame(
+                {
+                    "location_id": feat_df["location_id"].to_numpy(),
+                    "event_time": anchors + pd.Timedelta(days=(horizon - 1)),
+                    "horizon": np.full(len(X), horizon, dtype=np.int64),
+                    "predicted_aqi": preds,
+                    "source_feature_time": anchors,
+                    "model_name": model_name,
+                    "model_version": np.full(len(X), int(model_version), dtype=np.int64),
+                }
+            )
+        )
+    pred_df = pd.concat(frames, ignore_index=True)
+    current().rows_out = len(pred_df)
+
+    # -----------------------------
+    # 3) Single insert for every row
+    # -----------------------------
+    pred_fg = fs.get_or_create_feature_group(
+        name=PRED_FG_NAME,
+        version=PRED_BATCH_FG_VERSION,
+        primary_key=["location_id", "source_feature_time", "horizon"],
+        event_time="event_time",
+        description="Daily AQI 1/2/3-day predictions (multi-location / multi-date batch)",
+        online_enabled=False,
+    )
+    handle = get_writer().submit(pred_fg, pred_df)
+    if wait:
+        handle.result()
+
+    print(f"\n✅ {'Stored' if wait else 'Queued'} {len(pred_df)} predictions in {PRED_FG_NAME} v{PRED_BATCH_FG_VERSION}")
+    return pred_df, handle
+
+
+def _parse_locations(value: str) -> list[tuple[float, float]]:
+    """ "lat,lon;lat,lon" -> [(lat, lon), ...] """
+    return [tuple(float(x) for x in pair.split(",")) for pair in value.split(";") if pair.strip()]
 
 
 if __name__ == "__main__":
-    run_batch_inference()
+    parser = argparse.ArgumentParser(description="Run AQI batch inference.")
+    parser.add_argument("--start", help="batch mode: first feature date to score (YYYY-MM-DD)")
+    parser.add_argument("--end", help="batch mode: last feature date to score (YYYY-MM-DD)")
+    parser.add_argument("--locations", type=_parse_locations,
+                        help='batch mode: score live features for "lat,lon;lat,lon;..."')
+    args = parser.parse_args()
+
+    if args.start or args.end or args.locations:
+        run_batch_inference_many(start_date=args.start, end_date=args.end, locations=args.locations)
+    else:
+        run_batch_inference()
@@ -12,6 +12,7 @@ load_dotenv()
 @dataclass(frozen=True)
 class WeatherConfig:
     base_url: str
+    source: str = "open-meteo"   # "open-meteo" | "synthetic" (offline stub, src/synthetic.py)
 
 
 # -------------------------
@@ -24,6 +25,15 @@ class HopsworksConfig:
     api_host: str
 
 
+# -------------------------
+# Storage backend
+# -------------------------
+@dataclass(frozen=True)
+class StorageConfig:
+    backend: str      # "hopsworks" | "local"
+    local_dir: str
+
+
 # -------------------------
 # App Settings
 # -------------------------
@@ -32,6 +42,7 @@ class Settings:
     env: str
     weather: WeatherConfig = field(default_factory=WeatherConfig)
     hopsworks: HopsworksConfig = field(default_factory=HopsworksConfig)
+    storage: StorageConfig = field(default_factory=StorageConfig)
 
 
 # -------------------------
@@ -42,6 +53,7 @@ settings = Settings(
 
     weather=WeatherConfig(
         base_url=os.getenv("WEATHER_API_BASE_URL", ""),
+        source=os.getenv("AQI_DATA_SOURCE", "open-meteo").strip().lower(),
     ),
 
     hopsworks=HopsworksConfig(
@@ -49,4 +61,9 @@ settings = Settings(
         project=os.getenv("HOPSWORKS_PROJECT", ""),
         api_host=os.getenv("HOPSWORKS_API_HOST", ""),
     ),
+
+    storage=StorageConfig(
+        backend=os.getenv("AQI_STORAGE_BACKEND", "hopsworks").strip().lower(),
+        local_dir=os.getenv("AQI_LOCAL_STORE_DIR", os.path.join("artifacts", "local_store")),
+    ),
 )
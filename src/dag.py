@@ -0,0 +1,161 @@
+# src/dag.py
+"""
+Minimal in-process DAG runner for the pipeline.
+
+- all stages run in ONE process (imports and the Hopsworks session are shared)
+- independent stages run concurrently on a thread pool
+- a stage is skipped when its input fingerprint matches the last successful run
+- a per-stage timing report is written to artifacts/dag_report.json
+"""
+import hashlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable
+
+ARTIFACT_DIR = "artifacts"
+STATE_PATH = os.path.join(ARTIFACT_DIR, "dag_state.json")
+REPORT_PATH = os.path.join(ARTIFACT_DIR, "dag_report.json")
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[], object]
+    deps: list[str] = field(default_factory=list)
+    # cheap summary of the stage's inputs; None = always run
+    fingerprint: Callable[[], str] | None = None
+    # files/dirs the stage produces; a missing output forces a run
+    outputs: list[str] = field(default_factory=list)
+
+
+def hash_paths(*paths: str) -> str:
+    """Content hash of files (directories are walked in sorted order); missing paths hash as absent."""
+    h = hashlib.sha256()
+    for path in paths:
+        files = [path] if os.path.isfile(path) else sorted(
+            os.path.join(root, f) for root, _, names in os.walk(path) for f in names
+        )
+        if not files:
+            h.update(f"{path}:absent".encode())
+        for f in files:
+            h.update(f.encode())
+            with open(f, "rb") as fh:
+                for block in iter(lambda: fh.read(1 << 20), b""):
+                    h.update(block)
+    return h.hexdigest()
+
+
+def _load_state(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_state(state: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+class DagRunner:
+    def __init__(
+        self,
+        stages: list[Stage],
+        max_workers: int = 4,
+        force: bool = False,
+        state_path: str = STATE_PATH,
+        report_path: str = REPORT_PATH,
+    ):
+        self.stages = {s.name: s for s in stages}
+        for s in stages:
+            unknown = [d for d in s.deps if d not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {s.name} depends on unknown stage(s) {unknown}.")
+        self.max_workers = max_workers
+        self.force = force
+        self.state_path = state_path
+        self.report_path = report_path
+
+    def _execute(self, stage: Stage, state: dict, t_start: float) -> dict:
+        started = time.perf_counter()
+        entry = {"stage": stage.name, "start_s": round(started - t_start, 3)}
+
+        try:
+            fp = stage.fingerprint() if stage.fingerprint else None
+        except Exception as e:
+            print(f"⚠️ [{stage.name}] fingerprint failed ({e}); running stage.")
+            fp = None
+
+        prev = state.get(stage.name, {})
+        outputs_ok = all(os.path.exists(p) for p in stage.outputs)
+        if not self.force and fp is not None and outputs_ok and prev.get("fingerprint") == fp:
+            entry.update(status="skipped", duration_s=round(time.perf_counter() - started, 3), fingerprint=fp)
+            print(f"⏭️  [{stage.name}] inputs unchanged, skipping")
+            return entry
+
+        print(f"\n>>> [{stage.name}]")
+        try:
+            stage.fn()
+        except Exception as e:
+            traceback.print_exc()
+            entry.update(status="failed", error=repr(e))
+        else:
+            entry.update(status="ok", fingerprint=fp)
+        entry["duration_s"] = round(time.perf_counter() - started, 3)
+        return entry
+
+    def run(self) -> list[dict]:
+        state = _load_state(self.state_path)
+        remaining = dict(self.stages)
+        finished: dict[str, dict] = {}
+        running = {}
+        t_start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dag") as pool:
+            while remaining or running:
+                for name, stage in list(remaining.items()):
+                    dep_status = [finished[d]["status"] for d in stage.deps if d in finished]
+                    if any(s in ("failed", "blocked") for s in dep_status):
+                        finished[name] = {"stage": name, "status": "blocked", "duration_s": 0.0}
+                        del remaining[name]
+                        print(f"⛔ [{name}] blocked by failed upstream stage")
+                    elif len(dep_status) == len(stage.deps):
+                        running[pool.submit(self._execute, stage, state, t_start)] = name
+                        del remaining[name]
+
+                if not running:
+                    if remaining:
+                        raise ValueError(f"Dependency cycle among stages {sorted(remaining)}.")
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    entry = fut.result()
+                    finished[name] = entry
+                    if entry["status"] == "ok":
+                        state[name] = {"fingerprint": entry.get("fingerprint"), "finished_at": time.time()}
+                        _save_state(state, self.state_path)
+
+        report = [finished[name] for name in self.stages]
+        total = round(time.perf_counter() - t_start, 3)
+
+        os.makedirs(os.path.dirname(self.report_path) or ".", exist_ok=True)
+        with open(self.report_path, "w") as f:
+            json.dump({"total_s": total, "stages": report}, f, indent=2)
+
+        print("\n⏱️ Stage report:")
+        for e in report:
+            print(f"  {e['stage']:<14} {e['status']:<8} {e.get('duration_s', 0.0):8.2f}s")
+        print(f"  {'TOTAL':<14} {'':<8} {total:8.2f}s  ({self.report_path})")
+
+        failed = [e["stage"] for e in report if e["status"] in ("failed", "blocked")]
+        if failed:
+            raise RuntimeError(f"Pipeline stages did not complete: {failed}")
+        return report
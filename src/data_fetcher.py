@@ -1,10 +1,34 @@
 # src/data_fetcher.py
 import os
+import threading
+import numpy as np
 import requests
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from src import hourly_cache
+from src.metrics import stage
 from src.config import settings
-from src.feature_engineering import hourly_to_daily_features
+from src.feature_engineering import hourly_to_daily_features, hourly_to_daily_features_many
+
+HOURLY_VARS = "european_aqi,pm10,pm2_5,ozone,nitrogen_dioxide,sulphur_dioxide,carbon_monoxide"
+
+# Default location (Karachi) used by the single-location daily job
+DEFAULT_LAT = 24.8607
+DEFAULT_LON = 67.0011
+
+# Open-Meteo accepts comma-separated coordinate lists; keep URLs reasonably short
+MAX_COORDS_PER_REQUEST = 50
+MAX_WORKERS = 8
+
+_session = None
+_session_lock = threading.Lock()
+
+# "open-meteo" or "synthetic"; synthetic payloads never touch the on-disk cache
+_data_source = settings.weather.source
 
 
 def _date_range_from_days(days: int, end_yesterday: bool = True) -> tuple[str, str]:
@@ -42,27 +66,203 @@ def _air_quality_base_url() -> str:
     return "https://air-quality-api.open-meteo.com/v1"
 
 
-def fetch_air_quality_raw(lat: float, lon: float, start_date: str, end_date: str) -> dict:
-    base_url = _air_quality_base_url()
-    url = f"{base_url}/air-quality"
+def _get_session() -> requests.Session:
+    """
+    One pooled keep-alive session per process, shared by all fetch threads.
+    Retries transient 429/5xx responses with backoff.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=3,
+                    backoff_factor=1.0,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=("GET",),
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=MAX_WORKERS,
+                    pool_maxsize=MAX_WORKERS,
+                    max_retries=retry,
+                )
+                s = requests.Session()
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
+
+def set_data_source(source: str):
+    """Switch between the live API ("open-meteo") and the offline stub ("synthetic")."""
+    global _data_source
+    if source not in ("open-meteo", "synthetic"):
+        raise ValueError(f"Unknown data source {source!r}.")
+    _data_source = source
+
 
+def _use_cache(use_cache: bool) -> bool:
+    return use_cache and _data_source != "synthetic"
+
+
+def location_id(lat: float, lon: float) -> str:
+    """Stable string key for a coordinate pair."""
+    return f"{lat:.4f},{lon:.4f}"
+
+
+def _get_air_quality(params: dict):
+    n_locations = len(str(params["latitude"]).split(","))
+    with stage("fetch", source=_data_source) as m:
+        if _data_source == "synthetic":
+            from src.synthetic import air_quality_response
+
+            data = air_quality_response(params)
+        else:
+            url = f"{_air_quality_base_url()}/air-quality"
+            resp = _get_session().get(url, params=params, timeout=30)
+            m.bytes += len(resp.content)
+            # urllib3 retried 429/5xx responses inside the adapter
+            retries = getattr(getattr(resp.raw, "retries", None), "history", None)
+            m.retries += len(retries or ())
+            if resp.status_code != 200:
+                raise RuntimeError(f"Open-Meteo API error {resp.status_code}: {resp.text}")
+            data = resp.json()
+
+        payloads = data if isinstance(data, list) else [data]
+        m.rows_in = n_locations
+        m.rows_out = sum(len(p.get("hourly", {}).get("time", [])) for p in payloads)
+        return data
+
+
+def fetch_air_quality_raw(lat: float, lon: float, start_date: str, end_date: str) -> dict:
     params = {
         "latitude": lat,
         "longitude": lon,
-        "hourly": "european_aqi,pm10,pm2_5,ozone,nitrogen_dioxide,sulphur_dioxide,carbon_monoxide",
+        "hourly": HOURLY_VARS,
         "timezone": "auto",
         "start_date": start_date,
         "end_date": end_date,
     }
+    return _get_air_quality(params)
 
-    resp = requests.get(url, params=params, timeout=30)
-    if resp.status_code != 200:
-        raise RuntimeError(f"Open-Meteo API error {resp.status_code}: {resp.text}")
-    return resp.json()
 
+def fetch_air_quality_raw_multi(
+    locations: list[tuple[float, float]], start_date: str, end_date: str
+) -> list[dict]:
+    """
+    Fetch several coordinates in ONE request using Open-Meteo's
+    comma-separated latitude/longitude form. Returns one payload per location,
+    in the same order as `locations`.
+    """
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in locations),
+        "longitude": ",".join(str(lon) for _, lon in locations),
+        "hourly": HOURLY_VARS,
+        "timezone": "auto",
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+    data = _get_air_quality(params)
+
+    # a single coordinate comes back as an object, several as a list
+    payloads = data if isinstance(data, list) else [data]
+    if len(payloads) != len(locations):
+        raise RuntimeError(
+            f"Open-Meteo returned {len(payloads)} payloads for {len(locations)} locations."
+        )
+    return payloads
 
-def fetch_daily_features(lat: float, lon: float, days: int = 4):
+
+def fetch_hourly(lat: float, lon: float, start_date: str, end_date: str, use_cache: bool = True) -> dict:
+    """Hourly payload for one location, served from the on-disk cache where possible."""
+    if not _use_cache(use_cache):
+        return fetch_air_quality_raw(lat=lat, lon=lon, start_date=start_date, end_date=end_date)["hourly"]
+    return hourly_cache.get_hourly(
+        lat, lon, start_date, end_date, HOURLY_VARS, fetch_raw=fetch_air_quality_raw
+    )
+
+
+def fetch_daily_features(lat: float, lon: float, days: int = 4, use_cache: bool = True):
     start_date, end_date = _date_range_from_days(days, end_yesterday=True)
-    raw = fetch_air_quality_raw(lat=lat, lon=lon, start_date=start_date, end_date=end_date)
-    hourly = raw["hourly"]
-    return hourly_to_daily_features(hourly)
+    hourly = fetch_hourly(lat, lon, start_date, end_date, use_cache=use_cache)
+    with stage("aggregate") as m:
+        m.rows_in = len(hourly.get("time", []))
+        daily = hourly_to_daily_features(hourly)
+        m.rows_out = len(daily)
+    return daily
+
+
+def fetch_daily_features_many(
+    locations: list[tuple[float, float]],
+    days: int = 4,
+    max_workers: int = MAX_WORKERS,
+    coords_per_request: int = MAX_COORDS_PER_REQUEST,
+    use_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Daily features for many (lat, lon) pairs.
+
+    Locations are grouped into multi-coordinate requests which are fanned out
+    over a bounded thread pool sharing one pooled session. With `use_cache`,
+    each location only requests its missing / not-yet-final days and fully
+    cached locations make no request at all. Returns one frame with
+    `location_id`, `latitude`, `longitude` + the usual daily columns.
+    """
+    locations = [(float(lat), float(lon)) for lat, lon in locations]
+    if not locations:
+        raise ValueError("locations must not be empty")
+    use_cache = _use_cache(use_cache)
+
+    start_date, end_date = _date_range_from_days(days, end_yesterday=True)
+
+    # group locations by the date span they still need
+    hourly_by_loc = {}
+    pending = {}
+    for lat, lon in locations:
+        rng = (start_date, end_date)
+        if use_cache:
+            rng = hourly_cache.missing_range(lat, lon, start_date, end_date, HOURLY_VARS)
+            if rng is None:
+                hourly_by_loc[(lat, lon)] = hourly_cache.get_hourly(
+                    lat, lon, start_date, end_date, HOURLY_VARS, fetch_raw=fetch_air_quality_raw
+                )
+                continue
+        pending.setdefault(rng, []).append((lat, lon))
+
+    batches = [
+        (rng, locs[i:i + coords_per_request])
+        for rng, locs in pending.items()
+        for i in range(0, len(locs), coords_per_request)
+    ]
+
+    def _fetch(item):
+        rng, batch = item
+        return rng, batch, fetch_air_quality_raw_multi(batch, rng[0], rng[1])
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as pool:
+            for rng, batch, payloads in pool.map(_fetch, batches):
+                for (lat, lon), raw in zip(batch, payloads):
+                    hourly = raw["hourly"]
+                    if use_cache:
+                        hourly_cache.store_hourly(lat, lon, hourly, HOURLY_VARS)
+                        hourly = hourly_cache.merge_hourly(
+                            lat, lon, start_date, end_date, rng, hourly, HOURLY_VARS
+                        )
+                    hourly_by_loc[(lat, lon)] = hourly
+        if use_cache:
+            hourly_cache.maybe_evict()
+
+    # one vectorized aggregation pass over every location
+    coords = {location_id(lat, lon): (lat, lon) for lat, lon in locations}
+    with stage("aggregate", mode="many") as m:
+        m.rows_in = sum(len(h.get("time", [])) for h in hourly_by_loc.values())
+        daily = hourly_to_daily_features_many(
+            {loc: hourly_by_loc[latlon] for loc, latlon in coords.items()}
+        )
+        m.rows_out = len(daily)
+    latlon = np.array([coords[loc] for loc in daily["location_id"].cat.categories], dtype=np.float64).reshape(-1, 2)
+    codes = daily["location_id"].cat.codes.to_numpy()
+    daily.insert(1, "latitude", latlon[codes, 0])
+    daily.insert(2, "longitude", latlon[codes, 1])
+    return daily
@@ -1,8 +1,215 @@
-# in src/evaluate_predictions.py right before merge
+# src/evaluate_predictions.py
+"""
+Score stored forecasts against the realized daily AQI.
+
+    python -m src.evaluate_predictions             # every stored run
+    python -m src.evaluate_predictions --days 365  # targets of the last year only
+
+1. predictions (aqi_predictions_v2 v1 single-location runs + v2 batch
+   runs) are matched to the realized aqi_daily of their target day with ONE
+   merge_asof by location_id (latest daily row at or before the target
+   time, within MATCH_TOLERANCE)
+2. MAE / RMSE / bias per (location, horizon, model_name, model_version,
+   trailing window) come from ONE groupby: each row is assigned the
+   smallest window that contains it, per-group sums are taken once, and a
+   cumulative sum over the ordered windows gives every trailing window
+3. the result is upserted into aqi_prediction_metrics (one row per key and
+   window, latest evaluation), which the dashboard reads
+"""
+import argparse
+import os
+
+import numpy as np
 import pandas as pd
 
-pred["event_time"] = pd.to_datetime(pred["event_time"], utc=True, errors="coerce")
-feat["event_time"] = pd.to_datetime(feat["event_time"], utc=True, errors="coerce")
+from src.metrics import current, instrumented
+from src.schema import FEATURE_FG_NAME, FEATURE_FG_VERSION
+from src.storage import get_feature_store, read_feature_group
+from src.ttl_cache import TTLCache
+
+METRICS_FG_NAME = "aqi_prediction_metrics"
+METRICS_FG_VERSION = 1
+
+# trailing windows in days, counted back from the newest realized day (None = all history)
+WINDOWS = {"7d": 7, "30d": 30, "90d": 90, "all": None}
+
+# daily rows are stamped at midnight; anything within the same day matches
+MATCH_TOLERANCE = pd.Timedelta(hours=23)
+
+KEYS = ["location_id", "horizon", "model_name", "model_version"]
+PRED_COLUMNS = ["event_time", "horizon", "predicted_aqi", "source_feature_time", "model_name", "model_version"]
+METRIC_COLUMNS = KEYS + ["window", "n", "mae", "rmse", "bias", "as_of", "evaluated_at"]
+
+# metrics change once per evaluation run, so the dashboard can cache them longer
+CACHE_TTL_S = int(os.getenv("AQI_METRICS_TTL_S", "900"))
+
+
+def get_metrics_fg(fs):
+    return fs.get_or_create_feature_group(
+        name=METRICS_FG_NAME,
+        version=METRICS_FG_VERSION,
+        primary_key=KEYS + ["window"],
+        event_time="evaluated_at",
+        description="Forecast MAE/RMSE per horizon, model and trailing window (latest evaluation)",
+        online_enabled=False,
+    )
+
+
+def _try_read(fs, name: str, version: int, columns: list[str], start_time=None) -> pd.DataFrame:
+    """Column-pruned read; an empty frame if the feature group does not exist."""
+    try:
+        fg = fs.get_feature_group(name, version=version)
+    except Exception:
+        fg = None
+    if fg is None:
+        return pd.DataFrame(columns=columns)
+    return read_feature_group(fg, columns, start_time=start_time)
+
+
+def _default_location() -> str:
+    from src.data_fetcher import DEFAULT_LAT, DEFAULT_LON, location_id
+
+    return location_id(DEFAULT_LAT, DEFAULT_LON)
+
+
+# ---------- inputs ----------
+def load_predictions(fs, start_time=None) -> pd.DataFrame:
+    """Every stored prediction (single-run and batch tables), one row per run/horizon/model."""
+    from src.batch_inference import PRED_BATCH_FG_VERSION, PRED_FG_NAME, PRED_FG_VERSION
+
+    single = _try_read(fs, PRED_FG_NAME, PRED_FG_VERSION, PRED_COLUMNS, start_time)
+    single["location_id"] = _default_location()
+    batch = _try_read(fs, PRED_FG_NAME, PRED_BATCH_FG_VERSION, ["location_id"] + PRED_COLUMNS, start_time)
+
+    frames = [df for df in (single, batch) if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=["location_id"] + PRED_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+
+    for c in ("event_time", "source_feature_time"):
+        df[c] = pd.to_datetime(df[c], errors="coerce", utc=True)
+    df["predicted_aqi"] = pd.to_numeric(df["predicted_aqi"], errors="coerce")
+    df = df.dropna(subset=["event_time", "source_feature_time", "predicted_aqi"])
+    df["location_id"] = df["location_id"].astype(str)
+    df["horizon"] = df["horizon"].astype("int64")
+    df["model_version"] = df["model_version"].astype("int64")
+    return df.drop_duplicates(KEYS + ["source_feature_time"], keep="last").reset_index(drop=True)
+
+
+def load_actuals(fs, start_time=None) -> pd.DataFrame:
+    """Realized daily AQI (the daily feature group holds the default location)."""
+    df = _try_read(fs, FEATURE_FG_NAME, FEATURE_FG_VERSION, ["event_time", "aqi_daily"], start_time)
+    df["event_time"] = pd.to_datetime(df["event_time"], errors="coerce", utc=True)
+    df["aqi_daily"] = pd.to_numeric(df["aqi_daily"], errors="coerce")
+    df["location_id"] = _default_location()
+    return df.dropna().reset_index(drop=True)
+
+
+# ---------- evaluation ----------
+def match_actuals(pred: pd.DataFrame, actual: pd.DataFrame) -> pd.DataFrame:
+    """Predictions joined to the realized AQI of their target day; unrealized targets are dropped."""
+    actual = actual.rename(columns={"event_time": "actual_time", "aqi_daily": "actual_aqi"})
+    matched = pd.merge_asof(
+        pred.sort_values("event_time"),
+        actual[["location_id", "actual_time", "actual_aqi"]].sort_values("actual_time"),
+        left_on="event_time",
+        right_on="actual_time",
+        by="location_id",
+        direction="backward",
+        tolerance=MATCH_TOLERANCE,
+    )
+    return matched.dropna(subset=["actual_aqi"]).reset_index(drop=True)
+
+
+def score(matched: pd.DataFrame, as_of: pd.Timestamp | None = None) -> pd.DataFrame:
+    """MAE / RMSE / bias for every key and trailing window, from one grouped pass."""
+    as_of = as_of if as_of is not None else matched["event_time"].max()
+    names = list(WINDOWS)
+    bounds = np.array([np.inf if d is None else d for d in WINDOWS.values()], dtype=np.float64)
+
+    # smallest trailing window that contains the row (age 0 = the as_of day)
+    age_days = ((as_of - matched["event_time"]).dt.total_seconds() // 86400).to_numpy()
+    slot = np.searchsorted(bounds, age_days, side="right")
+
+    err = matched["predicted_aqi"].to_numpy(dtype=np.float64) - matched["actual_aqi"].to_numpy(dtype=np.float64)
+    sums = (
+        matched[KEYS]
+        .assign(slot=slot, n=1, abs_err=np.abs(err), sq_err=err ** 2, err=err)
+        .groupby(KEYS + ["slot"], sort=True)[["n", "abs_err", "sq_err", "err"]]
+        .sum()
+    )
+
+    # every key gets every slot, then window totals are running sums over the slots
+    full = pd.MultiIndex.from_tuples(
+        [(*key, s) for key in sums.index.droplevel("slot").unique() for s in range(len(names))],
+        names=KEYS + ["slot"],
+    )
+    totals = sums.reindex(full, fill_value=0).groupby(level=KEYS, sort=False).cumsum().reset_index()
+    totals = totals[totals["n"] > 0]
+
+    n = totals["n"].to_numpy(dtype=np.float64)
+    out = totals[KEYS].copy()
+    out["window"] = np.asarray(names)[totals["slot"].to_numpy()]
+    out["n"] = totals["n"].astype("int64")
+    out["mae"] = totals["abs_err"] / n
+    out["rmse"] = np.sqrt(totals["sq_err"] / n)
+    out["bias"] = totals["err"] / n
+    out["as_of"] = as_of
+    return out.reset_index(drop=True)
+
+
+@instrumented("evaluate", fg=METRICS_FG_NAME)
+def evaluate_predictions(days: int | None = None, write: bool = True) -> pd.DataFrame:
+    """Match every stored forecast to realized AQI, score it and store the metrics table."""
+    fs = get_feature_store()
+    start = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=days) if days else None
+
+    pred = load_predictions(fs, start_time=start)
+    actual = load_actuals(fs, start_time=start)
+    current().rows_in = len(pred)
+
+    matched = match_actuals(pred, actual)
+    print(f"Matched {len(matched)} of {len(pred)} prediction(s) to realized AQI")
+    if matched.empty:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+
+    metrics = score(matched)
+    metrics["evaluated_at"] = pd.Timestamp.now(tz="UTC")
+    current().rows_out = len(metrics)
+
+    if write:
+        from src.fg_writer import get_writer
+
+        get_writer().submit(get_metrics_fg(fs), metrics).result()
+        invalidate()
+        print(f"✅ Stored {len(metrics)} metric row(s) in {METRICS_FG_NAME} v{METRICS_FG_VERSION}")
+
+    print(metrics.drop(columns=["as_of", "evaluated_at"]).to_string(index=False))
+    return metrics
+
+
+# ---------- dashboard read path ----------
+def load_metrics(fs=None) -> pd.DataFrame:
+    fs = fs or get_feature_store()
+    return _try_read(fs, METRICS_FG_NAME, METRICS_FG_VERSION, METRIC_COLUMNS)
+
+
+_cache = TTLCache(load_metrics, CACHE_TTL_S)
+
+
+def get_prediction_metrics(ttl_s: float = CACHE_TTL_S) -> pd.DataFrame:
+    """Cached metrics table; re-read at most once per `ttl_s` per process."""
+    return _cache.get(ttl_s)
+
+
+def invalidate():
+    _cache.invalidate()
+
 
-df = pred.merge(feat, on="event_time", how="left").sort_values("event_time")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score stored forecasts against realized AQI.")
+    parser.add_argument("--days", type=int, default=None, help="only targets of the last N days")
+    parser.add_argument("--no-write", action="store_true", help="print the metrics without storing them")
+    args = parser.parse_args()
 
+    evaluate_predictions(days=args.days, write=not args.no_write)
@@ -1,7 +1,10 @@
 # src/feature_engineering.py
 
+import numpy as np
 import pandas as pd
 
+from src.schema import enforce_daily_schema
+
 
 def hourly_to_daily_features(hourly: dict) -> pd.DataFrame:
     """
@@ -11,7 +14,8 @@ def hourly_to_daily_features(hourly: dict) -> pd.DataFrame:
     - event_time = date
     - aqi_daily = daily MAX of hourly european_aqi (common AQI daily reporting)
     - pollutants = daily MEAN
-    - weekday = day name
+    - weekday = day of week, Monday=0
+    Columns are cast to the typed schema in src/schema.py.
     """
     df = pd.DataFrame({"event_time": pd.to_datetime(hourly["time"])})
 
@@ -53,6 +57,96 @@ def hourly_to_daily_features(hourly: dict) -> pd.DataFrame:
     )
 
     daily["event_time"] = pd.to_datetime(daily["event_time"])
-    daily["weekday"] = daily["event_time"].dt.day_name()
+    daily["weekday"] = daily["event_time"].dt.dayofweek
+
+    return enforce_daily_schema(daily)
+
+
+# hourly variable -> daily column, in output order (aqi first = daily MAX, rest = daily MEAN)
+_DAILY_COLUMNS = {
+    "european_aqi": "aqi_daily",
+    "pm10": "pm10_mean",
+    "pm2_5": "pm2_5_mean",
+    "ozone": "ozone_mean",
+    "nitrogen_dioxide": "no2_mean",
+    "sulphur_dioxide": "so2_mean",
+    "carbon_monoxide": "co_mean",
+}
+
+
+def _hourly_arrays(hourly: dict) -> tuple[np.ndarray, np.ndarray]:
+    """(day numbers since epoch, values[n_hours, n_vars]) with unparseable times dropped."""
+    try:
+        # Open-Meteo sends ISO "YYYY-MM-DDTHH:MM" strings, which NumPy parses directly
+        times = np.asarray(hourly["time"], dtype="datetime64[m]")
+    except ValueError:
+        times = pd.to_datetime(hourly["time"], errors="coerce").to_numpy()
+    n = len(times)
+
+    values = np.empty((n, len(_DAILY_COLUMNS)), dtype=np.float64)
+    for j, k in enumerate(_DAILY_COLUMNS):
+        raw = hourly.get(k)
+        values[:, j] = np.nan if raw is None else pd.to_numeric(raw, errors="coerce")
+
+    ok = ~np.isnat(times)
+    days = times[ok].astype("datetime64[D]").astype(np.int64)
+    return days, values[ok]
+
+
+def hourly_to_daily_features_many(hourly_by_location: dict) -> pd.DataFrame:
+    """
+    NumPy-backed equivalent of hourly_to_daily_features for many locations.
+
+    `hourly_by_location` maps location_id -> Open-Meteo hourly payload.
+    Hours are bucketed by integer day number and reduced per (location, day)
+    with np.fmax.reduceat / np.add.reduceat, so there is no per-row Python
+    `date` object and no object-keyed groupby. Output has a leading
+    (categorical) `location_id` column followed by the same columns as
+    hourly_to_daily_features, already in the typed schema.
+    """
+    loc_ids = list(hourly_by_location)
+    day_parts, value_parts, loc_parts = [], [], []
+    for code, loc in enumerate(loc_ids):
+        days, values = _hourly_arrays(hourly_by_location[loc])
+        day_parts.append(days)
+        value_parts.append(values)
+        loc_parts.append(np.full(len(days), code, dtype=np.int64))
+
+    columns = ["location_id", "event_time"] + list(_DAILY_COLUMNS.values()) + ["weekday"]
+    if not loc_ids or sum(len(d) for d in day_parts) == 0:
+        return enforce_daily_schema(pd.DataFrame(columns=columns))
+
+    days = np.concatenate(day_parts)
+    values = np.concatenate(value_parts)
+    locs = np.concatenate(loc_parts)
+
+    # sort by (location, day) so every group is one contiguous run
+    order = np.lexsort((days, locs))
+    days, values, locs = days[order], values[order], locs[order]
+
+    change = np.empty(len(days), dtype=bool)
+    change[0] = True
+    change[1:] = (days[1:] != days[:-1]) | (locs[1:] != locs[:-1])
+    starts = np.flatnonzero(change)
+
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=0)
+    counts = np.add.reduceat(valid, starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        daily = sums / counts  # all-NaN day -> NaN, like pandas mean
+
+    # daily MAX for AQI (fmax ignores NaN; an all-NaN day stays NaN)
+    daily[:, 0] = np.fmax.reduceat(values[:, 0], starts)
+
+    group_days = days[starts]
+    out = pd.DataFrame(daily.astype(np.float32), columns=list(_DAILY_COLUMNS.values()))
+    out.insert(0, "event_time", pd.DatetimeIndex(group_days.astype("datetime64[D]").astype("datetime64[ns]"), tz="UTC"))
+    out.insert(0, "location_id", pd.Categorical.from_codes(locs[starts], categories=pd.Index(loc_ids, dtype=object)))
+    # 1970-01-01 was a Thursday, so (days_since_epoch + 3) % 7 gives Monday=0
+    out["weekday"] = ((group_days + 3) % 7).astype(np.int8)
+    return out
+
 
-    return daily
+def hourly_to_daily_features_fast(hourly: dict) -> pd.DataFrame:
+    """Single-location NumPy path; same output as hourly_to_daily_features."""
+    return hourly_to_daily_features_many({"": hourly}).drop(columns="location_id")
@@ -0,0 +1,232 @@
+# src/fg_writer.py
+"""
+Shared feature-group write path.
+
+Every insert goes through one FeatureGroupWriter per process:
+  - inserts are queued and run on background threads, callers get a Future
+    and only block (`.result()`) when a downstream step needs the data
+  - frames submitted to the same feature group while a write is queued or
+    in flight are coalesced into ONE insert / materialization job
+  - materialization is polled with adaptive backoff instead of a fixed sleep
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+from src.metrics import stage
+from src.storage import reconnect
+
+MATERIALIZATION_TIMEOUT_S = 15 * 60
+POLL_INITIAL_S = 2.0
+POLL_MAX_S = 30.0
+POLL_BACKOFF = 1.5
+
+INSERT_MAX_ATTEMPTS = 5
+COALESCE_WINDOW_S = 0.2
+MAX_WRITER_THREADS = 4
+
+# job states that mean "still materializing"
+_ACTIVE_STATES = {
+    "RUNNING", "STARTING", "INITIALIZING", "ACCEPTED", "NEW", "NEW_SAVING",
+    "SUBMITTED", "STARTING_APP_MASTER", "GENERATING_SECURITY_MATERIAL",
+}
+
+
+def wait_for_materialization(
+    fg,
+    job=None,
+    timeout_s: float = MATERIALIZATION_TIMEOUT_S,
+    initial_poll_s: float = POLL_INITIAL_S,
+    max_poll_s: float = POLL_MAX_S,
+):
+    """
+    Wait until the materialization job finishes (or timeout).
+
+    `job` is the handle returned by `fg.insert`; polling it tracks exactly
+    this insert. Without one (e.g. after a connection drop) the feature
+    group's latest job is polled instead, starting only after
+    `initial_poll_s`: right after a non-blocking insert it may still be the
+    previous, already finished job. Polls quickly at first, then backs off,
+    so short jobs return fast and long ones don't hammer the API.
+    """
+    start = time.time()
+    poll_s = initial_poll_s
+    if job is None:
+        time.sleep(initial_poll_s)
+        poll_s = min(poll_s * POLL_BACKOFF, max_poll_s)
+
+    while True:
+        current_job = job if job is not None else fg.materialization_job
+        try:
+            state = current_job.get_state()
+        except Exception:
+            state = None
+
+        # if state is None, we still wait a bit and retry
+        if state and str(state).upper() not in _ACTIVE_STATES:
+            try:
+                final = current_job.get_final_state()
+                print(f"✅ Materialization job final state: {final}")
+            except Exception:
+                pass
+            return
+
+        elapsed = time.time() - start
+        if elapsed > timeout_s:
+            raise TimeoutError("Materialization job did not finish within timeout.")
+
+        time.sleep(min(poll_s, max(0.0, timeout_s - elapsed) + 0.01))
+        poll_s = min(poll_s * POLL_BACKOFF, max_poll_s)
+
+
+def _insert_job(result):
+    """The job handle from `fg.insert`'s (job, validation report) return value, if any."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    return result if hasattr(result, "get_state") else None
+
+
+def insert_with_retries(fg, df: pd.DataFrame, max_attempts: int = INSERT_MAX_ATTEMPTS):
+    """
+    Upsert `df` into `fg` and wait for materialization so the next step reads
+    the latest data. Connection drops are retried with backoff.
+    """
+    with stage("insert", fg=getattr(fg, "name", "unknown")) as m:
+        m.rows_in = m.rows_out = len(df)
+        m.bytes = int(df.memory_usage(index=False).sum())
+
+        for attempt in range(1, max_attempts + 1):
+            try:
+                result = fg.insert(df, write_options={"upsert": True, "wait_for_job": False})
+
+                # ✅ always wait so next step reads the latest data
+                wait_for_materialization(fg, job=_insert_job(result))
+                return
+
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, OSError) as e:
+                print(f"⚠️ Insert failed (attempt {attempt}/{max_attempts}): {e}")
+                m.retries += 1
+                reconnect()
+
+                # Connection often drops AFTER job starts.
+                # Wait for job completion; if it completes, treat as success.
+                try:
+                    wait_for_materialization(fg)
+                    print("✅ Insert likely succeeded (job finished after connection drop).")
+                    return
+                except Exception:
+                    if attempt == max_attempts:
+                        raise
+
+                wait_s = min(2 ** attempt, 30)
+                print(f"Retrying insert in {wait_s}s ...")
+                time.sleep(wait_s)
+
+
+def _fg_key(fg) -> tuple:
+    name = getattr(fg, "name", None)
+    return (name, getattr(fg, "version", None)) if name else (repr(fg), id(fg))
+
+
+def _coalesce(fg, frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """One frame per insert; later submissions win on duplicate primary keys."""
+    if len(frames) == 1:
+        return frames[0]
+
+    df = pd.concat(frames, ignore_index=True)
+    primary_key = [c for c in (getattr(fg, "primary_key", None) or []) if c in df.columns]
+    if primary_key:
+        df = df.drop_duplicates(subset=primary_key, keep="last").reset_index(drop=True)
+    return df
+
+
+class FeatureGroupWriter:
+    def __init__(self, max_threads: int = MAX_WRITER_THREADS, coalesce_window_s: float = COALESCE_WINDOW_S):
+        self.coalesce_window_s = coalesce_window_s
+        self._lock = threading.Lock()
+        self._pending: dict[tuple, tuple] = {}  # key -> (fg, [frames], [futures])
+        self._active: set[tuple] = set()        # keys with a drain task running
+        self._outstanding: set[Future] = set()
+        self._pool = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="fg-writer")
+
+    def submit(self, fg, df: pd.DataFrame) -> Future:
+        """Queue an upsert; the Future resolves to the inserted row count once materialized."""
+        fut = Future()
+        key = _fg_key(fg)
+        with self._lock:
+            _, frames, futures = self._pending.setdefault(key, (fg, [], []))
+            frames.append(df)
+            futures.append(fut)
+            self._outstanding.add(fut)
+            if key not in self._active:
+                self._active.add(key)
+                self._pool.submit(self._drain, key)
+        fut.add_done_callback(self._forget)
+        return fut
+
+    def _forget(self, fut: Future):
+        # failed inserts stay until a flush() has reported them
+        if fut.exception() is not None:
+            return
+        with self._lock:
+            self._outstanding.discard(fut)
+
+    def _drain(self, key: tuple):
+        # one drain task per feature group: while it inserts, new frames pile
+        # up in _pending and go out together in the next round
+        while True:
+            time.sleep(self.coalesce_window_s)
+            with self._lock:
+                entry = self._pending.pop(key, None)
+                if entry is None:
+                    self._active.discard(key)
+                    return
+
+            fg, frames, futures = entry
+            try:
+                df = _coalesce(fg, frames)
+                if len(frames) > 1:
+                    print(f"Coalesced {len(frames)} inserts into one ({len(df)} rows) for {key[0]}")
+                insert_with_retries(fg, df)
+            except BaseException as e:
+                for f in futures:
+                    f.set_exception(e)
+            else:
+                for f in futures:
+                    f.set_result(len(df))
+
+    def flush(self, timeout: float | None = None):
+        """
+        Block until every queued insert has materialized. Re-raises the first
+        failure, including inserts that failed before flush() was called.
+        """
+        with self._lock:
+            pending = list(self._outstanding)
+        first = None
+        for f in pending:
+            try:
+                f.result(timeout=timeout)
+            except BaseException as e:
+                if not f.done():
+                    raise  # flush timed out
+                first = e if first is None else first
+        with self._lock:
+            self._outstanding.difference_update(f for f in pending if f.done())
+        if first is not None:
+            raise first
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> FeatureGroupWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = FeatureGroupWriter()
+    return _writer
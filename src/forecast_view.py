@@ -0,0 +1,103 @@
+# src/forecast_view.py
+"""
+Read path for the dashboard's "latest forecast".
+
+  - batch inference upserts its rows into a tiny `aqi_latest_forecast` feature
+    group keyed on horizon, so it always holds exactly one row per horizon
+    and a page load reads 3 rows however many runs are stored
+  - if that view is missing or empty (older deployments), fall back to a
+    time-filtered read of the recent window of aqi_predictions_v2
+  - results are kept in a process-wide TTL cache (shared by all Streamlit
+    sessions); publish() replaces it as soon as a new run is stored
+"""
+import os
+
+import pandas as pd
+
+from src.storage import get_feature_store, read_feature_group
+from src.ttl_cache import TTLCache
+
+LATEST_FG_NAME = "aqi_latest_forecast"
+LATEST_FG_VERSION = 1
+
+# source of the fallback read (must match batch_inference)
+PRED_FG_NAME = "aqi_predictions_v2"
+PRED_FG_VERSION = 1
+
+CACHE_TTL_S = int(os.getenv("AQI_FORECAST_TTL_S", "300"))
+FALLBACK_LOOKBACK_DAYS = 7
+N_HORIZONS = 3
+
+COLUMNS = ["event_time", "horizon", "predicted_aqi", "source_feature_time", "model_name", "model_version"]
+
+def get_latest_fg(fs):
+    return fs.get_or_create_feature_group(
+        name=LATEST_FG_NAME,
+        version=LATEST_FG_VERSION,
+        primary_key=["horizon"],
+        event_time="event_time",
+        description="Latest AQI forecast, one row per horizon (materialized view of aqi_predictions_v2)",
+        online_enabled=False,
+    )
+
+
+def _latest_run(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows of the newest run (by source_feature_time), one per horizon, times parsed to UTC."""
+    df = df.copy()
+    df["event_time"] = pd.to_datetime(df["event_time"], errors="coerce", utc=True)
+    df["source_feature_time"] = pd.to_datetime(df["source_feature_time"], errors="coerce", utc=True)
+    df = df.dropna(subset=["event_time", "source_feature_time"])
+    if df.empty:
+        return df[COLUMNS]
+
+    latest = df[df["source_feature_time"] == df["source_feature_time"].max()]
+    return latest.sort_values("horizon").head(N_HORIZONS)[COLUMNS].reset_index(drop=True)
+
+
+def _read_view(fs) -> pd.DataFrame:
+    try:
+        fg = fs.get_feature_group(LATEST_FG_NAME, version=LATEST_FG_VERSION)
+    except Exception:
+        return pd.DataFrame(columns=COLUMNS)
+    if fg is None:
+        return pd.DataFrame(columns=COLUMNS)
+    return read_feature_group(fg, COLUMNS)
+
+
+def _read_recent_predictions(fs) -> pd.DataFrame:
+    fg = fs.get_feature_group(PRED_FG_NAME, version=PRED_FG_VERSION)
+    # a run's event_times are >= its source_feature_time, so this window
+    # always contains every row of any run anchored inside it
+    start = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=FALLBACK_LOOKBACK_DAYS)
+    df = read_feature_group(fg, COLUMNS, start_time=start)
+    if df.empty:
+        print(f"⚠️ No predictions since {start}; reading full history.")
+        df = read_feature_group(fg, COLUMNS)
+    return df
+
+
+def load_latest_forecast(fs=None) -> pd.DataFrame:
+    """Uncached: latest run from the view, else from the recent prediction window."""
+    fs = fs or get_feature_store()
+    df = _latest_run(_read_view(fs))
+    if df.empty:
+        print("⚠️ Latest-forecast view is empty; reading recent predictions instead.")
+        df = _latest_run(_read_recent_predictions(fs))
+    return df
+
+
+_cache = TTLCache(load_latest_forecast, CACHE_TTL_S)
+
+
+def get_latest_forecast(ttl_s: float = CACHE_TTL_S) -> pd.DataFrame:
+    """Cached latest forecast; re-read at most once per `ttl_s` per process."""
+    return _cache.get(ttl_s)
+
+
+def publish(pred_df: pd.DataFrame):
+    """Make a just-stored run visible immediately (no re-read)."""
+    _cache.put(_latest_run(pred_df))
+
+
+def invalidate():
+    _cache.invalidate()
@@ -1,6 +1,18 @@
 import os
-import streamlit as st
-import hopsworks
+import sys
+import threading
+import time
+import requests
+
+from src.metrics import add_retry
+
+# streamlit and hopsworks are heavy imports; they are loaded only on the code
+# paths that need them so CLI runs of the pipeline start fast
+
+# re-login after this many seconds even if nothing failed (API sessions expire)
+SESSION_TTL_S = int(os.getenv("HOPSWORKS_SESSION_TTL_S", "3600"))
+
+CONNECTION_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError)
 
 
 def _get_secret(name: str, default: str | None = None) -> str | None:
@@ -9,7 +21,11 @@ def _get_secret(name: str, default: str | None = None) -> str | None:
     if v:
         return v.strip()
 
-    # 2) streamlit secrets
+    # 2) streamlit secrets (only when running inside the app; never import
+    #    streamlit just to look for secrets from a CLI run)
+    st = sys.modules.get("streamlit")
+    if st is None:
+        return default
     try:
         if name in st.secrets:
             return str(st.secrets[name]).strip()
@@ -19,12 +35,7 @@ def _get_secret(name: str, default: str | None = None) -> str | None:
     return default
 
 
-def get_hopsworks_project():
-    # ---- FIX: Windows temp directory for certificates ----
-    os.makedirs("C:/temp", exist_ok=True)
-    os.environ["TMP"] = "C:/temp"
-    os.environ["TEMP"] = "C:/temp"
-
+def _login():
     api_key = _get_secret("HOPSWORKS_API_KEY")
     project_name = _get_secret("HOPSWORKS_PROJECT")
 
@@ -33,4 +44,79 @@ def get_hopsworks_project():
     if not project_name:
         raise RuntimeError("Missing HOPSWORKS_PROJECT.")
 
+    import hopsworks
+
     return hopsworks.login(project=project_name, api_key_value=api_key)
+
+
+class HopsworksSession:
+    """
+    One authenticated project / feature store / model registry per process.
+
+    Handles are created lazily, reused by every caller (thread-safe), and
+    rebuilt when older than `ttl_s` or after invalidate() (e.g. on a
+    connection error).
+    """
+
+    def __init__(self, ttl_s: float = SESSION_TTL_S):
+        self.ttl_s = ttl_s
+        self._lock = threading.RLock()
+        self._project = None
+        self._fs = None
+        self._mr = None
+        self._created = 0.0
+
+    def _ensure(self):
+        if self._project is None or time.monotonic() - self._created > self.ttl_s:
+            self._project = _login()
+            self._fs = None
+            self._mr = None
+            self._created = time.monotonic()
+
+    def project(self):
+        with self._lock:
+            self._ensure()
+            return self._project
+
+    def feature_store(self):
+        with self._lock:
+            self._ensure()
+            if self._fs is None:
+                self._fs = self._project.get_feature_store()
+            return self._fs
+
+    def model_registry(self):
+        with self._lock:
+            self._ensure()
+            if self._mr is None:
+                self._mr = self._project.get_model_registry()
+            return self._mr
+
+    def invalidate(self):
+        with self._lock:
+            self._project = None
+            self._fs = None
+            self._mr = None
+
+    def call(self, fn, retries: int = 1):
+        """Run fn(session); on a connection error, log in again and retry."""
+        for attempt in range(retries + 1):
+            try:
+                return fn(self)
+            except CONNECTION_ERRORS as e:
+                if attempt == retries:
+                    raise
+                print(f"⚠️ Hopsworks connection error ({e}); reconnecting.")
+                add_retry()
+                self.invalidate()
+
+
+_session = HopsworksSession()
+
+
+def get_session() -> HopsworksSession:
+    return _session
+
+
+def get_hopsworks_project():
+    return _session.project()
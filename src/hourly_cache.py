@@ -0,0 +1,261 @@
+# src/hourly_cache.py
+"""
+On-disk cache of Open-Meteo hourly payloads.
+
+Layout: <CACHE_DIR>/<varset>/<location>/<YYYY-MM-DD>.parquet (one file per day).
+Only FINAL days (older than FINAL_AFTER_DAYS) are stored; recent days are
+always re-fetched because Open-Meteo may still revise them.
+
+Safe to share between threads and processes: day files are written to a
+unique temp file and renamed into place under a per-location lock, and
+eviction runs at most every EVICT_EVERY_BYTES written / EVICT_INTERVAL_S,
+after the request has read what it needs, and never removes files used in
+the last EVICT_GRACE_S seconds.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+CACHE_DIR = os.getenv("AQI_CACHE_DIR", os.path.join("artifacts", "hourly_cache"))
+
+FINAL_AFTER_DAYS = 2
+MAX_CACHE_BYTES = int(os.getenv("AQI_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+MAX_AGE_DAYS = int(os.getenv("AQI_CACHE_MAX_AGE_DAYS", "365"))
+
+# eviction walks the whole cache, so it is throttled by bytes written and time
+EVICT_EVERY_BYTES = MAX_CACHE_BYTES // 16
+EVICT_INTERVAL_S = 60.0
+# files read or written this recently belong to in-flight requests
+EVICT_GRACE_S = 600.0
+
+_dir_locks: dict[str, threading.Lock] = {}
+_dir_locks_guard = threading.Lock()
+
+_evict_lock = threading.Lock()
+_evict_state = {"written": 0, "last": 0.0}
+
+
+def _varset_key(hourly_vars: str) -> str:
+    return hashlib.sha1(hourly_vars.encode("utf-8")).hexdigest()[:10]
+
+
+def _location_dir(lat: float, lon: float, hourly_vars: str) -> str:
+    loc = f"{lat:.4f}_{lon:.4f}"
+    return os.path.join(CACHE_DIR, _varset_key(hourly_vars), loc)
+
+
+def _day_path(lat: float, lon: float, hourly_vars: str, day: date) -> str:
+    return os.path.join(_location_dir(lat, lon, hourly_vars), f"{day.isoformat()}.parquet")
+
+
+def _dir_lock(loc_dir: str) -> threading.Lock:
+    with _dir_locks_guard:
+        return _dir_locks.setdefault(loc_dir, threading.Lock())
+
+
+def _days(start_date: str, end_date: str) -> list[date]:
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _is_final(day: date) -> bool:
+    return day <= date.today() - timedelta(days=FINAL_AFTER_DAYS)
+
+
+def missing_range(
+    lat: float, lon: float, start_date: str, end_date: str, hourly_vars: str
+) -> tuple[str, str] | None:
+    """
+    (first, last) day that must be fetched, or None if everything is cached.
+    Non-final days always count as missing. Cached days are touched so that
+    eviction leaves them alone until this request has read them.
+    """
+    now = time.time()
+    missing = []
+    for d in _days(start_date, end_date):
+        if not _is_final(d):
+            missing.append(d)
+            continue
+        try:
+            os.utime(_day_path(lat, lon, hourly_vars, d), (now, now))
+        except FileNotFoundError:
+            missing.append(d)
+    if not missing:
+        return None
+    return missing[0].isoformat(), missing[-1].isoformat()
+
+
+def load_days(
+    lat: float, lon: float, days: list[date], hourly_vars: str
+) -> pd.DataFrame:
+    frames = []
+    now = time.time()
+    for d in days:
+        path = _day_path(lat, lon, hourly_vars, d)
+        frames.append(pd.read_parquet(path))
+        os.utime(path, (now, now))  # LRU: mark as recently used
+    if not frames:
+        return pd.DataFrame(columns=["time"] + hourly_vars.split(","))
+    return pd.concat(frames, ignore_index=True)
+
+
+def store_hourly(lat: float, lon: float, hourly: dict, hourly_vars: str) -> int:
+    """Write every FINAL day of an hourly payload. Returns number of days stored."""
+    df = pd.DataFrame({"time": hourly["time"]})
+    for k in hourly_vars.split(","):
+        df[k] = pd.to_numeric(hourly.get(k, [None] * len(df)), errors="coerce")
+
+    loc_dir = _location_dir(lat, lon, hourly_vars)
+    os.makedirs(loc_dir, exist_ok=True)
+
+    stored = written = 0
+    with _dir_lock(loc_dir):
+        for day_str, part in df.groupby(df["time"].str.slice(0, 10), sort=False):
+            day = date.fromisoformat(day_str)
+            if not _is_final(day):
+                continue
+            fd, tmp = tempfile.mkstemp(dir=loc_dir, suffix=".parquet.tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    part.to_parquet(f, index=False, compression="zstd")
+                    written += f.tell()
+                os.replace(tmp, _day_path(lat, lon, hourly_vars, day))
+            except BaseException:
+                try:
+                    os.remove(tmp)
+                except FileNotFoundError:
+                    pass
+                raise
+            stored += 1
+
+    if written:
+        with _evict_lock:
+            _evict_state["written"] += written
+    return stored
+
+
+def get_hourly(
+    lat: float,
+    lon: float,
+    start_date: str,
+    end_date: str,
+    hourly_vars: str,
+    fetch_raw,
+) -> dict:
+    """
+    Cached equivalent of fetch_raw(lat, lon, start_date, end_date)["hourly"].
+    Only the missing / not-yet-final span is requested from the API.
+    """
+    rng = missing_range(lat, lon, start_date, end_date, hourly_vars)
+    if rng is None:
+        return _to_hourly(load_days(lat, lon, _days(start_date, end_date), hourly_vars))
+
+    fetched = fetch_raw(lat=lat, lon=lon, start_date=rng[0], end_date=rng[1])["hourly"]
+    store_hourly(lat, lon, fetched, hourly_vars)
+    merged = merge_hourly(lat, lon, start_date, end_date, rng, fetched, hourly_vars)
+    maybe_evict()
+    return merged
+
+
+def merge_hourly(
+    lat: float,
+    lon: float,
+    start_date: str,
+    end_date: str,
+    fetched_range: tuple[str, str],
+    fetched: dict,
+    hourly_vars: str,
+) -> dict:
+    """Combine cached days outside `fetched_range` with a freshly fetched payload."""
+    lo, hi = date.fromisoformat(fetched_range[0]), date.fromisoformat(fetched_range[1])
+    cached_days = [d for d in _days(start_date, end_date) if d < lo or d > hi]
+    if not cached_days:
+        return fetched
+
+    cached = load_days(lat, lon, cached_days, hourly_vars)
+    fresh = pd.DataFrame({"time": fetched["time"]})
+    for k in hourly_vars.split(","):
+        fresh[k] = pd.to_numeric(fetched.get(k, [None] * len(fresh)), errors="coerce")
+
+    df = pd.concat([cached, fresh], ignore_index=True).sort_values("time", kind="stable")
+    return _to_hourly(df)
+
+
+def _to_hourly(df: pd.DataFrame) -> dict:
+    return {c: df[c].tolist() for c in df.columns}
+
+
+def maybe_evict() -> int:
+    """
+    Run `evict` once EVICT_EVERY_BYTES were stored or EVICT_INTERVAL_S passed
+    since the last run (and something was stored). Call it after the
+    request's cached days have been read. Returns number of files removed.
+    """
+    if not _evict_lock.acquire(blocking=False):
+        return 0  # another thread is evicting
+    try:
+        written, last = _evict_state["written"], _evict_state["last"]
+        now = time.monotonic()
+        if not written or (written < EVICT_EVERY_BYTES and now - last < EVICT_INTERVAL_S):
+            return 0
+        _evict_state["written"], _evict_state["last"] = 0, now
+    finally:
+        _evict_lock.release()
+    return evict()
+
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False  # evicted concurrently
+
+
+def evict(
+    max_bytes: int = MAX_CACHE_BYTES, max_age_days: int = MAX_AGE_DAYS, grace_s: float = EVICT_GRACE_S
+) -> int:
+    """
+    Drop files not used for `max_age_days`, then least-recently-used files
+    until the cache fits in `max_bytes`. Files used in the last `grace_s`
+    seconds are kept; orphaned temp files older than that are removed.
+    Tolerates files vanishing under a concurrent eviction. Returns number
+    of files removed.
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+
+    now = time.time()
+    entries, removed = [], 0
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if name.endswith(".parquet.tmp"):
+                # left behind by a crashed writer
+                if st.st_mtime < now - grace_s:
+                    removed += _remove(path)
+            elif name.endswith(".parquet"):
+                entries.append((st.st_mtime, st.st_size, path))
+
+    cutoff = now - max_age_days * 86400
+    entries.sort()  # oldest first
+    total = sum(size for _, size, _ in entries)
+
+    for mtime, size, path in entries:
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        if mtime >= now - grace_s:
+            break  # everything left is in use by a recent request
+        if _remove(path):
+            removed += 1
+        total -= size
+    return removed
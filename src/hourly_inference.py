@@ -0,0 +1,101 @@
+# src/hourly_inference.py
+"""
+Hourly AQI forecast: for every location in the hourly store, score the
+window ending at its last observed hour with each aqi_xgb_hour{h} model.
+
+Rows go to aqi_hourly_predictions, next to the daily aqi_predictions_v2:
+
+    location_id, source_time (last observed hour), event_time (= source_time + h),
+    horizon_h, predicted_aqi, model_name, model_version
+
+Hours are the location's wall-clock hours from Open-Meteo, stored with a
+UTC label like the daily rows.
+"""
+import numpy as np
+import pandas as pd
+
+from src.batch_inference import _predict_matrix
+from src.fg_writer import get_writer
+from src.hourly_store import AQI_VAR, VARS, read_tail, stored_locations
+from src.metrics import current, instrumented
+from src.model_cache import load_latest_model
+from src.storage import get_feature_store, get_model_registry
+from src.train_hourly import HOURLY_MODELS, WINDOW_HOURS, hourly_grid, window_features
+
+HOURLY_PRED_FG_NAME = "aqi_hourly_predictions"
+HOURLY_PRED_FG_VERSION = 1
+
+# mapped hours per location: the lag window plus slack for a few missing hours
+TAIL_HOURS = WINDOW_HOURS + 24
+
+
+def get_hourly_pred_fg(fs):
+    return fs.get_or_create_feature_group(
+        name=HOURLY_PRED_FG_NAME,
+        version=HOURLY_PRED_FG_VERSION,
+        primary_key=["location_id", "source_time", "horizon_h"],
+        event_time="event_time",
+        description="Hourly AQI predictions (1-48h ahead)",
+    )
+
+
+def latest_windows() -> tuple[list[str], np.ndarray, np.ndarray]:
+    """(location_ids, anchor hours, feature matrix) for each location's last observed hour."""
+    aqi = VARS.index(AQI_VAR)
+    locs, anchors, rows = [], [], []
+    for loc in stored_locations():
+        grid_t, grid = hourly_grid(*read_tail(loc, TAIL_HOURS))
+        observed = np.flatnonzero(~np.isnan(grid[:, aqi]))
+        if len(observed) == 0 or observed[-1] < WINDOW_HOURS - 1:
+            print(f"⚠️ Skipping {loc}: fewer than {WINDOW_HOURS} stored hours.")
+            continue
+        last = observed[-1:]
+        locs.append(loc)
+        anchors.append(grid_t[last][0])
+        rows.append(window_features(grid_t, grid, last))
+
+    X = np.vstack(rows) if rows else np.empty((0, 0), dtype=np.float32)
+    return locs, np.array(anchors, dtype="datetime64[h]"), X
+
+
+@instrumented("hourly_infer")
+def run_hourly_inference(wait: bool = True):
+    """Score every stored location with every hourly horizon model in one insert."""
+    locs, anchors, X = latest_windows()
+    if len(X) == 0:
+        raise RuntimeError("No location has enough hourly data. Run: python -m src.hourly_store")
+    current().rows_in = len(X)
+
+    fs = get_feature_store()
+    mr = get_model_registry()
+    source_time = pd.to_datetime(anchors).tz_localize("UTC")
+
+    frames = []
+    for model_name, horizon in HOURLY_MODELS:
+        clf, model_version = load_latest_model(mr, model_name)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "location_id": locs,
+                    "source_time": source_time,
+                    "event_time": source_time + pd.Timedelta(hours=horizon),
+                    "horizon_h": int(horizon),
+                    "predicted_aqi": _predict_matrix(clf, X),
+                    "model_name": model_name,
+                    "model_version": int(model_version),
+                }
+            )
+        )
+    pred_df = pd.concat(frames, ignore_index=True)
+    current().rows_out = len(pred_df)
+
+    handle = get_writer().submit(get_hourly_pred_fg(fs), pred_df)
+    if wait:
+        handle.result()
+    print(f"\n✅ {'Stored' if wait else 'Queued'} {len(pred_df)} hourly predictions in {HOURLY_PRED_FG_NAME} v{HOURLY_PRED_FG_VERSION}")
+    print(pred_df.sort_values(["location_id", "horizon_h"]).head(len(HOURLY_MODELS)))
+    return handle
+
+
+if __name__ == "__main__":
+    run_hourly_inference()
@@ -0,0 +1,199 @@
+# src/hourly_store.py
+"""
+Raw hourly Open-Meteo series kept for the hourly forecasting mode.
+
+Layout: <HOURLY_STORE_DIR>/<location>/<YYYY-MM>.arrow, one uncompressed
+Arrow IPC file per location and month:
+
+    time          timestamp[s]  location wall-clock hour (as Open-Meteo returns it)
+    european_aqi  float32       ... one column per HOURLY_VARS entry, NaN = missing
+
+Files are read through memory maps, so the numeric columns come back as
+numpy views of the page cache instead of parsed copies. Writes go to a temp
+file + os.replace, so a reader that still has an old file mapped is unaffected.
+
+Ingestion is fed from data_fetcher.fetch_hourly, i.e. from the on-disk
+hourly cache: only recent / missing days hit the API.
+
+    python -m src.hourly_store --days 365    # backfill the default location
+"""
+import argparse
+import hashlib
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.data_fetcher import DEFAULT_LAT, DEFAULT_LON, HOURLY_VARS, fetch_hourly, location_id
+from src.metrics import current, instrumented
+
+HOURLY_STORE_DIR = os.getenv("AQI_HOURLY_STORE_DIR", os.path.join("artifacts", "hourly_store"))
+
+VARS = HOURLY_VARS.split(",")
+AQI_VAR = "european_aqi"
+
+# re-ingest the last few days on every run; Open-Meteo may still revise them
+INGEST_DAYS = 3
+# history fetched for a location that has nothing stored yet
+SEED_DAYS = 90
+
+SCHEMA = pa.schema([("time", pa.timestamp("s"))] + [(v, pa.float32()) for v in VARS])
+
+
+def _location_dir(loc: str, root: str = HOURLY_STORE_DIR) -> str:
+    return os.path.join(root, loc.replace(",", "_"))
+
+
+def _month_path(loc: str, month: str, root: str = HOURLY_STORE_DIR) -> str:
+    return os.path.join(_location_dir(loc, root), f"{month}.arrow")
+
+
+def stored_locations(root: str = HOURLY_STORE_DIR) -> list[str]:
+    """location_ids with at least one stored month."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(d.replace("_", ",") for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+
+
+def _to_frame(hourly: dict) -> pd.DataFrame:
+    """Open-Meteo `hourly` payload -> typed frame (time + float32 columns)."""
+    df = pd.DataFrame({"time": pd.to_datetime(hourly["time"], errors="coerce").astype("datetime64[s]")})
+    for v in VARS:
+        df[v] = pd.to_numeric(pd.Series(hourly.get(v, [None] * len(df))), errors="coerce").astype("float32")
+    return df.dropna(subset=["time"])
+
+
+def _read_table(path: str) -> pa.Table:
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def _write_table(df: pd.DataFrame, path: str):
+    # pa.array on numpy keeps NaN as a float value; Table.from_pandas would
+    # turn it into a null and every read of the column would become a copy
+    arrays = [pa.array(df["time"].to_numpy(dtype="datetime64[s]"), type=pa.timestamp("s"))]
+    arrays += [pa.array(df[v].to_numpy(dtype=np.float32), type=pa.float32()) for v in VARS]
+    table = pa.Table.from_arrays(arrays, schema=SCHEMA)
+    tmp = f"{path}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, SCHEMA) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def write_hourly(loc: str, hourly: dict, root: str = HOURLY_STORE_DIR) -> int:
+    """Upsert an hourly payload into the month partitions of `loc`. Returns hours written."""
+    df = _to_frame(hourly)
+    if df.empty:
+        return 0
+    os.makedirs(_location_dir(loc, root), exist_ok=True)
+
+    for month, part in df.groupby(df["time"].dt.strftime("%Y-%m"), sort=True):
+        path = _month_path(loc, month, root)
+        if os.path.exists(path):
+            old = _read_table(path).to_pandas()
+            part = pd.concat([old, part], ignore_index=True)
+        part = part.drop_duplicates("time", keep="last").sort_values("time")
+        _write_table(part, path)
+    return len(df)
+
+
+def read_series(
+    loc: str,
+    start: pd.Timestamp | None = None,
+    end: pd.Timestamp | None = None,
+    root: str = HOURLY_STORE_DIR,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (times datetime64[s], values float32 [n_hours, len(VARS)]) for `loc`,
+    start <= time <= end. Only the months overlapping the range are mapped.
+    """
+    loc_dir = _location_dir(loc, root)
+    months = sorted(f[:-len(".arrow")] for f in os.listdir(loc_dir) if f.endswith(".arrow")) \
+        if os.path.isdir(loc_dir) else []
+    if start is not None:
+        months = [m for m in months if m >= pd.Timestamp(start).strftime("%Y-%m")]
+    if end is not None:
+        months = [m for m in months if m <= pd.Timestamp(end).strftime("%Y-%m")]
+
+    times, values = [], []
+    for month in months:
+        table = _read_table(_month_path(loc, month, root))
+        # float32 columns without nulls -> zero-copy views of the mapped file;
+        # only the stacked [hours x vars] matrix is materialized
+        times.append(table.column("time").to_numpy())
+        values.append(np.column_stack([table.column(v).to_numpy() for v in VARS]))
+
+    if not times:
+        return np.array([], dtype="datetime64[s]"), np.empty((0, len(VARS)), dtype=np.float32)
+
+    t = np.concatenate(times)
+    x = np.concatenate(values)
+    keep = np.ones(len(t), dtype=bool)
+    if start is not None:
+        keep &= t >= np.datetime64(pd.Timestamp(start).tz_localize(None), "s")
+    if end is not None:
+        keep &= t <= np.datetime64(pd.Timestamp(end).tz_localize(None), "s")
+    return t[keep], x[keep]
+
+
+def read_tail(loc: str, hours: int, root: str = HOURLY_STORE_DIR) -> tuple[np.ndarray, np.ndarray]:
+    """Last `hours` stored hours of `loc`, mapping only the newest month file(s)."""
+    loc_dir = _location_dir(loc, root)
+    months = sorted(f[:-len(".arrow")] for f in os.listdir(loc_dir) if f.endswith(".arrow")) \
+        if os.path.isdir(loc_dir) else []
+
+    n, first = 0, len(months)
+    while first > 0 and n < hours:
+        first -= 1
+        n += _read_table(_month_path(loc, months[first], root)).num_rows
+    if first == len(months):
+        return read_series(loc, root=root)
+
+    times, values = read_series(loc, start=pd.Timestamp(months[first] + "-01"), root=root)
+    return times[-hours:], values[-hours:]
+
+
+def fingerprint(root: str = HOURLY_STORE_DIR) -> str:
+    """Cheap change marker (names, sizes, mtimes) for DAG skipping; no file contents are read."""
+    h = hashlib.sha256()
+    for dirpath, _, names in sorted(os.walk(root)):
+        for name in sorted(names):
+            st = os.stat(os.path.join(dirpath, name))
+            h.update(f"{dirpath}/{name}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+@instrumented("hourly_ingest")
+def ingest_hourly(
+    locations: list[tuple[float, float]] | None = None,
+    days: int = INGEST_DAYS,
+    root: str = HOURLY_STORE_DIR,
+) -> int:
+    """
+    Copy the last `days` (through yesterday) of each location's hourly
+    series into the store; a location not stored yet gets SEED_DAYS.
+    """
+    locations = locations or [(DEFAULT_LAT, DEFAULT_LON)]
+    end = date.today() - timedelta(days=1)
+    stored = set(stored_locations(root))
+
+    written = 0
+    for lat, lon in locations:
+        n_days = days if location_id(lat, lon) in stored else max(days, SEED_DAYS)
+        start = end - timedelta(days=n_days - 1)
+        hourly = fetch_hourly(lat, lon, start.isoformat(), end.isoformat())
+        written += write_hourly(location_id(lat, lon), hourly, root=root)
+    current().rows_out = written
+    print(f"✅ Stored {written} hourly row(s) for {len(locations)} location(s) in {root}")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest raw hourly series into the hourly store.")
+    parser.add_argument("--days", type=int, default=INGEST_DAYS)
+    parser.add_argument("--lat", type=float, default=DEFAULT_LAT)
+    parser.add_argument("--lon", type=float, default=DEFAULT_LON)
+    args = parser.parse_args()
+
+    ingest_hourly([(args.lat, args.lon)], days=args.days)
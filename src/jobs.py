@@ -0,0 +1,129 @@
+# src/jobs.py
+"""
+Background jobs for the dashboard.
+
+    job = get_job_manager().submit("batch_inference", run_batch_inference)
+
+- jobs run on a small thread pool, so the Streamlit script thread never
+  blocks on inference or the materialization wait
+- single-flight: submitting a key that already has a queued/running job
+  returns that job instead of starting a duplicate (one process serves
+  every Streamlit session, so this covers concurrent users)
+- the job function gets a `progress(fraction, message)` callback; the UI
+  polls Job.status / progress / message
+"""
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+MAX_JOB_THREADS = 2
+KEEP_FINISHED = 20  # finished jobs remembered for status display
+
+ACTIVE = ("queued", "running")
+
+
+@dataclass
+class Job:
+    key: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = "queued"  # queued | running | succeeded | failed
+    progress: float = 0.0
+    message: str = "Queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    result: object = None
+
+    @property
+    def done(self) -> bool:
+        return self.status not in ACTIVE
+
+    @property
+    def elapsed_s(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobManager:
+    def __init__(self, max_threads: int = MAX_JOB_THREADS):
+        self._lock = threading.Lock()
+        self._jobs: dict[str, Job] = {}
+        self._active: dict[str, Job] = {}   # key -> queued/running job
+        self._latest: dict[str, Job] = {}   # key -> most recent job
+        self._pool = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="job")
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Job:
+        """Start fn(*args, progress=..., **kwargs) unless a job for `key` is already active."""
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                return job
+
+            job = Job(key=key)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._latest[key] = job
+            self._trim()
+
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn: Callable, args: tuple, kwargs: dict):
+        def progress(fraction: float, message: str = ""):
+            job.progress = max(0.0, min(1.0, float(fraction)))
+            if message:
+                job.message = message
+
+        with self._lock:
+            job.started_at = time.time()
+            job.message = "Running"
+            job.status = "running"
+
+        # outcome is published in one step under the lock, so a poller never sees a
+        # finished job without finished_at and submit() never coalesces onto it
+        try:
+            result = fn(*args, progress=progress, **kwargs)
+        except BaseException as e:
+            traceback.print_exc()
+            outcome = dict(error=repr(e), message=f"Failed: {e}", status="failed")
+        else:
+            outcome = dict(result=result, progress=1.0, message="Done", status="succeeded")
+
+        with self._lock:
+            job.finished_at = time.time()
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            for name, value in outcome.items():  # status last
+                setattr(job, name, value)
+
+    def _trim(self):
+        finished = sorted((j for j in self._jobs.values() if j.done), key=lambda j: j.submitted_at)
+        for j in finished[:-KEEP_FINISHED]:
+            del self._jobs[j.id]
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self, key: str) -> Job | None:
+        with self._lock:
+            return self._latest.get(key)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
@@ -0,0 +1,330 @@
+# src/lag_features.py
+"""
+Lag and rolling-window features on top of the daily feature group.
+
+    aqi_lag_{1..7}              AQI of the calendar day k days earlier
+    {pollutant}_roll{w}_mean    trailing w-day mean, w in (3, 7), day itself included
+    {pollutant}_roll{w}_max     trailing w-day max
+
+Windows are CALENDAR days: a missing day is a gap (NaN lag) and a rolling
+value needs all w days present (min_periods = window), so a feature never
+depends on how many rows happen to be stored.
+
+Instead of re-reading the whole history every day, the last
+LOOKBACK_DAYS + REVISION_DAYS daily values of each location are kept in
+STATE_PATH, keyed by date. An update reads only the re-uploaded tail,
+patches the state and recomputes the touched days: a fixed amount of work
+per new day. Results go to their own feature group, joinable with the
+daily features on (location_id, event_time).
+
+    python -m src.lag_features            # incremental update (full build if there is no state)
+    python -m src.lag_features --full     # recompute from the full history, reset the state
+    python -m src.lag_features --verify   # incremental == full recompute?
+"""
+import argparse
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.metrics import current, instrumented
+from src.schema import DAILY_COLUMNS, FEATURE_FG_NAME, FEATURE_FG_VERSION, POLLUTANT_COLUMNS, enforce_daily_schema
+from src.training_dataset import ARTIFACT_DIR, REVISION_DAYS
+
+LAG_FG_NAME = "daily_aqi_lag_features"
+LAG_FG_VERSION = 1
+
+STATE_PATH = os.path.join(ARTIFACT_DIR, "lag_state.json")
+STATE_VERSION = 1
+
+LAGS = tuple(range(1, 8))
+WINDOWS = (3, 7)
+
+# days before D that a feature of day D can look at
+LOOKBACK_DAYS = max(max(LAGS), max(WINDOWS) - 1)
+
+LAG_COLUMNS = [f"aqi_lag_{k}" for k in LAGS]
+ROLLING_COLUMNS = [
+    f"{c}_roll{w}_{stat}" for c in POLLUTANT_COLUMNS for w in WINDOWS for stat in ("mean", "max")
+]
+FEATURE_COLUMNS = LAG_COLUMNS + ROLLING_COLUMNS
+
+_AQI = POLLUTANT_COLUMNS.index("aqi_daily")
+
+
+def get_lag_feature_group(fs):
+    return fs.get_or_create_feature_group(
+        name=LAG_FG_NAME,
+        version=LAG_FG_VERSION,
+        primary_key=["location_id", "event_time"],
+        event_time="event_time",
+        description="AQI lags 1-7 and 3/7-day rolling mean/max per pollutant (calendar days)",
+    )
+
+
+def _prepare(daily: pd.DataFrame) -> pd.DataFrame:
+    """Typed daily rows with a location_id, one row per (location, day)."""
+    daily = enforce_daily_schema(daily).dropna(subset=["event_time"])
+    if "location_id" not in daily.columns:
+        from src.data_fetcher import DEFAULT_LAT, DEFAULT_LON, location_id
+
+        daily["location_id"] = location_id(DEFAULT_LAT, DEFAULT_LON)
+    daily["location_id"] = daily["location_id"].astype(str)
+    daily["event_time"] = daily["event_time"].dt.normalize()
+    daily = daily.sort_values("event_time").drop_duplicates(["location_id", "event_time"], keep="last")
+    return daily.reset_index(drop=True)
+
+
+def _to_frame(rows) -> pd.DataFrame:
+    """Feature rows [location_id, day, *FEATURE_COLUMNS] (list or frame) -> typed frame."""
+    out = pd.DataFrame(rows, columns=["location_id", "event_time"] + FEATURE_COLUMNS)
+    out["event_time"] = pd.to_datetime(out["event_time"], utc=True).astype("datetime64[ns, UTC]")
+    out[FEATURE_COLUMNS] = out[FEATURE_COLUMNS].astype("float32")
+    return out.sort_values(["location_id", "event_time"]).reset_index(drop=True)
+
+
+# ---------- full recompute (reference) ----------
+def full_lag_features(daily: pd.DataFrame) -> pd.DataFrame:
+    """Every feature recomputed from the complete history (pandas shift/rolling)."""
+    daily = _prepare(daily)
+    frames = []
+    for loc, g in daily.groupby("location_id", sort=True):
+        days = g.set_index("event_time")[POLLUTANT_COLUMNS].astype("float64")
+        s = days.asfreq("D")  # calendar days; gaps become NaN rows
+
+        out = pd.DataFrame(index=s.index)
+        for k in LAGS:
+            out[f"aqi_lag_{k}"] = s["aqi_daily"].shift(k)
+        for c in POLLUTANT_COLUMNS:
+            for w in WINDOWS:
+                r = s[c].rolling(w, min_periods=w)
+                out[f"{c}_roll{w}_mean"] = r.mean()
+                out[f"{c}_roll{w}_max"] = r.max()
+
+        out = out.loc[days.index, FEATURE_COLUMNS]
+        frames.append(out.reset_index().assign(location_id=loc))
+
+    if not frames:
+        return _to_frame([])
+    return _to_frame(pd.concat(frames, ignore_index=True))
+
+
+# ---------- incremental window state ----------
+def _window_features(values: dict, day: date) -> list[float]:
+    """Features of `day` from {date_iso: [pollutant values]} (the LOOKBACK_DAYS + 1 days ending at day)."""
+    missing = [np.nan] * len(POLLUTANT_COLUMNS)
+    M = np.array(
+        [values.get((day - timedelta(days=i)).isoformat(), missing) for i in range(LOOKBACK_DAYS, -1, -1)],
+        dtype=np.float64,
+    )  # oldest ... day
+
+    feats = [M[-1 - k, _AQI] for k in LAGS]
+    # NaN anywhere in the window -> NaN (min_periods = window)
+    stats = {w: (M[-w:].mean(axis=0), M[-w:].max(axis=0)) for w in WINDOWS}
+    for j in range(len(POLLUTANT_COLUMNS)):
+        for w in WINDOWS:
+            feats += [stats[w][0][j], stats[w][1][j]]
+    return feats
+
+
+def update_state(state: dict, daily: pd.DataFrame) -> pd.DataFrame:
+    """
+    Patch the per-location window state with `daily` rows (new or revised days)
+    and return the features of every day whose window changed.
+
+    A location without state treats `daily` as its complete history.
+    """
+    daily = _prepare(daily)
+    rows = []
+    for loc, g in daily.groupby("location_id", sort=True):
+        values = state.setdefault(loc, {})
+        days = g["event_time"].dt.date.tolist()
+        first = min(days).isoformat()
+        if values and first < min(values):
+            raise ValueError(
+                f"{loc}: row for {first} is older than the lag window state (starts {min(values)}); "
+                "run python -m src.lag_features --full"
+            )
+
+        for day, row in zip(days, g[POLLUTANT_COLUMNS].to_numpy(dtype=np.float64)):
+            values[day.isoformat()] = row.tolist()
+
+        # any later day may have the patched day in its window
+        for d in sorted(d for d in values if d >= first):
+            rows.append([loc, d, *_window_features(values, date.fromisoformat(d))])
+
+        _prune(values)
+    return _to_frame(rows)
+
+
+def _prune(values: dict):
+    """Keep only the days a future update can still need."""
+    cutoff = (date.fromisoformat(max(values)) - timedelta(days=LOOKBACK_DAYS + REVISION_DAYS)).isoformat()
+    for d in [d for d in values if d < cutoff]:
+        del values[d]
+
+
+def seed_state(daily: pd.DataFrame) -> dict:
+    """Window state holding the tail of a complete history."""
+    daily = _prepare(daily)
+    state = {}
+    for loc, g in daily.groupby("location_id", sort=True):
+        values = {
+            day.isoformat(): row.tolist()
+            for day, row in zip(g["event_time"].dt.date, g[POLLUTANT_COLUMNS].to_numpy(dtype=np.float64))
+        }
+        _prune(values)
+        state[loc] = values
+    return state
+
+
+def load_state(path: str = STATE_PATH) -> dict | None:
+    """Per-location window state, or None (-> full build) if absent or incompatible."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        saved = json.load(f)
+    if (saved.get("version"), saved.get("fg_version"), saved.get("columns")) != (
+        STATE_VERSION, FEATURE_FG_VERSION, POLLUTANT_COLUMNS
+    ):
+        print("Lag window state is from another schema; rebuilding.")
+        return None
+    return saved["locations"]
+
+
+def save_state(state: dict, path: str = STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    saved = {
+        "version": STATE_VERSION,
+        "fg_version": FEATURE_FG_VERSION,
+        "columns": POLLUTANT_COLUMNS,
+        "locations": state,
+    }
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(saved, f, indent=1, sort_keys=True)
+    os.replace(f"{path}.tmp", path)  # atomic: a kill never leaves a half-written state
+
+
+# ---------- pipeline stage ----------
+def _read_daily(fs, start_time=None) -> pd.DataFrame:
+    from src.storage import read_feature_group
+
+    fg = fs.get_feature_group(FEATURE_FG_NAME, version=FEATURE_FG_VERSION)
+    return read_feature_group(fg, DAILY_COLUMNS, start_time=start_time)
+
+
+@instrumented("lags", fg=LAG_FG_NAME)
+def update_lag_features(full: bool = False):
+    """
+    Incremental: read the daily rows since the oldest state date that can
+    still be revised, update the state and upsert the touched days.
+    Full (or no usable state): recompute every day from the whole history.
+    """
+    from src.fg_writer import insert_with_retries
+    from src.storage import get_feature_store
+
+    fs = get_feature_store()
+    state = None if full else load_state()
+
+    if state is None:
+        daily = _read_daily(fs)
+        print(f"Building lag features from the full history ({len(daily)} daily rows)")
+        feats = full_lag_features(daily)
+        state = seed_state(daily)
+    else:
+        last = min(max(values) for values in state.values()) if state else None
+        start = pd.Timestamp(last, tz="UTC") - pd.Timedelta(days=REVISION_DAYS) if last else None
+        daily = _read_daily(fs, start_time=start)
+        print(f"Incremental lag update: reading daily rows >= {start} ({len(daily)} rows)")
+        feats = update_state(state, daily) if not daily.empty else _to_frame([])
+    current().rows_in = len(daily)
+
+    if feats.empty:
+        print("No lag feature rows to write.")
+        return feats
+
+    insert_with_retries(get_lag_feature_group(fs), feats)
+    # state only moves forward once its rows are stored
+    save_state(state)
+    current().rows_out = len(feats)
+
+    print(f"✅ Wrote {len(feats)} lag feature row(s) to {LAG_FG_NAME} v{LAG_FG_VERSION}")
+    print(feats[["location_id", "event_time"] + LAG_COLUMNS[:3]].tail())
+    return feats
+
+
+# ---------- verification ----------
+def replay(daily: pd.DataFrame, batch_days: int = REVISION_DAYS) -> pd.DataFrame:
+    """Feed `daily` day by day through update_state, re-sending the last `batch_days` days each time."""
+    daily = _prepare(daily)
+    state, latest = {}, {}
+    day_index = daily["event_time"]
+    for d in sorted(day_index.unique()):
+        batch = daily[(day_index > d - pd.Timedelta(days=batch_days)) & (day_index <= d)]
+        for row in update_state(state, batch).itertuples(index=False):
+            latest[(row[0], row[1])] = list(row)
+    return _to_frame(list(latest.values()))
+
+
+def compare(expected: pd.DataFrame, actual: pd.DataFrame, rtol: float = 1e-5) -> list[str]:
+    """Differences between two feature frames (keys, NaN positions, values)."""
+    keys = ["location_id", "event_time"]
+    merged = expected.merge(actual, on=keys, how="outer", suffixes=("", "_actual"), indicator=True)
+    problems = []
+    unmatched = int((merged["_merge"] != "both").sum())
+    if unmatched:
+        problems.append(f"{unmatched} row(s) present on one side only")
+
+    both = merged[merged["_merge"] == "both"]
+    for c in FEATURE_COLUMNS:
+        a = both[c].to_numpy(dtype=np.float64)
+        b = both[f"{c}_actual"].to_numpy(dtype=np.float64)
+        bad = ~np.isclose(a, b, rtol=rtol, equal_nan=True)
+        if bad.any():
+            problems.append(f"{c}: {int(bad.sum())} mismatch(es), first at {both.loc[bad, keys].iloc[0].tolist()}")
+    return problems
+
+
+def verify() -> bool:
+    """Full recompute vs (1) a day-by-day incremental replay and (2) the persisted state."""
+    from src.storage import get_feature_store
+
+    daily = _read_daily(get_feature_store())
+    expected = full_lag_features(daily)
+    print(f"Full recompute: {len(expected)} row(s)")
+
+    problems = [f"replay: {p}" for p in compare(expected, replay(daily))]
+
+    state = load_state()
+    if state:
+        # days whose whole window is inside the state can be rebuilt from it alone
+        rows = []
+        for loc, values in state.items():
+            start = date.fromisoformat(min(values)) + timedelta(days=LOOKBACK_DAYS)
+            rows += [[loc, d, *_window_features(values, date.fromisoformat(d))]
+                     for d in sorted(values) if date.fromisoformat(d) >= start]
+        from_state = _to_frame(rows)
+        in_state = expected.merge(from_state[["location_id", "event_time"]], on=["location_id", "event_time"])
+        problems += [f"state: {p}" for p in compare(in_state, from_state)]
+        print(f"Persisted state: {len(from_state)} day(s) checked")
+
+    if problems:
+        print("❌ Incremental lag features differ from the full recompute:")
+        for p in problems:
+            print("  -", p)
+        return False
+    print("✅ Incremental lag features match the full recompute")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lag / rolling-window feature stage.")
+    parser.add_argument("--full", action="store_true", help="recompute from the full history and reset the state")
+    parser.add_argument("--verify", action="store_true", help="check incremental updates against a full recompute")
+    args = parser.parse_args()
+
+    if args.verify:
+        raise SystemExit(0 if verify() else 1)
+    update_lag_features(full=args.full)
@@ -0,0 +1,324 @@
+# src/local_store.py
+"""
+Local, file-based stand-ins for the Hopsworks feature store and model registry.
+
+Only the subset of the hsfs / hsml API used by this repo is implemented, so
+the pipeline modules work unchanged against either backend (see src/storage.py).
+
+Layout under `root`:
+    feature_groups/<name>_<version>/metadata.json
+    feature_groups/<name>_<version>/part-YYYY-MM.parquet   (by event_time month)
+    models/<name>/<version>/...                             (saved artifacts)
+"""
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+
+_ALL_PARTITION = "all"
+
+# storage handles are cheap and created per call (every get_feature_group /
+# get_model_registry returns a new object), so locks are shared per path
+_path_locks: dict[str, threading.Lock] = {}
+_path_locks_guard = threading.Lock()
+
+
+def _path_lock(path: str) -> threading.Lock:
+    """The process-wide lock of a feature group / registry directory."""
+    with _path_locks_guard:
+        return _path_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+class _LocalJob:
+    """Local writes are synchronous, so materialization is always finished."""
+
+    def get_state(self):
+        return "SUCCEEDED"
+
+    def get_final_state(self):
+        return "SUCCEEDED"
+
+
+class LocalQuery:
+    def __init__(self, fg: "LocalFeatureGroup", columns: list[str] | None):
+        self._fg = fg
+        self._columns = columns
+
+    def read(self, read_options: dict | None = None, **kwargs) -> pd.DataFrame:
+        return self._fg.read(columns=self._columns)
+
+
+class LocalFeatureGroup:
+    def __init__(self, path: str, name: str, version: int, primary_key: list[str], event_time: str | None):
+        self.path = path
+        self.name = name
+        self.version = version
+        self.primary_key = list(primary_key)
+        self.event_time = event_time
+        self.materialization_job = _LocalJob()
+        self._lock = _path_lock(path)
+
+    # ---------- partitions ----------
+    def _partition_key(self, ts: pd.Series) -> pd.Series:
+        return pd.to_datetime(ts, errors="coerce", utc=True).dt.strftime("%Y-%m")
+
+    def _partition_path(self, key: str) -> str:
+        return os.path.join(self.path, f"part-{key}.parquet")
+
+    def _partitions(self) -> list[str]:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            f[len("part-"):-len(".parquet")]
+            for f in os.listdir(self.path)
+            if f.startswith("part-") and f.endswith(".parquet")
+        )
+
+    # ---------- writes ----------
+    def insert(self, df: pd.DataFrame, write_options: dict | None = None, **kwargs):
+        """Upsert on primary key; only the touched partitions are rewritten."""
+        missing = [c for c in self.primary_key if c not in df.columns]
+        if missing:
+            raise ValueError(f"Primary key column(s) {missing} missing from insert into {self.name}.")
+
+        if self.event_time and self.event_time in df.columns:
+            keys = self._partition_key(df[self.event_time]).fillna(_ALL_PARTITION)
+        else:
+            keys = pd.Series(_ALL_PARTITION, index=df.index)
+
+        with self._lock:
+            if self.event_time and self.event_time not in self.primary_key:
+                self._drop_moved_keys(df, set(keys))
+
+            for key, part in df.groupby(keys, sort=False):
+                path = self._partition_path(key)
+                if os.path.exists(path):
+                    part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+                part = part.drop_duplicates(subset=self.primary_key, keep="last")
+                if self.event_time and self.event_time in part.columns:
+                    part = part.sort_values(self.event_time, kind="stable")
+
+                tmp = f"{path}.tmp"
+                part.reset_index(drop=True).to_parquet(tmp, index=False)
+                os.replace(tmp, path)
+
+        return self.materialization_job, None
+
+    def _drop_moved_keys(self, df: pd.DataFrame, target_keys: set[str]):
+        """
+        When event_time is not part of the primary key, an upsert can move a
+        key to another month; remove it from the partitions it no longer belongs to.
+        """
+        incoming = pd.MultiIndex.from_frame(df[self.primary_key].drop_duplicates())
+        for key in self._partitions():
+            if key in target_keys:
+                continue
+            path = self._partition_path(key)
+            old_keys = pd.MultiIndex.from_frame(pd.read_parquet(path, columns=self.primary_key))
+            moved = old_keys.isin(incoming)
+            if not moved.any():
+                continue
+
+            part = pd.read_parquet(path)[~moved].reset_index(drop=True)
+            if part.empty:
+                os.remove(path)
+                continue
+            tmp = f"{path}.tmp"
+            part.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+
+    # ---------- reads ----------
+    def select(self, columns: list[str]) -> LocalQuery:
+        return LocalQuery(self, list(columns))
+
+    def select_all(self) -> LocalQuery:
+        return LocalQuery(self, None)
+
+    def read(
+        self,
+        read_options: dict | None = None,
+        columns: list[str] | None = None,
+        start_time=None,
+        end_time=None,
+        **kwargs,
+    ) -> pd.DataFrame:
+        """
+        Read with column selection and an inclusive [start_time, end_time]
+        filter on the event_time column. Month partitions outside the window
+        are not opened at all.
+        """
+        start = pd.Timestamp(start_time) if start_time is not None else None
+        end = pd.Timestamp(end_time) if end_time is not None else None
+        start = start.tz_localize("UTC") if start is not None and start.tz is None else start
+        end = end.tz_localize("UTC") if end is not None and end.tz is None else end
+
+        time_filtered = self.event_time is not None and (start is not None or end is not None)
+        read_cols = None
+        if columns is not None:
+            read_cols = list(columns)
+            if time_filtered and self.event_time not in read_cols:
+                read_cols.append(self.event_time)
+
+        frames = []
+        for key in self._partitions():
+            if time_filtered and key != _ALL_PARTITION:
+                if start is not None and key < start.strftime("%Y-%m"):
+                    continue
+                if end is not None and key > end.strftime("%Y-%m"):
+                    continue
+            frames.append(pd.read_parquet(self._partition_path(key), columns=read_cols))
+
+        if not frames:
+            return pd.DataFrame(columns=columns or [])
+        df = pd.concat(frames, ignore_index=True)
+
+        if time_filtered:
+            ts = pd.to_datetime(df[self.event_time], errors="coerce", utc=True)
+            mask = ts.notna()
+            if start is not None:
+                mask &= ts >= start
+            if end is not None:
+                mask &= ts <= end
+            df = df[mask].reset_index(drop=True)
+
+        return df[columns] if columns is not None else df
+
+
+class LocalFeatureStore:
+    def __init__(self, root: str):
+        self.root = os.path.join(root, "feature_groups")
+
+    def _fg_path(self, name: str, version: int) -> str:
+        return os.path.join(self.root, f"{name}_{version}")
+
+    def _load(self, name: str, version: int) -> LocalFeatureGroup | None:
+        path = self._fg_path(name, version)
+        meta_path = os.path.join(path, "metadata.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return LocalFeatureGroup(path, name, version, meta["primary_key"], meta.get("event_time"))
+
+    def get_feature_group(self, name: str, version: int = 1) -> LocalFeatureGroup:
+        fg = self._load(name, version)
+        if fg is None:
+            raise RuntimeError(f"Feature group {name} v{version} not found in local store {self.root}.")
+        return fg
+
+    def get_or_create_feature_group(
+        self,
+        name: str,
+        version: int = 1,
+        primary_key: list[str] | None = None,
+        description: str = "",
+        online_enabled: bool = False,
+        event_time: str | None = None,
+        **kwargs,
+    ) -> LocalFeatureGroup:
+        fg = self._load(name, version)
+        if fg is not None:
+            return fg
+
+        primary_key = list(primary_key or [])
+        # every FG in this repo has an event_time column; use it for partitioning
+        event_time = event_time or "event_time"
+
+        path = self._fg_path(name, version)
+        with _path_lock(path):
+            fg = self._load(name, version)  # created by another thread meanwhile
+            if fg is not None:
+                return fg
+            self._write_metadata(path, name, version, primary_key, event_time, description)
+        return LocalFeatureGroup(path, name, version, primary_key, event_time)
+
+    @staticmethod
+    def _write_metadata(path: str, name: str, version: int, primary_key: list, event_time: str, description: str):
+        os.makedirs(path, exist_ok=True)
+        tmp = os.path.join(path, "metadata.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "name": name,
+                    "version": version,
+                    "primary_key": primary_key,
+                    "event_time": event_time,
+                    "description": description,
+                },
+                f,
+                indent=2,
+            )
+        os.replace(tmp, os.path.join(path, "metadata.json"))  # readers never see a partial file
+
+
+class LocalModel:
+    def __init__(self, registry: "LocalModelRegistry", name: str, version: int | None = None,
+                 description: str = "", metrics: dict | None = None):
+        self._registry = registry
+        self.name = name
+        self.version = version
+        self.description = description
+        self.training_metrics = metrics or {}
+
+    def save(self, model_path: str):
+        """Copy a file or directory into the next version slot."""
+        with self._registry._lock:
+            versions = self._registry._versions(self.name)
+            self.version = (max(versions) + 1) if versions else 1
+            target = self._registry._version_dir(self.name, self.version)
+            os.makedirs(target, exist_ok=True)
+
+            if os.path.isdir(model_path):
+                shutil.copytree(model_path, target, dirs_exist_ok=True)
+            else:
+                shutil.copy2(model_path, os.path.join(target, os.path.basename(model_path)))
+
+            with open(os.path.join(target, "_model.json"), "w") as f:
+                json.dump(
+                    {"name": self.name, "version": self.version,
+                     "description": self.description, "metrics": self.training_metrics},
+                    f,
+                    indent=2,
+                )
+        return self
+
+    def download(self, local_path: str | None = None) -> str:
+        src = self._registry._version_dir(self.name, self.version)
+        if local_path is None:
+            return src
+        shutil.copytree(src, local_path, dirs_exist_ok=True)
+        return local_path
+
+
+class LocalModelRegistry:
+    def __init__(self, root: str):
+        self.root = os.path.join(root, "models")
+        self._lock = _path_lock(self.root)
+        self.python = self  # mirrors hsml's mr.python.create_model(...)
+
+    def _version_dir(self, name: str, version: int) -> str:
+        return os.path.join(self.root, name, str(version))
+
+    def _versions(self, name: str) -> list[int]:
+        model_dir = os.path.join(self.root, name)
+        if not os.path.isdir(model_dir):
+            return []
+        return sorted(int(v) for v in os.listdir(model_dir) if v.isdigit())
+
+    def create_model(self, name: str, description: str = "", metrics: dict | None = None, **kwargs) -> LocalModel:
+        return LocalModel(self, name, description=description, metrics=metrics)
+
+    def get_models(self, name: str) -> list[LocalModel]:
+        return [LocalModel(self, name, v) for v in self._versions(name)]
+
+    def get_model(self, name: str, version: int | None = None) -> LocalModel:
+        versions = self._versions(name)
+        if not versions:
+            raise RuntimeError(f"Model {name} not found in local registry {self.root}.")
+        if version is None:
+            version = max(versions)
+        if version not in versions:
+            raise RuntimeError(f"Model {name} v{version} not found in local registry {self.root}.")
+        return LocalModel(self, name, version)
@@ -0,0 +1,294 @@
+# src/metrics.py
+"""
+Per-stage pipeline metrics.
+
+    with stage("insert", fg=fg.name) as m:
+        m.rows_in = len(df)
+        ...
+        m.retries += 1
+
+    @instrumented("train")          # whole function as one stage;
+    def train_and_register(...):    # current() is its StageMetrics inside
+
+Every finished stage records duration, rows in/out, bytes transferred,
+retries, the process peak RSS and ok/failed status, and is written to:
+  - artifacts/metrics/stages.jsonl      one JSON line per stage run
+  - artifacts/metrics/aqi_pipeline.prom latest value per stage, Prometheus
+                                        textfile-collector format
+(override the directory with AQI_METRICS_DIR)
+
+Pipeline, serve and walk-forward processes share these files: every write
+holds an flock on metrics.lock, and stages.jsonl is rotated to
+stages.jsonl.1 once it passes AQI_METRICS_MAX_BYTES.
+
+Profiling is opt-in: AQI_PROFILE=cprofile (or 1) profiles each outermost
+stage and keeps the slowest one as slowest_stage.prof + a text summary;
+AQI_PROFILE=pyinstrument does the same with pyinstrument (if installed).
+"""
+import functools
+import io
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+METRICS_DIR = os.getenv("AQI_METRICS_DIR", os.path.join("artifacts", "metrics"))
+JSONL_PATH = os.path.join(METRICS_DIR, "stages.jsonl")
+PROM_PATH = os.path.join(METRICS_DIR, "aqi_pipeline.prom")
+LATEST_PATH = os.path.join(METRICS_DIR, "latest.json")
+LOCK_PATH = os.path.join(METRICS_DIR, "metrics.lock")
+
+# stages.jsonl is rotated (one previous file kept) past this size
+MAX_JSONL_BYTES = int(os.getenv("AQI_METRICS_MAX_BYTES", str(16 * 1024 * 1024)))
+
+PROFILE_MODE = os.getenv("AQI_PROFILE", "").strip().lower()
+PROFILE_ENABLED = PROFILE_MODE not in ("", "0", "false", "off")
+PROFILE_TOP_N = 40
+
+_write_lock = threading.Lock()
+_local = threading.local()
+
+# one profiler at a time per process (cProfile can't nest)
+_profile_lock = threading.Lock()
+_slowest_profiled = 0.0
+
+
+@dataclass
+class StageMetrics:
+    stage: str
+    labels: dict = field(default_factory=dict)
+    started_at: float = 0.0
+    duration_s: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+    bytes: int = 0
+    retries: int = 0
+    peak_rss_mb: float | None = None
+    status: str = "running"
+    error: str | None = None
+
+
+def peak_rss_mb() -> float | None:
+    """Process high-water RSS in MB (None where the platform can't tell)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 2)
+
+
+def _stack() -> list:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def current() -> StageMetrics | None:
+    """Innermost active stage in this thread (for code that only adds counts)."""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def add_bytes(n: int):
+    m = current()
+    if m is not None:
+        m.bytes += int(n)
+
+
+def add_retry(n: int = 1):
+    m = current()
+    if m is not None:
+        m.retries += int(n)
+
+
+# ---------- output ----------
+def _prom_escape(value: str) -> str:
+    """Label value escaping of the Prometheus text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prom_labels(m: StageMetrics) -> str:
+    labels = {"stage": m.stage, **{k: str(v) for k, v in sorted(m.labels.items())}}
+    return ",".join(f'{k}="{_prom_escape(v)}"' for k, v in labels.items())
+
+
+def _render_prometheus(latest: dict) -> str:
+    gauges = [
+        ("aqi_stage_duration_seconds", "Duration of the last run of the stage.", "duration_s"),
+        ("aqi_stage_rows_in", "Rows read by the last run of the stage.", "rows_in"),
+        ("aqi_stage_rows_out", "Rows written by the last run of the stage.", "rows_out"),
+        ("aqi_stage_bytes", "Bytes transferred by the last run of the stage.", "bytes"),
+        ("aqi_stage_retries", "Retries during the last run of the stage.", "retries"),
+        ("aqi_stage_peak_rss_megabytes", "Process peak RSS when the stage finished.", "peak_rss_mb"),
+        ("aqi_stage_success", "1 if the last run of the stage succeeded.", None),
+        ("aqi_stage_last_run_timestamp_seconds", "Unix time the stage last finished.", None),
+    ]
+    lines = []
+    for metric, help_text, key in gauges:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for rec in latest.values():
+            m = StageMetrics(**rec)
+            if key is not None:
+                value = rec.get(key)
+            elif metric == "aqi_stage_success":
+                value = 1 if m.status == "ok" else 0
+            else:
+                value = m.started_at + m.duration_s
+            if value is not None:
+                lines.append(f"{metric}{{{_prom_labels(m)}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def _locked():
+    """Exclusive access to the metrics files for this thread AND across processes."""
+    with _write_lock:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(LOCK_PATH, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write(m: StageMetrics):
+    record = asdict(m)
+    with _locked():
+        try:
+            if os.path.getsize(JSONL_PATH) > MAX_JSONL_BYTES:
+                os.replace(JSONL_PATH, f"{JSONL_PATH}.1")
+        except FileNotFoundError:
+            pass
+        with open(JSONL_PATH, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+        # latest value per (stage, labels); read-modify-write under the file lock,
+        # so concurrent processes don't drop each other's stages
+        latest = {}
+        if os.path.exists(LATEST_PATH):
+            try:
+                with open(LATEST_PATH) as f:
+                    latest = json.load(f)
+            except ValueError:
+                latest = {}
+        latest[_prom_labels(m)] = record
+
+        for path, text in ((LATEST_PATH, json.dumps(latest, indent=2)), (PROM_PATH, _render_prometheus(latest))):
+            with open(f"{path}.tmp", "w") as f:
+                f.write(text)
+            os.replace(f"{path}.tmp", path)
+
+
+# ---------- profiling ----------
+def _start_profiler():
+    if PROFILE_MODE == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("⚠️ AQI_PROFILE=pyinstrument but pyinstrument is not installed; using cProfile.")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, m: StageMetrics):
+    """Stop profiling; keep the output if this is the slowest profiled stage so far."""
+    global _slowest_profiled
+
+    if hasattr(profiler, "disable"):
+        profiler.disable()
+    else:
+        profiler.stop()
+
+    if m.duration_s <= _slowest_profiled:
+        return
+    _slowest_profiled = m.duration_s
+
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    base = os.path.join(METRICS_DIR, "slowest_stage")
+    header = f"stage={m.stage} labels={m.labels} duration_s={m.duration_s:.3f}\n\n"
+
+    if hasattr(profiler, "disable"):
+        import pstats
+
+        profiler.dump_stats(f"{base}.prof")
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        text = out.getvalue()
+    else:
+        with open(f"{base}.html", "w") as f:
+            f.write(profiler.output_html())
+        text = profiler.output_text(unicode=True)
+
+    with open(f"{base}.txt", "w") as f:
+        f.write(header + text)
+    print(f"🔬 Profile of slowest stage so far ({m.stage}, {m.duration_s:.2f}s): {base}.txt")
+
+
+@contextmanager
+def stage(name: str, **labels):
+    """Time a pipeline stage and record its metrics (re-raises any error)."""
+    m = StageMetrics(stage=name, labels=labels, started_at=time.time())
+    stack = _stack()
+
+    profiler = None
+    if PROFILE_ENABLED and not stack and _profile_lock.acquire(blocking=False):
+        profiler = _start_profiler()
+
+    stack.append(m)
+    t0 = time.perf_counter()
+    try:
+        yield m
+    except BaseException as e:
+        m.status = "failed"
+        m.error = repr(e)
+        raise
+    else:
+        m.status = "ok"
+    finally:
+        m.duration_s = round(time.perf_counter() - t0, 4)
+        m.peak_rss_mb = peak_rss_mb()
+        stack.pop()
+        if profiler is not None:
+            try:
+                _stop_profiler(profiler, m)
+            finally:
+                _profile_lock.release()
+        try:
+            _write(m)
+        except OSError as e:
+            print(f"⚠️ Could not write metrics for {name}: {e}")
+
+
+def instrumented(name: str, **labels):
+    """Decorator form of stage(); inside the function, current() returns its metrics."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,142 @@
+# src/model_cache.py
+"""
+Version-aware model cache for registry downloads.
+
+Two layers, both keyed by (model name, version):
+  1) in-process dict  -> repeated calls (e.g. the Streamlit button) reuse loaded models
+  2) on-disk cache    -> artifacts/model_cache/<name>/<version>/<name>.joblib
+                         + manifest.json (sha256, size, last_used) for integrity / LRU
+
+When nothing changed, the only remote call is the version listing.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from src.metrics import add_bytes
+
+CACHE_DIR = os.getenv("AQI_MODEL_CACHE_DIR", os.path.join("artifacts", "model_cache"))
+MAX_CACHED_VERSIONS = int(os.getenv("AQI_MODEL_CACHE_MAX_VERSIONS", "10"))
+
+_memory: dict[tuple[str, int], object] = {}
+_lock = threading.Lock()
+
+
+def _entry_dir(name: str, version: int) -> str:
+    return os.path.join(CACHE_DIR, name, str(version))
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_manifest(name: str, version: int) -> dict | None:
+    path = os.path.join(_entry_dir(name, version), "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(name: str, version: int, manifest: dict):
+    path = os.path.join(_entry_dir(name, version), "manifest.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def _verified_path(name: str, version: int) -> str | None:
+    """Cached artifact path if present and its checksum matches, else None."""
+    manifest = _read_manifest(name, version)
+    if manifest is None:
+        return None
+
+    path = os.path.join(_entry_dir(name, version), f"{name}.joblib")
+    if not os.path.exists(path) or os.path.getsize(path) != manifest.get("size"):
+        return None
+    if _sha256(path) != manifest.get("sha256"):
+        print(f"⚠️ Cached {name} v{version} failed integrity check, re-downloading.")
+        return None
+
+    manifest["last_used"] = time.time()
+    _write_manifest(name, version, manifest)
+    return path
+
+
+def _download(model, name: str, version: int) -> str:
+    """Download from the registry into the cache directory."""
+    entry = _entry_dir(name, version)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.makedirs(entry, exist_ok=True)
+
+    model_dir = model.download()
+    path = os.path.join(entry, f"{name}.joblib")
+    shutil.copy2(os.path.join(model_dir, f"{name}.joblib"), path)
+    add_bytes(os.path.getsize(path))
+
+    _write_manifest(
+        name,
+        version,
+        {"sha256": _sha256(path), "size": os.path.getsize(path), "last_used": time.time()},
+    )
+    evict()
+    return path
+
+
+def evict(max_versions: int = MAX_CACHED_VERSIONS) -> int:
+    """Keep only the `max_versions` most recently used cache entries."""
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        name_dir = os.path.join(CACHE_DIR, name)
+        if not os.path.isdir(name_dir):
+            continue
+        for v in os.listdir(name_dir):
+            manifest = _read_manifest(name, int(v)) if v.isdigit() else None
+            last_used = manifest.get("last_used", 0.0) if manifest else 0.0
+            entries.append((last_used, name, v))
+
+    entries.sort(reverse=True)  # most recently used first
+    for _, name, v in entries[max_versions:]:
+        shutil.rmtree(os.path.join(CACHE_DIR, name, v), ignore_errors=True)
+    return max(0, len(entries) - max_versions)
+
+
+def load_latest_model(mr, model_name: str):
+    """(model, version) for the newest registered version of `model_name`."""
+    models = mr.get_models(model_name)  # the one cheap version-check round-trip
+    if not models:
+        raise RuntimeError(f"No registered versions of {model_name}.")
+    latest = max(models, key=lambda m: m.version)
+    version = int(latest.version)
+    key = (model_name, version)
+
+    with _lock:
+        if key in _memory:
+            return _memory[key], version
+
+        path = _verified_path(model_name, version) or _download(latest, model_name, version)
+        import joblib  # also pulls in the model's library (xgboost/sklearn) on unpickle
+
+        clf = joblib.load(path)
+
+        # a newer version supersedes older ones in memory
+        for old in [k for k in _memory if k[0] == model_name]:
+            del _memory[old]
+        _memory[key] = clf
+
+    return clf, version
+
+
+def clear_memory():
+    with _lock:
+        _memory.clear()
@@ -1,18 +1,173 @@
 # src/run_daily.py
-import subprocess
-import sys
-
-def run(cmd: list[str]):
-    print("\n>>>", " ".join(cmd))
-    subprocess.check_call(cmd)
-
-def main():
-    run([sys.executable, "-c",
-         "from src.feature_store_upload import upload_daily_features; upload_daily_features(days=3)"])
-    run([sys.executable, "-m", "src.training_dataset"])
-    run([sys.executable, "-m", "src.train"])
-    run([sys.executable, "-m", "src.batch_inference"])
+import argparse
+import hashlib
+import os
+from datetime import date
+
+import pandas as pd
+
+from src.dag import DagRunner, Stage, hash_paths
+
+INGEST_DAYS = 3
+FEATURE_FINGERPRINT_DAYS = 10  # covers re-uploaded days + label lookahead
+
+# hourly forecasting mode (1-48h ahead) is opt-in: --hourly or AQI_HOURLY=1
+HOURLY_ENABLED = os.getenv("AQI_HOURLY", "0") == "1"
+
+
+def _ingest():
+    from src.feature_store_upload import upload_daily_features
+
+    upload_daily_features(days=INGEST_DAYS)
+
+
+def _lags():
+    from src.lag_features import update_lag_features
+
+    update_lag_features()
+
+
+def _build_dataset():
+    from src.training_dataset import create_training_data
+
+    create_training_data()
+
+
+def _train():
+    from src.train import train_and_register
+
+    train_and_register()
+
+
+def _infer():
+    from src.batch_inference import run_batch_inference
+
+    run_batch_inference()
+
+
+def _evaluate():
+    from src.evaluate_predictions import evaluate_predictions
+
+    evaluate_predictions()
+
+
+def _hourly_ingest():
+    from src.hourly_store import ingest_hourly
+
+    ingest_hourly()
+
+
+def _hourly_train():
+    from src.train_hourly import train_hourly_models
+
+    train_hourly_models()
+
+
+def _hourly_infer():
+    from src.hourly_inference import run_hourly_inference
+
+    run_hourly_inference()
+
+
+# -----------------------------
+# Input fingerprints (cheap reads only)
+# -----------------------------
+def _fp_ingest() -> str:
+    # Open-Meteo inputs only move once per day
+    return f"{date.today().isoformat()}|days={INGEST_DAYS}"
+
+
+def _fp_recent_features() -> str:
+    from src.storage import get_feature_store, read_feature_group
+    from src.schema import FEATURE_FG_NAME, FEATURE_FG_VERSION
+    from src.training_dataset import BASE_FEATURES
+
+    fg = get_feature_store().get_feature_group(FEATURE_FG_NAME, version=FEATURE_FG_VERSION)
+    start = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=FEATURE_FINGERPRINT_DAYS)
+    df = read_feature_group(fg, BASE_FEATURES, start_time=start)
+    df = df.sort_values("event_time").reset_index(drop=True)
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+
+def _fp_training_data() -> str:
+    from src.train import BEST_PARAMS_PATH
+    from src.training_dataset import TRAIN_DATA_DIR
+
+    return hash_paths(TRAIN_DATA_DIR, BEST_PARAMS_PATH)
+
+
+def _fp_infer() -> str:
+    from src.batch_inference import MODELS
+    from src.storage import get_model_registry
+
+    mr = get_model_registry()
+    versions = [max(m.version for m in mr.get_models(name)) for name, _ in MODELS]
+    return f"{date.today().isoformat()}|{versions}|{_fp_recent_features()}"
+
+
+def _fp_evaluate() -> str:
+    # new realized days arrive with ingest; new predictions only become scorable then
+    return f"{date.today().isoformat()}|{_fp_recent_features()}"
+
+
+def _fp_hourly_ingest() -> str:
+    from src.hourly_store import INGEST_DAYS as HOURLY_INGEST_DAYS
+
+    return f"{date.today().isoformat()}|hourly_days={HOURLY_INGEST_DAYS}"
+
+
+def _fp_hourly_store() -> str:
+    from src.hourly_store import fingerprint
+
+    return fingerprint()
+
+
+def _fp_hourly_infer() -> str:
+    from src.storage import get_model_registry
+    from src.train_hourly import HOURLY_MODELS
+
+    mr = get_model_registry()
+    versions = [max(m.version for m in mr.get_models(name)) for name, _ in HOURLY_MODELS]
+    return f"{versions}|{_fp_hourly_store()}"
+
+
+def build_stages(hourly: bool = False) -> list[Stage]:
+    from src.lag_features import STATE_PATH
+    from src.training_dataset import TRAIN_DATA_DIR
+
+    stages = [
+        Stage("ingest", _ingest, fingerprint=_fp_ingest),
+        Stage("lags", _lags, deps=["ingest"], fingerprint=_fp_recent_features,
+              outputs=[STATE_PATH]),
+        Stage("dataset", _build_dataset, deps=["ingest"], fingerprint=_fp_recent_features,
+              outputs=[TRAIN_DATA_DIR]),
+        Stage("train", _train, deps=["dataset"], fingerprint=_fp_training_data,
+              outputs=["artifacts/metrics.json"]),
+        Stage("infer", _infer, deps=["train", "ingest"], fingerprint=_fp_infer),
+        Stage("evaluate", _evaluate, deps=["ingest"], fingerprint=_fp_evaluate),
+    ]
+    if hourly:
+        from src.train_hourly import METRICS_PATH
+
+        # hourly fits wait for the daily fits so the two never compete for cores
+        stages += [
+            Stage("hourly_ingest", _hourly_ingest, fingerprint=_fp_hourly_ingest),
+            Stage("hourly_train", _hourly_train, deps=["hourly_ingest", "train"], fingerprint=_fp_hourly_store,
+                  outputs=[METRICS_PATH]),
+            Stage("hourly_infer", _hourly_infer, deps=["hourly_train"], fingerprint=_fp_hourly_infer),
+        ]
+    return stages
+
+
+def main(force: bool = False, hourly: bool = HOURLY_ENABLED):
+    DagRunner(build_stages(hourly=hourly), force=force).run()
     print("\n✅ Daily pipeline finished")
 
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Run the daily AQI pipeline in-process.")
+    parser.add_argument("--force", action="store_true", help="run every stage even if inputs are unchanged")
+    parser.add_argument("--hourly", action="store_true", help="also run the hourly (1-48h) forecast stages")
+    args = parser.parse_args()
+
+    main(force=args.force, hourly=args.hourly or HOURLY_ENABLED)
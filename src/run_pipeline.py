@@ -1,15 +1,8 @@
-import subprocess
 import sys
 
-def run(cmd):
-    print(f"\n>>> {cmd}")
-    r = subprocess.run(cmd, shell=True)
-    if r.returncode != 0:
-        sys.exit(r.returncode)
+from src.run_daily import main
 
 if __name__ == "__main__":
-    run("python -m src.feature_store_upload")
-    run("python -m src.training_dataset")
-    run("python -m src.train")
-    run("python -m src.batch_inference")
+    # same stages as run_daily, kept as an entry point for existing scripts
+    main(force="--force" in sys.argv[1:])
     print("\n✅ Pipeline finished")
@@ -0,0 +1,142 @@
+# src/schema.py
+"""
+Typed schema of the daily feature set.
+
+    event_time   datetime64[ns, UTC]
+    aqi_daily, pm10_mean, ... co_mean   float32
+    weekday      int8 (Monday=0 ... Sunday=6)
+    location_id  category (multi-location frames only)
+    label_*      float32
+
+Enforced where daily frames are produced (feature_engineering), persisted
+(training_dataset Parquet, backfill partitions) and uploaded. Roughly halves
+memory and file size vs float64 + weekday strings, and weekday never needs
+re-mapping downstream.
+
+    python -m src.schema --migrate   # copy feature group v1 -> v2 with the typed schema (idempotent)
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# v1 stored float64 pollutants and weekday as a day-name string
+FEATURE_FG_NAME = "daily_aqi_features_v2"
+FEATURE_FG_VERSION = 2
+LEGACY_FEATURE_FG_VERSION = 1
+
+POLLUTANT_COLUMNS = [
+    "aqi_daily",
+    "pm10_mean",
+    "pm2_5_mean",
+    "ozone_mean",
+    "no2_mean",
+    "so2_mean",
+    "co_mean",
+]
+
+# model input columns, in training order
+MODEL_FEATURES = POLLUTANT_COLUMNS + ["weekday"]
+
+# stored columns of the feature group
+DAILY_COLUMNS = ["event_time"] + MODEL_FEATURES
+
+WEEKDAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+_WEEKDAY_CODES = {name: i for i, name in enumerate(WEEKDAY_NAMES)}
+
+
+def coerce_weekday(values: pd.Series) -> pd.Series:
+    """
+    Weekday as int8 codes (Monday=0) from codes or day names (legacy rows).
+    Unknown values become NaN, in which case the result stays float32.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        codes = values.astype("float32")
+    else:
+        codes = values.astype(str).str.strip().map(_WEEKDAY_CODES).astype("float32")
+        # day names mixed with numeric strings (e.g. after a CSV round trip)
+        numeric = pd.to_numeric(values, errors="coerce").astype("float32")
+        codes = codes.fillna(numeric)
+
+    codes = codes.where(codes.between(0, 6))
+    return codes.astype("int8") if codes.notna().all() else codes
+
+
+def enforce_daily_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast a daily feature frame (optionally with labels / location_id) to the typed schema."""
+    df = df.copy()
+
+    if "event_time" in df.columns:
+        df["event_time"] = pd.to_datetime(df["event_time"], errors="coerce", utc=True).astype("datetime64[ns, UTC]")
+
+    for c in POLLUTANT_COLUMNS + [c for c in df.columns if c.startswith("label_")]:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("float32")
+
+    if "weekday" in df.columns:
+        df["weekday"] = coerce_weekday(df["weekday"])
+    elif "event_time" in df.columns and df["event_time"].notna().all():
+        df["weekday"] = df["event_time"].dt.dayofweek.astype("int8")
+
+    if "location_id" in df.columns:
+        df["location_id"] = df["location_id"].astype("category")
+
+    return df
+
+
+def feature_matrix(df: pd.DataFrame) -> np.ndarray:
+    """float32 model input in MODEL_FEATURES order (no string mapping needed)."""
+    return df[MODEL_FEATURES].to_numpy(dtype=np.float32)
+
+
+def _find_feature_group(fs, version: int):
+    """The feature group handle, or None if that version does not exist."""
+    try:
+        return fs.get_feature_group(FEATURE_FG_NAME, version=version)
+    except Exception:
+        return None
+
+
+def migrate_feature_group():
+    """
+    Copy the v1 rows that v2 does not have yet, with the typed schema.
+
+    Safe to run before every upload: a no-op when there is no v1 or v2
+    already holds every v1 day, and it never overwrites a day v2 already
+    has (those rows are newer than the frozen v1 copy).
+    """
+    from src.feature_store_upload import get_feature_group
+    from src.fg_writer import insert_with_retries
+    from src.storage import get_feature_store, read_feature_group
+
+    fs = get_feature_store()
+    old = _find_feature_group(fs, LEGACY_FEATURE_FG_VERSION)
+    if old is None:
+        print(f"No {FEATURE_FG_NAME} v{LEGACY_FEATURE_FG_VERSION}; nothing to migrate.")
+        return
+
+    df = enforce_daily_schema(read_feature_group(old, DAILY_COLUMNS))
+    df = df.dropna(subset=["event_time"]).sort_values("event_time").reset_index(drop=True)
+
+    new = _find_feature_group(fs, FEATURE_FG_VERSION)
+    if new is not None:
+        have = pd.to_datetime(read_feature_group(new, ["event_time"])["event_time"], errors="coerce", utc=True)
+        df = df[~df["event_time"].isin(have)].reset_index(drop=True)
+    if df.empty:
+        print(f"✅ {FEATURE_FG_NAME} v{FEATURE_FG_VERSION} already has every v{LEGACY_FEATURE_FG_VERSION} row")
+        return
+
+    print(f"Migrating {len(df)} rows: {FEATURE_FG_NAME} v{LEGACY_FEATURE_FG_VERSION} -> v{FEATURE_FG_VERSION}")
+    print(df.dtypes.to_string())
+    insert_with_retries(get_feature_group(fs), df)
+    print("✅ Migration completed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daily feature schema utilities.")
+    parser.add_argument("--migrate", action="store_true", help="copy feature group v1 into v2 (typed)")
+    args = parser.parse_args()
+
+    if args.migrate:
+        migrate_feature_group()
+    else:
+        parser.print_help()
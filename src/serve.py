@@ -0,0 +1,359 @@
+# src/serve.py
+"""
+On-demand AQI forecasts for arbitrary coordinates over HTTP.
+
+    python -m src.serve --port 8000            # live Open-Meteo features
+    python -m src.serve --port 8000 --stub     # synthetic features, no network
+
+    GET  /predict?lat=24.86&lon=67.00  -> 1/2/3-day forecast for that point
+    GET  /metrics                      -> request count, p50/p90/p99 latency, batch sizes
+    GET  /health
+    POST /reload                       -> pick up newly registered model versions
+
+- the aqi_xgb_day* models are loaded once (through model_cache) and stay resident
+- daily features per location come from fetch_daily_features and are kept
+  for FEATURE_TTL_S (they only change once per day), for at most
+  FEATURE_CACHE_SIZE locations (least recently used go first)
+- concurrent cold misses for the same location share ONE fetch
+- concurrent requests are merged by a micro-batcher: it waits at most
+  MAX_WAIT_MS for up to MAX_BATCH rows, then runs ONE predict per model;
+  a request that gets no score within PREDICT_TIMEOUT_S answers 503
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from src.batch_inference import MODELS, _feature_matrix, _predict_matrix
+from src.data_fetcher import fetch_daily_features, location_id, set_data_source
+from src.model_cache import load_latest_model
+from src.storage import get_model_registry
+
+FEATURE_DAYS = 4
+FEATURE_TTL_S = 600
+FEATURE_CACHE_SIZE = 10_000  # locations; any lat/lon is accepted, so the cache must be bounded
+MAX_BATCH = 64
+MAX_WAIT_MS = 5.0
+PREDICT_TIMEOUT_S = 10.0
+LATENCY_WINDOW = 10_000  # latest requests kept for percentiles
+
+
+class ScoringTimeout(RuntimeError):
+    """The micro-batcher did not score a request in time."""
+
+
+class MicroBatcher:
+    """Collects single feature rows from many threads and scores them together."""
+
+    def __init__(self, predict_fn, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.batches = 0
+        self.rows = 0
+        self._queue: queue.Queue = queue.Queue()
+        threading.Thread(target=self._loop, name="micro-batcher", daemon=True).start()
+
+    def submit(self, x: np.ndarray) -> Future:
+        fut = Future()
+        self._queue.put((x, fut))
+        return fut
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            # a bad row fails its own batch only; this thread must never die
+            try:
+                out = self.predict_fn(np.vstack([x for x, _ in batch]))
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                for i, (_, fut) in enumerate(batch):
+                    if not fut.done():
+                        fut.set_result(out[i])
+            self.batches += 1
+            self.rows += len(batch)
+
+
+class ForecastService:
+    def __init__(
+        self,
+        feature_ttl_s: float = FEATURE_TTL_S,
+        max_batch: int = MAX_BATCH,
+        max_wait_ms: float = MAX_WAIT_MS,
+        predict_timeout_s: float = PREDICT_TIMEOUT_S,
+        feature_cache_size: int = FEATURE_CACHE_SIZE,
+    ):
+        self.feature_ttl_s = feature_ttl_s
+        self.predict_timeout_s = predict_timeout_s
+        self.feature_cache_size = feature_cache_size
+        self._models: list[tuple] = []
+        # location_id -> (fetched at, row, x), least recently used first
+        self._features: OrderedDict[str, tuple[float, pd.DataFrame, np.ndarray]] = OrderedDict()
+        self._inflight: dict[str, Future] = {}  # location_id -> fetch in progress
+        self._lock = threading.Lock()
+        self._latencies_ms: deque = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.errors = 0
+        self.feature_hits = 0
+        self.feature_misses = 0
+        self.feature_shared = 0
+
+        self.load_models()
+        self.batcher = MicroBatcher(self._predict_batch, max_batch=max_batch, max_wait_ms=max_wait_ms)
+
+    # ---------- models ----------
+    def load_models(self):
+        """(Re)load the latest version of every horizon model; swapped in atomically."""
+        mr = get_model_registry()
+        models = []
+        for model_name, horizon in MODELS:
+            clf, version = load_latest_model(mr, model_name)
+            models.append((model_name, horizon, clf, version))
+            print(f"✅ Loaded {model_name} v{version}")
+        self._models = models
+
+    def _predict_batch(self, X: np.ndarray) -> np.ndarray:
+        models = self._models
+        return np.column_stack([_predict_matrix(clf, X) for _, _, clf, _ in models])
+
+    # ---------- features ----------
+    def features(self, lat: float, lon: float) -> tuple[pd.DataFrame, np.ndarray]:
+        """
+        (latest daily feature row, its 1 x n feature matrix), cached per location.
+        Concurrent misses for one location wait on a single fetch.
+        """
+        key = location_id(lat, lon)
+        with self._lock:
+            hit = self._features.get(key)
+            if hit is not None and time.monotonic() - hit[0] < self.feature_ttl_s:
+                self.feature_hits += 1
+                self._features.move_to_end(key)
+                return hit[1], hit[2]
+            pending = self._inflight.get(key)
+            if pending is None:
+                self.feature_misses += 1
+                self._inflight[key] = fut = Future()
+            else:
+                self.feature_shared += 1
+
+        if pending is not None:
+            return pending.result()
+
+        try:
+            daily = fetch_daily_features(lat, lon, days=FEATURE_DAYS)
+            rows, X = _feature_matrix(daily.sort_values("event_time"))
+            if len(X) == 0:
+                raise RuntimeError(f"No complete feature rows for {key}.")
+            row, x = rows.iloc[-1:], X[-1:]
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            fut.set_exception(e)
+            raise
+
+        with self._lock:
+            self._store_features(key, row, x)
+            del self._inflight[key]
+        fut.set_result((row, x))
+        return row, x
+
+    def _store_features(self, key: str, row: pd.DataFrame, x: np.ndarray):
+        """Insert under self._lock; drops expired entries, then LRU ones over the cap."""
+        now = time.monotonic()
+        self._features[key] = (now, row, x)
+        self._features.move_to_end(key)
+        expired = [k for k, (t, _, _) in self._features.items() if now - t >= self.feature_ttl_s]
+        for k in expired:
+            del self._features[k]
+        while len(self._features) > self.feature_cache_size:
+            self._features.popitem(last=False)
+
+    # ---------- requests ----------
+    def predict(self, lat: float, lon: float) -> dict:
+        row, x = self.features(lat, lon)
+        try:
+            preds = self.batcher.submit(x).result(timeout=self.predict_timeout_s)
+        except FutureTimeoutError:
+            raise ScoringTimeout(f"no score within {self.predict_timeout_s:g}s") from None
+
+        # same anchoring as batch inference: features dated D -> run anchored at D + 1
+        feature_time = pd.Timestamp(row["event_time"].iloc[0])
+        if feature_time.tz is None:
+            feature_time = feature_time.tz_localize("UTC")
+        anchor = feature_time.normalize() + pd.Timedelta(days=1)
+        models = self._models
+        return {
+            "location_id": location_id(lat, lon),
+            "source_feature_time": anchor.isoformat(),
+            "forecast": [
+                {
+                    "horizon": int(horizon),
+                    "event_time": (anchor + pd.Timedelta(days=horizon - 1)).isoformat(),
+                    "predicted_aqi": float(preds[i]),
+                    "model_name": model_name,
+                    "model_version": int(version),
+                }
+                for i, (model_name, horizon, _, version) in enumerate(models)
+            ],
+        }
+
+    def record(self, elapsed_ms: float, ok: bool):
+        with self._lock:
+            self.requests += 1
+            self.errors += 0 if ok else 1
+            self._latencies_ms.append(elapsed_ms)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lat = np.asarray(self._latencies_ms, dtype=np.float64)
+            out = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "feature_cache": {
+                    "hits": self.feature_hits,
+                    "misses": self.feature_misses,
+                    "shared_fetches": self.feature_shared,
+                    "size": len(self._features),
+                },
+            }
+        if len(lat):
+            p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+            out["latency_ms"] = {
+                "p50": round(float(p50), 3),
+                "p90": round(float(p90), 3),
+                "p99": round(float(p99), 3),
+                "mean": round(float(lat.mean()), 3),
+                "window": int(len(lat)),
+            }
+        b = self.batcher
+        out["batches"] = {"count": b.batches, "mean_size": round(b.rows / b.batches, 2) if b.batches else 0.0}
+        out["models"] = {name: int(version) for name, _, _, version in self._models}
+        return out
+
+
+def make_handler(service: ForecastService):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                return self._send(200, {"status": "ok"})
+            if url.path == "/metrics":
+                return self._send(200, service.metrics())
+            if url.path != "/predict":
+                return self._send(404, {"error": f"unknown path {url.path}"})
+
+            t0 = time.perf_counter()
+            try:
+                qs = parse_qs(url.query)
+                lat, lon = float(qs["lat"][0]), float(qs["lon"][0])
+            except (KeyError, ValueError):
+                return self._send(400, {"error": "expected /predict?lat=<float>&lon=<float>"})
+
+            try:
+                payload = service.predict(lat, lon)
+            except ScoringTimeout as e:
+                service.record((time.perf_counter() - t0) * 1000.0, ok=False)
+                return self._send(503, {"error": str(e)})
+            except Exception as e:
+                service.record((time.perf_counter() - t0) * 1000.0, ok=False)
+                return self._send(500, {"error": repr(e)})
+
+            service.record((time.perf_counter() - t0) * 1000.0, ok=True)
+            self._send(200, payload)
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/reload":
+                return self._send(404, {"error": f"unknown path {self.path}"})
+            service.load_models()
+            self._send(200, {"models": service.metrics()["models"]})
+
+        def log_message(self, format, *args):
+            pass  # per-request logging would dominate latency; see /metrics
+
+    return Handler
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    stub: bool = False,
+    feature_ttl_s: float = FEATURE_TTL_S,
+    max_batch: int = MAX_BATCH,
+    max_wait_ms: float = MAX_WAIT_MS,
+    predict_timeout_s: float = PREDICT_TIMEOUT_S,
+):
+    if stub:
+        set_data_source("synthetic")
+        print("⚠️ Using synthetic features (stub data source)")
+
+    service = ForecastService(
+        feature_ttl_s=feature_ttl_s,
+        max_batch=max_batch,
+        max_wait_ms=max_wait_ms,
+        predict_timeout_s=predict_timeout_s,
+    )
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    print(f"✅ Serving forecasts on http://{host}:{port}/predict?lat=..&lon=..")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(service.metrics(), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve on-demand AQI forecasts over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--stub", action="store_true", help="synthetic features instead of Open-Meteo")
+    parser.add_argument("--feature-ttl", type=float, default=FEATURE_TTL_S, help="feature cache TTL (s)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--predict-timeout", type=float, default=PREDICT_TIMEOUT_S, help="503 after this many seconds")
+    args = parser.parse_args()
+
+    serve(
+        host=args.host,
+        port=args.port,
+        stub=args.stub,
+        feature_ttl_s=args.feature_ttl,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+        predict_timeout_s=args.predict_timeout,
+    )
@@ -0,0 +1,64 @@
+# src/storage.py
+"""
+Pluggable storage backend.
+
+AQI_STORAGE_BACKEND=hopsworks (default) talks to Hopsworks;
+AQI_STORAGE_BACKEND=local uses the file-based store in src/local_store.py,
+so the whole pipeline runs offline.
+"""
+from src.config import settings
+from src.local_store import LocalFeatureGroup, LocalFeatureStore, LocalModelRegistry
+
+
+def is_local() -> bool:
+    return settings.storage.backend == "local"
+
+
+def get_feature_store():
+    if is_local():
+        return LocalFeatureStore(settings.storage.local_dir)
+
+    from src.hopsworks_client import get_session
+
+    return get_session().call(lambda session: session.feature_store())
+
+
+def get_model_registry():
+    if is_local():
+        return LocalModelRegistry(settings.storage.local_dir)
+
+    from src.hopsworks_client import get_session
+
+    return get_session().call(lambda session: session.model_registry())
+
+
+def reconnect():
+    """Drop the cached Hopsworks session so the next call logs in again."""
+    if is_local():
+        return
+
+    from src.hopsworks_client import get_session
+
+    get_session().invalidate()
+
+
+def read_feature_group(
+    fg,
+    columns: list[str] | None = None,
+    start_time=None,
+    end_time=None,
+    time_column: str = "event_time",
+):
+    """
+    Read `columns` of `fg` with an inclusive time window on `time_column`.
+    Column selection and the time filter are pushed down to the backend.
+    """
+    if isinstance(fg, LocalFeatureGroup):
+        return fg.read(columns=columns, start_time=start_time, end_time=end_time)
+
+    query = fg.select(columns) if columns else fg.select_all()
+    if start_time is not None:
+        query = query.filter(fg.get_feature(time_column) >= start_time)
+    if end_time is not None:
+        query = query.filter(fg.get_feature(time_column) <= end_time)
+    return query.read()
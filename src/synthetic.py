@@ -0,0 +1,96 @@
+# src/synthetic.py
+"""
+Synthetic Open-Meteo air-quality payloads.
+
+Used as a stub data source (AQI_DATA_SOURCE=synthetic or
+data_fetcher.set_data_source("synthetic")) so the pipeline, the serving
+process and the benchmarks run without network access.
+
+Values are a deterministic function of (location, hour): seasonal + diurnal
+cycles plus hash noise, so any two requests for the same hour agree no
+matter which date range they asked for.
+"""
+import zlib
+from datetime import date
+
+import numpy as np
+
+# typical level of each Open-Meteo hourly variable (µg/m³, AQI for european_aqi)
+BASE_LEVELS = {
+    "european_aqi": 60.0,
+    "pm10": 80.0,
+    "pm2_5": 40.0,
+    "ozone": 60.0,
+    "nitrogen_dioxide": 20.0,
+    "sulphur_dioxide": 8.0,
+    "carbon_monoxide": 300.0,
+}
+
+HOURS_PER_YEAR = 24 * 365.25
+
+
+def _noise(hours: np.ndarray, seed: int) -> np.ndarray:
+    """Stateless pseudo-random noise in [-1, 1) per hour (sine hash)."""
+    x = np.sin(hours * 12.9898 + seed * 78.233) * 43758.5453
+    return 2.0 * (x - np.floor(x)) - 1.0
+
+
+def _location_seed(lat: float, lon: float) -> int:
+    return zlib.crc32(f"{lat:.4f},{lon:.4f}".encode()) % 10_000
+
+
+def synthetic_hourly(
+    lat: float,
+    lon: float,
+    start_date: str,
+    end_date: str,
+    hourly_vars: str = ",".join(BASE_LEVELS),
+    missing_rate: float = 0.0,
+) -> dict:
+    """Hourly payload (the `hourly` object of an Open-Meteo response) for [start_date, end_date]."""
+    start = np.datetime64(date.fromisoformat(start_date), "h")
+    end = np.datetime64(date.fromisoformat(end_date), "h") + 24
+    times = np.arange(start, end, dtype="datetime64[h]")
+    hours = times.astype(np.int64).astype(np.float64)
+
+    seed = _location_seed(lat, lon)
+    # dirtier air further from the equator / inland, purely for variety
+    level = 1.0 + 0.3 * np.sin(np.radians(lat) * 3.0) + 0.2 * np.cos(np.radians(lon) * 2.0)
+    season = 1.0 + 0.35 * np.cos(2 * np.pi * hours / HOURS_PER_YEAR)
+    diurnal = 1.0 + 0.2 * np.sin(2 * np.pi * (hours % 24) / 24.0 - 1.0)
+
+    hourly = {"time": np.datetime_as_string(times, unit="m").tolist()}
+    for i, var in enumerate(hourly_vars.split(",")):
+        base = BASE_LEVELS.get(var, 50.0)
+        weather = 1.0 + 0.25 * np.sin(2 * np.pi * hours / (24 * (5 + i)) + seed)
+        values = base * level * season * diurnal * weather * (1.0 + 0.15 * _noise(hours, seed + i))
+        values = np.round(np.maximum(values, 0.0), 1)
+        if missing_rate > 0:
+            # JSON nulls, like the real API sends for gaps
+            values = values.astype(object)
+            values[_noise(hours, seed + 100 + i) < 2 * missing_rate - 1] = None
+        hourly[var] = values.tolist()
+    return hourly
+
+
+def air_quality_response(params: dict) -> dict | list[dict]:
+    """Stand-in for the Open-Meteo /air-quality call, including the multi-coordinate form."""
+    lats = [float(x) for x in str(params["latitude"]).split(",")]
+    lons = [float(x) for x in str(params["longitude"]).split(",")]
+    payloads = [
+        {
+            "latitude": lat,
+            "longitude": lon,
+            "hourly": synthetic_hourly(lat, lon, params["start_date"], params["end_date"], params["hourly"]),
+        }
+        for lat, lon in zip(lats, lons)
+    ]
+    return payloads if len(payloads) > 1 else payloads[0]
+
+
+def synthetic_locations(n: int, seed: int = 0) -> list[tuple[float, float]]:
+    """`n` distinct coordinates spread over roughly the Pakistan / Gulf region."""
+    rng = np.random.default_rng(seed)
+    lats = np.round(rng.uniform(20.0, 37.0, n), 4)
+    lons = np.round(rng.uniform(55.0, 77.0, n), 4)
+    return list(zip(lats.tolist(), lons.tolist()))
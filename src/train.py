@@ -1,44 +1,50 @@
 # src/train.py
 import os
 import json
-import joblib
+import time
+import argparse
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
-from xgboost import XGBRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, mean_squared_error
+# xgboost / sklearn / threadpoolctl are imported inside the functions that fit
+# or score models, so importing this module (e.g. for its constants) stays cheap
 
-from src.hopsworks_client import get_hopsworks_project
+from src.metrics import current, instrumented, stage
+from src.schema import enforce_daily_schema
+from src.storage import get_model_registry
+from src.training_dataset import load_training_data
 
 ARTIFACT_DIR = "artifacts"
-TRAIN_DATA_PATH = os.path.join(ARTIFACT_DIR, "train_data.parquet")
 
 LABELS = ["label_aqi_day1", "label_aqi_day2", "label_aqi_day3"]
 MIN_ROWS_FOR_TRAINING = 30
 
-WEEKDAY_MAP = {
-    "Monday": 0, "Tuesday": 1, "Wednesday": 2, "Thursday": 3,
-    "Friday": 4, "Saturday": 5, "Sunday": 6,
+# written by `python -m src.tune`
+BEST_PARAMS_PATH = os.path.join(ARTIFACT_DIR, "best_params.json")
+
+XGB_DEFAULT_PARAMS = {
+    "aqi_xgb_day1": dict(n_estimators=400, max_depth=4, learning_rate=0.07, subsample=0.9, colsample_bytree=0.9),
+    "aqi_xgb_day2": dict(n_estimators=450, max_depth=4, learning_rate=0.06, subsample=0.9, colsample_bytree=0.9),
+    "aqi_xgb_day3": dict(n_estimators=450, max_depth=4, learning_rate=0.06, subsample=0.9, colsample_bytree=0.9),
 }
 
+# CPU budget shared by all model fits (AQI_TRAIN_PARALLEL=1 runs fits concurrently)
+TRAIN_CPUS = int(os.getenv("AQI_TRAIN_CPUS", str(os.cpu_count() or 1)))
+TRAIN_PARALLEL = os.getenv("AQI_TRAIN_PARALLEL", "0") == "1"
+
+
 def rmse(y_true, y_pred) -> float:
+    from sklearn.metrics import mean_squared_error
+
     return mean_squared_error(y_true, y_pred) ** 0.5
 
 
 def _prep_df(df: pd.DataFrame) -> pd.DataFrame:
-    # keep event_time string
-    df["event_time"] = pd.to_datetime(df["event_time"], errors="coerce").dt.date.astype(str)
+    # typed schema: float32 features/labels, int8 weekday (legacy day names mapped once here)
+    df = enforce_daily_schema(df).dropna(subset=["event_time"])
 
-    # weekday numeric
-    if "weekday" in df.columns:
-        df["weekday"] = df["weekday"].astype(str).str.strip().map(WEEKDAY_MAP)
-
-    # force numeric for all non-date columns except weekday (already numeric)
-    for c in df.columns:
-        if c not in ["event_time", "weekday"]:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
+    # keep event_time string
+    df["event_time"] = df["event_time"].dt.date.astype(str)
 
     df = df.dropna().reset_index(drop=True)
     return df
@@ -50,6 +56,8 @@ def _train_one_model(model, X_train, y_train):
 
 
 def _eval(model, X_val, y_val, X_test, y_test, name: str):
+    from sklearn.metrics import mean_absolute_error
+
     out = {}
     if len(X_val) > 0:
         pred = model.predict(X_val)
@@ -64,19 +72,135 @@ def _eval(model, X_val, y_val, X_test, y_test, name: str):
 
 
 def _register_model_to_hopsworks(model_path: str, model_name: str, description: str):
-    project = get_hopsworks_project()
-    mr = project.get_model_registry()
+    with stage("register", model=model_name) as m:
+        m.bytes = os.path.getsize(model_path)
+        mr = get_model_registry()
 
-    hw_model = mr.python.create_model(name=model_name, description=description)
-    hw_model.save(model_path)  # auto new version
+        hw_model = mr.python.create_model(name=model_name, description=description)
+        hw_model.save(model_path)  # auto new version
     print(f"✅ Registered: {model_name} ({model_path})")
 
 
-def train_and_register():
-    if not os.path.exists(TRAIN_DATA_PATH):
-        raise RuntimeError("artifacts/train_data.parquet not found. Run: python -m src.training_dataset")
+def _xgb_params(model_name: str) -> dict:
+    """Hard-coded defaults, overridden by `python -m src.tune` results when present."""
+    params = dict(XGB_DEFAULT_PARAMS[model_name])
+    if os.path.exists(BEST_PARAMS_PATH):
+        with open(BEST_PARAMS_PATH) as f:
+            tuned = json.load(f).get(model_name, {})
+        params.update({k: v for k, v in tuned.items() if k != "cv_rmse"})
+    return params
+
 
-    df = pd.read_parquet(TRAIN_DATA_PATH)
+MODEL_NAMES = ["aqi_lr_day1", "aqi_rf_day1", "aqi_xgb_day1", "aqi_xgb_day2", "aqi_xgb_day3"]
+
+# linear regression fits single-threaded; every other spec scales with n_jobs
+SINGLE_THREADED_MODELS = {"aqi_lr_day1"}
+
+
+def _model_specs(n_jobs: int | dict) -> list[tuple]:
+    """
+    (model name, label column, estimator, registry description) for every model we train.
+    `n_jobs` is one thread count for all specs or a {model name: threads} map.
+    """
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+    from xgboost import XGBRegressor
+
+    if isinstance(n_jobs, dict):
+        threads = n_jobs
+    else:
+        threads = {name: n_jobs for name in MODEL_NAMES}
+
+    return [
+        ("aqi_lr_day1", "label_aqi_day1", LinearRegression(), "Linear Regression day1 AQI"),
+        (
+            "aqi_rf_day1", "label_aqi_day1",
+            RandomForestRegressor(n_estimators=300, random_state=42, n_jobs=threads["aqi_rf_day1"]),
+            "RandomForest day1 AQI",
+        ),
+        (
+            "aqi_xgb_day1", "label_aqi_day1",
+            XGBRegressor(**_xgb_params("aqi_xgb_day1"), random_state=42, n_jobs=threads["aqi_xgb_day1"]),
+            "XGBoost day1 AQI",
+        ),
+        (
+            "aqi_xgb_day2", "label_aqi_day2",
+            XGBRegressor(**_xgb_params("aqi_xgb_day2"), random_state=42, n_jobs=threads["aqi_xgb_day2"]),
+            "XGBoost day2 AQI",
+        ),
+        (
+            "aqi_xgb_day3", "label_aqi_day3",
+            XGBRegressor(**_xgb_params("aqi_xgb_day3"), random_state=42, n_jobs=threads["aqi_xgb_day3"]),
+            "XGBoost day3 AQI",
+        ),
+    ]
+
+
+def _thread_shares(cpus: int, workers: int) -> dict:
+    """
+    Split the CPU budget between concurrent fits: single-threaded specs get
+    one thread, the rest share what is left, remainder to the first specs
+    (RF, then XGBoost) so no core sits idle.
+    """
+    if workers == 1:
+        return {name: cpus for name in MODEL_NAMES}
+    shares = {name: 1 for name in MODEL_NAMES}
+    threaded = [name for name in MODEL_NAMES if name not in SINGLE_THREADED_MODELS]
+    spare = max(0, cpus - len(MODEL_NAMES))
+    for i, name in enumerate(threaded):
+        shares[name] += spare // len(threaded) + (1 if i < spare % len(threaded) else 0)
+    return shares
+
+
+def _fit_timed(name: str, model, X_train, y_train):
+    t0 = time.perf_counter()
+    model = _train_one_model(model, X_train, y_train)
+    elapsed = time.perf_counter() - t0
+    print(f"⏱️ {name} fitted in {elapsed:.2f}s")
+    return name, model, elapsed
+
+
+def _fit_models(X_train, y_train_by_label: dict, parallel: bool, cpus: int) -> tuple[dict, dict]:
+    """
+    Fit every model spec. Returns ({name: model}, {name: seconds}).
+
+    Serial mode gives each fit the whole CPU budget. Parallel mode runs the
+    independent fits concurrently and splits the budget between them;
+    threadpool_limits caps BLAS/OpenMP pools so XGBoost threads and RF
+    workers don't oversubscribe the machine.
+    """
+    from threadpoolctl import threadpool_limits
+
+    workers = min(len(MODEL_NAMES), cpus) if parallel else 1
+    threads = _thread_shares(cpus, workers)
+    specs = _model_specs(threads)
+
+    models, timings = {}, {}
+    with threadpool_limits(limits=max(threads.values())):
+        if workers == 1:
+            results = [_fit_timed(name, est, X_train, y_train_by_label[label]) for name, label, est, _ in specs]
+        else:
+            print(f"Training {len(specs)} models on {workers} workers, threads {threads}")
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_fit_timed, name, est, X_train, y_train_by_label[label])
+                    for name, label, est, _ in specs
+                ]
+                results = [f.result() for f in futures]
+
+    for name, model, elapsed in results:
+        models[name] = model
+        timings[name] = elapsed
+    return models, timings
+
+
+@instrumented("train")
+def train_and_register(parallel: bool = False, cpus: int | None = None):
+    from sklearn.model_selection import train_test_split
+
+    cpus = cpus or TRAIN_CPUS
+
+    df = load_training_data()
     df = _prep_df(df)
 
     # must have labels
@@ -84,6 +208,7 @@ def train_and_register():
         if lab not in df.columns:
             raise RuntimeError(f"{lab} missing. Rebuild training dataset.")
 
+    current().rows_in = len(df)
     if len(df) < MIN_ROWS_FOR_TRAINING:
         raise RuntimeError(f"Too few rows for training: {len(df)}. Need at least {MIN_ROWS_FOR_TRAINING}.")
 
@@ -91,88 +216,63 @@ def train_and_register():
     X = df.drop(columns=["event_time"] + LABELS)
     # (event_time is not a model feature; labels must never be in X)
 
-    # split once, reuse
+    # split once, reuse -- chronologically (rows are sorted by event_time),
+    # so validation/test never sit before training rows
     X_train, X_tmp, idx_train, idx_tmp = train_test_split(
-        X, df.index, test_size=0.33, random_state=42
+        X, df.index, test_size=0.33, shuffle=False
     )
     X_val, X_test, idx_val, idx_test = train_test_split(
-        X_tmp, idx_tmp, test_size=0.5, random_state=42
+        X_tmp, idx_tmp, test_size=0.5, shuffle=False
     )
 
-    metrics = {}
-
-    # --- Day 1: 3 models ---
-    y1 = df["label_aqi_day1"].astype(float)
-    y1_train, y1_val, y1_test = y1.loc[idx_train], y1.loc[idx_val], y1.loc[idx_test]
+    y = {lab: df[lab].astype(float) for lab in LABELS}
+    y_train = {lab: y[lab].loc[idx_train] for lab in LABELS}
 
-    lr = _train_one_model(LinearRegression(), X_train, y1_train)
-    rf = _train_one_model(RandomForestRegressor(n_estimators=300, random_state=42), X_train, y1_train)
-    xgb1 = _train_one_model(
-        XGBRegressor(
-            n_estimators=400, max_depth=4, learning_rate=0.07,
-            subsample=0.9, colsample_bytree=0.9, random_state=42
-        ),
-        X_train, y1_train
-    )
+    t0 = time.perf_counter()
+    models, timings = _fit_models(X_train, y_train, parallel=parallel, cpus=cpus)
+    fit_total = time.perf_counter() - t0
 
     os.makedirs(ARTIFACT_DIR, exist_ok=True)
 
-    lr_path = os.path.join(ARTIFACT_DIR, "aqi_lr_day1.joblib")
-    rf_path = os.path.join(ARTIFACT_DIR, "aqi_rf_day1.joblib")
-    xgb1_path = os.path.join(ARTIFACT_DIR, "aqi_xgb_day1.joblib")
-
-    joblib.dump(lr, lr_path)
-    joblib.dump(rf, rf_path)
-    joblib.dump(xgb1, xgb1_path)
-
-    metrics["aqi_lr_day1"] = _eval(lr, X_val, y1_val, X_test, y1_test, "aqi_lr_day1")
-    metrics["aqi_rf_day1"] = _eval(rf, X_val, y1_val, X_test, y1_test, "aqi_rf_day1")
-    metrics["aqi_xgb_day1"] = _eval(xgb1, X_val, y1_val, X_test, y1_test, "aqi_xgb_day1")
-
-    _register_model_to_hopsworks(lr_path, "aqi_lr_day1", "Linear Regression day1 AQI")
-    _register_model_to_hopsworks(rf_path, "aqi_rf_day1", "RandomForest day1 AQI")
-    _register_model_to_hopsworks(xgb1_path, "aqi_xgb_day1", "XGBoost day1 AQI")
+    import joblib
 
-    # --- Day 2: XGB ---
-    y2 = df["label_aqi_day2"].astype(float)
-    y2_train, y2_val, y2_test = y2.loc[idx_train], y2.loc[idx_val], y2.loc[idx_test]
+    metrics = {}
+    for name, label, _, description in _model_specs(1):
+        model = models[name]
+        model_path = os.path.join(ARTIFACT_DIR, f"{name}.joblib")
+        joblib.dump(model, model_path)
 
-    xgb2 = _train_one_model(
-        XGBRegressor(
-            n_estimators=450, max_depth=4, learning_rate=0.06,
-            subsample=0.9, colsample_bytree=0.9, random_state=42
-        ),
-        X_train, y2_train
-    )
-    xgb2_path = os.path.join(ARTIFACT_DIR, "aqi_xgb_day2.joblib")
-    joblib.dump(xgb2, xgb2_path)
-    metrics["aqi_xgb_day2"] = _eval(xgb2, X_val, y2_val, X_test, y2_test, "aqi_xgb_day2")
-    _register_model_to_hopsworks(xgb2_path, "aqi_xgb_day2", "XGBoost day2 AQI")
-
-    # --- Day 3: XGB ---
-    y3 = df["label_aqi_day3"].astype(float)
-    y3_train, y3_val, y3_test = y3.loc[idx_train], y3.loc[idx_val], y3.loc[idx_test]
-
-    xgb3 = _train_one_model(
-        XGBRegressor(
-            n_estimators=450, max_depth=4, learning_rate=0.06,
-            subsample=0.9, colsample_bytree=0.9, random_state=42
-        ),
-        X_train, y3_train
-    )
-    xgb3_path = os.path.join(ARTIFACT_DIR, "aqi_xgb_day3.joblib")
-    joblib.dump(xgb3, xgb3_path)
-    metrics["aqi_xgb_day3"] = _eval(xgb3, X_val, y3_val, X_test, y3_test, "aqi_xgb_day3")
-    _register_model_to_hopsworks(xgb3_path, "aqi_xgb_day3", "XGBoost day3 AQI")
+        metrics[name] = _eval(
+            model, X_val, y[label].loc[idx_val], X_test, y[label].loc[idx_test], name
+        )
+        _register_model_to_hopsworks(model_path, name, description)
 
     # save metrics
     metrics_path = os.path.join(ARTIFACT_DIR, "metrics.json")
     with open(metrics_path, "w") as f:
         json.dump(metrics, f, indent=2)
 
+    timings_path = os.path.join(ARTIFACT_DIR, "train_timings.json")
+    with open(timings_path, "w") as f:
+        json.dump(
+            {"parallel": parallel, "cpus": cpus, "fit_seconds": timings, "fit_total_seconds": fit_total},
+            f,
+            indent=2,
+        )
+
     print(f"✅ Saved metrics comparison: {metrics_path}")
     print(json.dumps(metrics, indent=2))
 
+    print("\n⏱️ Fit wall-clock per model:")
+    for name, elapsed in timings.items():
+        print(f"  {name:<14} {elapsed:8.2f}s")
+    print(f"  {'TOTAL':<14} {fit_total:8.2f}s ({'parallel' if parallel else 'serial'}, {cpus} CPUs)")
+
 
 if __name__ == "__main__":
-    train_and_register()
+    parser = argparse.ArgumentParser(description="Train and register the AQI models.")
+    parser.add_argument("--parallel", action="store_true", help="fit independent models concurrently")
+    parser.add_argument("--cpus", type=int, default=None, help="CPU budget (default: AQI_TRAIN_CPUS or all cores)")
+    args = parser.parse_args()
+
+    train_and_register(parallel=args.parallel or TRAIN_PARALLEL, cpus=args.cpus)
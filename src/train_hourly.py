@@ -0,0 +1,164 @@
+# src/train_hourly.py
+"""
+Hourly-resolution AQI models: one XGBoost regressor per horizon h in
+HOURLY_HORIZONS (hours ahead of the last observed hour).
+
+    features at hour t   european_aqi for the last WINDOW_HOURS hours (t-23 .. t),
+                         every other pollutant at t, hour of day, weekday
+    label                european_aqi at t + h
+
+Series come from the hourly store (memory-mapped Arrow files) and are laid
+on a gap-free hourly grid; missing hours are NaN, which XGBoost treats as
+missing. Windows are numpy sliding_window_view slices of that grid, so the
+only copy is the final float32 matrix.
+
+    python -m src.train_hourly
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.hourly_store import AQI_VAR, VARS, read_series, stored_locations
+from src.metrics import current, instrumented
+from src.train import ARTIFACT_DIR, TRAIN_CPUS, _register_model_to_hopsworks
+
+WINDOW_HOURS = 24
+HOURLY_HORIZONS = (1, 3, 6, 12, 24, 48)
+HOURLY_MODELS = [(f"aqi_xgb_hour{h}", h) for h in HOURLY_HORIZONS]
+
+TRAIN_LOOKBACK_DAYS = 365
+TEST_FRACTION = 0.2
+MIN_ROWS_FOR_TRAINING = 500
+
+XGB_HOURLY_PARAMS = dict(
+    n_estimators=300, max_depth=6, learning_rate=0.08, subsample=0.9, colsample_bytree=0.9, tree_method="hist"
+)
+
+_AQI = VARS.index(AQI_VAR)
+_OTHERS = [j for j, v in enumerate(VARS) if v != AQI_VAR]
+
+FEATURE_NAMES = (
+    [f"aqi_lag_{k}h" for k in range(WINDOW_HOURS - 1, -1, -1)]
+    + [VARS[j] for j in _OTHERS]
+    + ["hour", "weekday"]
+)
+
+METRICS_PATH = os.path.join(ARTIFACT_DIR, "hourly_metrics.json")
+
+
+def hourly_grid(times: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Place (times, values) on a gap-free hourly grid; missing hours become NaN rows."""
+    hours = times.astype("datetime64[h]")
+    if len(hours) == 0:
+        return hours, values
+    grid_t = np.arange(hours.min(), hours.max() + 1)
+    grid = np.full((len(grid_t), values.shape[1]), np.nan, dtype=np.float32)
+    grid[(hours - grid_t[0]).astype(np.int64)] = values
+    return grid_t, grid
+
+
+def window_features(grid_t: np.ndarray, grid: np.ndarray, anchors: np.ndarray) -> np.ndarray:
+    """float32 features for grid positions `anchors` (each >= WINDOW_HOURS - 1)."""
+    lags = sliding_window_view(grid[:, _AQI], WINDOW_HOURS)[anchors - (WINDOW_HOURS - 1)]
+    t = grid_t[anchors].astype(np.int64)  # hours since epoch
+    hour = (t % 24).astype(np.float32)
+    weekday = ((t // 24 + 3) % 7).astype(np.float32)  # 1970-01-01 was a Thursday; Monday=0
+    return np.column_stack([lags, grid[anchors][:, _OTHERS], hour, weekday]).astype(np.float32, copy=False)
+
+
+def training_windows(times: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, dict, np.ndarray]:
+    """(X, {horizon: y}, anchor hours) for every hour with an observed AQI and a full lag window."""
+    grid_t, grid = hourly_grid(times, values)
+    aqi = grid[:, _AQI]
+    anchors = np.arange(WINDOW_HOURS - 1, len(grid_t))
+    anchors = anchors[~np.isnan(aqi[anchors])]
+
+    X = window_features(grid_t, grid, anchors)
+    Y = {}
+    for h in HOURLY_HORIZONS:
+        y = np.full(len(anchors), np.nan, dtype=np.float32)
+        ok = anchors + h < len(aqi)
+        y[ok] = aqi[anchors[ok] + h]
+        Y[h] = y
+    return X, Y, grid_t[anchors]
+
+
+def load_training_windows(lookback_days: int = TRAIN_LOOKBACK_DAYS) -> tuple[np.ndarray, dict, np.ndarray]:
+    """Training windows of every stored location, stacked."""
+    start = pd.Timestamp.now().normalize() - pd.Timedelta(days=lookback_days)
+    parts = [training_windows(*read_series(loc, start=start)) for loc in stored_locations()]
+    parts = [p for p in parts if len(p[0])]
+    if not parts:
+        raise RuntimeError("Hourly store is empty. Run: python -m src.hourly_store --days 365")
+
+    X = np.concatenate([p[0] for p in parts])
+    Y = {h: np.concatenate([p[1][h] for p in parts]) for h in HOURLY_HORIZONS}
+    t = np.concatenate([p[2] for p in parts])
+    return X, Y, t
+
+
+@instrumented("hourly_train")
+def train_hourly_models(cpus: int | None = None, register: bool = True) -> dict:
+    """Fit, evaluate (chronological hold-out) and register one model per hourly horizon."""
+    import joblib
+    from xgboost import XGBRegressor
+
+    cpus = cpus or TRAIN_CPUS
+    X, Y, t = load_training_windows()
+    current().rows_in = len(X)
+    print(f"Hourly training windows: {X.shape[0]} x {X.shape[1]} features")
+    if len(X) < MIN_ROWS_FOR_TRAINING:
+        raise RuntimeError(f"Too few hourly windows: {len(X)}. Need at least {MIN_ROWS_FOR_TRAINING}.")
+
+    # hold out the latest TEST_FRACTION of hours; a training label must not reach into it
+    hours = t.astype(np.int64)
+    cut = np.quantile(hours, 1 - TEST_FRACTION)
+
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    metrics = {}
+    for name, h in HOURLY_MODELS:
+        y = Y[h]
+        labelled = ~np.isnan(y)
+        train = labelled & (hours + h < cut)
+        test = labelled & (hours >= cut)
+
+        model = XGBRegressor(**XGB_HOURLY_PARAMS, random_state=42, n_jobs=cpus)
+        t0 = time.perf_counter()
+        model.fit(X[train], y[train])
+        elapsed = time.perf_counter() - t0
+
+        err = model.predict(X[test]).astype(np.float64) - y[test]
+        metrics[name] = {
+            "horizon_h": h,
+            "test_mae": float(np.abs(err).mean()) if len(err) else None,
+            "test_rmse": float(np.sqrt((err ** 2).mean())) if len(err) else None,
+            "train_rows": int(train.sum()),
+            "test_rows": int(test.sum()),
+            "fit_seconds": round(elapsed, 3),
+        }
+        print(f"⏱️ {name} fitted in {elapsed:.2f}s: {metrics[name]}")
+
+        model_path = os.path.join(ARTIFACT_DIR, f"{name}.joblib")
+        joblib.dump(model, model_path)
+        if register:
+            _register_model_to_hopsworks(model_path, name, f"XGBoost AQI {h}h ahead (hourly windows)")
+
+    with open(METRICS_PATH, "w") as f:
+        json.dump(metrics, f, indent=2)
+    current().rows_out = len(metrics)
+    print(f"✅ Saved hourly metrics: {METRICS_PATH}")
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and register the hourly AQI models.")
+    parser.add_argument("--cpus", type=int, default=None, help="CPU budget (default: AQI_TRAIN_CPUS or all cores)")
+    parser.add_argument("--no-register", action="store_true", help="only fit and evaluate")
+    args = parser.parse_args()
+
+    train_hourly_models(cpus=args.cpus, register=not args.no_register)
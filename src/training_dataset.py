@@ -1,54 +1,155 @@
 # src/training_dataset.py
+import argparse
+import json
 import os
+import shutil
 import pandas as pd
 
+from src.metrics import current, instrumented
+from src.schema import DAILY_COLUMNS, FEATURE_FG_NAME, FEATURE_FG_VERSION, enforce_daily_schema
+
 ARTIFACT_DIR = "artifacts"
-TRAIN_DATA_PATH = os.path.join(ARTIFACT_DIR, "train_data.parquet")
 
-FG_NAME = "daily_aqi_features"
-FG_VERSION = 1
+# partitioned by event_time month: artifacts/train_data/YYYY-MM.parquet
+TRAIN_DATA_DIR = os.path.join(ARTIFACT_DIR, "train_data")
+WATERMARK_PATH = os.path.join(ARTIFACT_DIR, "train_data_watermark.json")
 
 # Only REAL columns (avoid broken metadata feature name)
-BASE_FEATURES = [
-    "event_time",
-    "aqi_daily",
-    "pm10_mean",
-    "pm2_5_mean",
-    "ozone_mean",
-    "no2_mean",
-    "so2_mean",
-    "co_mean",
-    "weekday",
-]
-
-def create_training_data():
-    from src.hopsworks_client import get_hopsworks_project
+BASE_FEATURES = DAILY_COLUMNS
 
-    project = get_hopsworks_project()
-    fs = project.get_feature_store()
+LABEL_HORIZONS = (1, 2, 3)
 
-    fg = fs.get_feature_group("daily_aqi_features_v2", version=1)
+# upload_daily_features re-uploads the last few days, so their values (and the
+# labels of the rows that look ahead onto them) may change after first seen
+REVISION_DAYS = 3
 
 
-    # ✅ IMPORTANT: avoid fg.read() (it selects the broken feature name)
-    df = fg.select(BASE_FEATURES).read()
-
-    # Make sure event_time is sortable
-    df["event_time"] = pd.to_datetime(df["event_time"], errors="coerce")
+def add_labels(df: pd.DataFrame) -> pd.DataFrame:
+    """Sort by event_time and add label_aqi_day{1,2,3}; rows without all labels are dropped."""
+    df = enforce_daily_schema(df)
     df = df.dropna(subset=["event_time"]).sort_values("event_time").reset_index(drop=True)
 
     # ✅ create 1/2/3 day labels
-    df["label_aqi_day1"] = df["aqi_daily"].shift(-1)
-    df["label_aqi_day2"] = df["aqi_daily"].shift(-2)
-    df["label_aqi_day3"] = df["aqi_daily"].shift(-3)
+    for h in LABEL_HORIZONS:
+        df[f"label_aqi_day{h}"] = df["aqi_daily"].shift(-h)
+
+    return df.dropna().reset_index(drop=True)
+
+
+def _month_key(ts: pd.Series) -> pd.Series:
+    return ts.dt.strftime("%Y-%m")
+
+
+def _write_partitions(df: pd.DataFrame, replace_from: pd.Timestamp | None = None):
+    """
+    Write `df` into month partitions. With `replace_from`, rows at or after
+    that time are replaced in the affected partitions; older rows are kept.
+    """
+    os.makedirs(TRAIN_DATA_DIR, exist_ok=True)
+
+    months = set(_month_key(df["event_time"]))
+    if replace_from is not None:
+        first = replace_from.strftime("%Y-%m")
+        months |= {m[:-len(".parquet")] for m in os.listdir(TRAIN_DATA_DIR)
+                   if m.endswith(".parquet") and m[:-len(".parquet")] >= first}
+
+    for month in sorted(months):
+        path = os.path.join(TRAIN_DATA_DIR, f"{month}.parquet")
+        part = df[_month_key(df["event_time"]) == month]
+
+        if replace_from is not None and os.path.exists(path):
+            old = enforce_daily_schema(pd.read_parquet(path))
+            old = old[old["event_time"] < replace_from]
+            part = pd.concat([old, part], ignore_index=True)
+
+        if part.empty:
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+
+        tmp = f"{path}.tmp"
+        enforce_daily_schema(part).sort_values("event_time").to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+
+def load_training_data() -> pd.DataFrame:
+    """All partitions of the training dataset, sorted by event_time."""
+    files = sorted(f for f in os.listdir(TRAIN_DATA_DIR) if f.endswith(".parquet")) \
+        if os.path.isdir(TRAIN_DATA_DIR) else []
+    if not files:
+        raise RuntimeError(f"{TRAIN_DATA_DIR} not found or empty. Run: python -m src.training_dataset")
 
-    df = df.dropna().reset_index(drop=True)
+    df = pd.concat([pd.read_parquet(os.path.join(TRAIN_DATA_DIR, f)) for f in files], ignore_index=True)
+    return df.sort_values("event_time").reset_index(drop=True)
 
-    os.makedirs(ARTIFACT_DIR, exist_ok=True)
-    df.to_parquet(TRAIN_DATA_PATH, index=False)
-    print(f"Saved training data: {TRAIN_DATA_PATH}")
-    print("Shape:", df.shape)
+
+def _load_watermark() -> pd.Timestamp | None:
+    """Last processed event_time, or None (-> full rebuild) if absent or from another FG version."""
+    if not os.path.exists(WATERMARK_PATH) or not os.path.isdir(TRAIN_DATA_DIR):
+        return None
+    with open(WATERMARK_PATH) as f:
+        state = json.load(f)
+    if state.get("fg_version", 1) != FEATURE_FG_VERSION:
+        print(f"Watermark is for feature group v{state.get('fg_version', 1)}; rebuilding.")
+        return None
+    ts = pd.Timestamp(state["last_event_time"])
+    return ts.tz_localize("UTC") if ts.tz is None else ts
+
+
+def _save_watermark(last_event_time: pd.Timestamp):
+    with open(WATERMARK_PATH, "w") as f:
+        json.dump({"last_event_time": last_event_time.isoformat(), "fg_version": FEATURE_FG_VERSION}, f, indent=2)
+
+
+@instrumented("dataset")
+def create_training_data(incremental: bool = True):
+    """
+    Build artifacts/train_data/.
+
+    Incremental mode (default when a watermark exists) reads only rows newer
+    than the last processed event_time minus a lookback covering re-uploaded
+    days plus the 3-day label horizon, recomputes labels for that tail and
+    rewrites only the affected month partitions.
+    """
+    from src.storage import get_feature_store, read_feature_group
+
+    fs = get_feature_store()
+    fg = fs.get_feature_group(FEATURE_FG_NAME, version=FEATURE_FG_VERSION)
+
+    watermark = _load_watermark() if incremental else None
+
+    if watermark is None:
+        # ✅ IMPORTANT: avoid fg.read() (it selects the broken feature name)
+        df = read_feature_group(fg, BASE_FEATURES)
+        replace_from = None
+        print("Building training data from scratch")
+    else:
+        replace_from = watermark - pd.Timedelta(days=REVISION_DAYS + max(LABEL_HORIZONS))
+        df = read_feature_group(fg, BASE_FEATURES, start_time=replace_from)
+        print(f"Incremental build: watermark {watermark}, reading rows >= {replace_from} ({len(df)} rows)")
+    current().rows_in = len(df)
+
+    if df.empty:
+        print("No feature rows to process.")
+        return
+
+    last_event_time = pd.to_datetime(df["event_time"], errors="coerce", utc=True).max()
+    df = add_labels(df)
+
+    if replace_from is None and os.path.isdir(TRAIN_DATA_DIR):
+        shutil.rmtree(TRAIN_DATA_DIR)
+    _write_partitions(df, replace_from=replace_from)
+    _save_watermark(last_event_time)
+    current().rows_out = len(df)
+
+    print(f"Saved training data: {TRAIN_DATA_DIR}")
+    print("Rows written:", df.shape)
     print(df.tail())
 
+
 if __name__ == "__main__":
-    create_training_data()
+    parser = argparse.ArgumentParser(description="Build the training dataset.")
+    parser.add_argument("--full", action="store_true", help="ignore the watermark and rebuild everything")
+    args = parser.parse_args()
+
+    create_training_data(incremental=not args.full)
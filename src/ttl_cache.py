@@ -0,0 +1,44 @@
+# src/ttl_cache.py
+"""
+Process-wide TTL cache for the dashboard's small read-path tables.
+
+    _cache = TTLCache(load_latest_forecast, CACHE_TTL_S)
+    df = _cache.get()          # loader runs at most once per ttl_s
+    _cache.put(df)             # publish a fresh value without re-reading
+    _cache.invalidate()
+
+One instance is shared by every Streamlit session in the process. Callers
+always get a copy, so mutating the returned frame never touches the cache.
+"""
+import threading
+import time
+from typing import Callable
+
+import pandas as pd
+
+
+class TTLCache:
+    def __init__(self, loader: Callable[[], pd.DataFrame], ttl_s: float):
+        self.loader = loader
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._cached: tuple[float, pd.DataFrame] | None = None
+
+    def get(self, ttl_s: float | None = None) -> pd.DataFrame:
+        """Cached value; re-loaded once it is older than `ttl_s` (default: the cache's TTL)."""
+        ttl_s = self.ttl_s if ttl_s is None else ttl_s
+        with self._lock:
+            if self._cached is not None and time.monotonic() - self._cached[0] < ttl_s:
+                return self._cached[1].copy()
+
+        df = self.loader()
+        self.put(df)
+        return df.copy()
+
+    def put(self, df: pd.DataFrame):
+        with self._lock:
+            self._cached = (time.monotonic(), df)
+
+    def invalidate(self):
+        with self._lock:
+            self._cached = None
@@ -0,0 +1,183 @@
+# src/tune.py
+"""
+Walk-forward hyperparameter search for the per-horizon XGBoost models.
+
+    python -m src.tune --trials 30 --workers 4
+
+Each (horizon, trial, fold) is scored in a separate process. Folds are
+time-ordered (TimeSeriesSplit), so a fold never trains on rows after the
+ones it is scored on. Every fit uses early stopping on the tail of its own
+training window, so no boosting rounds are wasted. The feature/label
+matrices are written once to artifacts/tune_cache/ and memory-mapped by
+the workers, which keep one DMatrix per fold across trials.
+
+The best config per model goes to artifacts/best_params.json, which
+train_and_register() picks up automatically.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from src.train import ARTIFACT_DIR, LABELS, BEST_PARAMS_PATH, _prep_df
+from src.training_dataset import load_training_data
+
+CACHE_DIR = os.path.join(ARTIFACT_DIR, "tune_cache")
+
+# model name -> label column it predicts
+TUNED_MODELS = {
+    "aqi_xgb_day1": "label_aqi_day1",
+    "aqi_xgb_day2": "label_aqi_day2",
+    "aqi_xgb_day3": "label_aqi_day3",
+}
+
+N_FOLDS = 4
+N_TRIALS = 20
+MAX_ROUNDS = 2000
+EARLY_STOPPING_ROUNDS = 50
+EARLY_STOPPING_FRACTION = 0.15  # tail of each fold's training window
+
+# labels are aqi shifted by up to 3 days: a row's target lies MAX_HORIZON rows
+# ahead, so that many rows separate fit / early-stopping / validation slices
+MAX_HORIZON = 3
+
+
+def _sample_params(rng: np.random.Generator) -> dict:
+    return {
+        "max_depth": int(rng.integers(3, 9)),
+        "learning_rate": float(np.exp(rng.uniform(np.log(0.02), np.log(0.2)))),
+        "subsample": float(rng.uniform(0.6, 1.0)),
+        "colsample_bytree": float(rng.uniform(0.6, 1.0)),
+        "min_child_weight": float(rng.integers(1, 11)),
+        "reg_lambda": float(np.exp(rng.uniform(np.log(0.1), np.log(10.0)))),
+    }
+
+
+def _write_cache(df: pd.DataFrame, n_folds: int) -> list[dict]:
+    """
+    Dump X / y as .npy once and return the walk-forward fold index ranges.
+    Rows are one day each, so a MAX_HORIZON-row gap keeps every fit label
+    before the early-stopping slice and every training label before the
+    validation fold (calendar holes only widen the gap).
+    """
+    from sklearn.model_selection import TimeSeriesSplit
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    X = df.drop(columns=["event_time"] + LABELS).to_numpy(dtype=np.float32)
+    np.save(os.path.join(CACHE_DIR, "X.npy"), X)
+    for lab in LABELS:
+        np.save(os.path.join(CACHE_DIR, f"{lab}.npy"), df[lab].to_numpy(dtype=np.float32))
+
+    folds = []
+    for train_idx, val_idx in TimeSeriesSplit(n_splits=n_folds, gap=MAX_HORIZON).split(X):
+        end = int(train_idx[-1]) + 1
+        n_es = max(1, int(len(train_idx) * EARLY_STOPPING_FRACTION))
+        folds.append(
+            {
+                "fit": [int(train_idx[0]), end - n_es - MAX_HORIZON],
+                "es": [end - n_es, end],
+                "val": [int(val_idx[0]), int(val_idx[-1]) + 1],
+            }
+        )
+    return folds
+
+
+@lru_cache(maxsize=None)
+def _fold_matrices(cache_dir: str, label: str, fit: tuple, es: tuple, val: tuple):
+    """Per-process cache: each worker builds a fold's DMatrix once, whatever the trial."""
+    import xgboost as xgb
+
+    X = np.load(os.path.join(cache_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(cache_dir, f"{label}.npy"), mmap_mode="r")
+    dfit = xgb.DMatrix(X[fit[0]:fit[1]], label=y[fit[0]:fit[1]])
+    des = xgb.DMatrix(X[es[0]:es[1]], label=y[es[0]:es[1]])
+    dval = xgb.DMatrix(X[val[0]:val[1]])
+    return dfit, des, dval, np.asarray(y[val[0]:val[1]])
+
+
+def _run_fold(task: tuple) -> tuple:
+    """Fit one (model, trial, fold) with early stopping; return its validation RMSE."""
+    import xgboost as xgb
+
+    model_name, label, trial, params, fold_no, fold, nthread = task
+    dfit, des, dval, y_val = _fold_matrices(
+        CACHE_DIR, label, tuple(fold["fit"]), tuple(fold["es"]), tuple(fold["val"])
+    )
+
+    booster = xgb.train(
+        {**params, "objective": "reg:squarederror", "nthread": nthread, "seed": 42},
+        dfit,
+        num_boost_round=MAX_ROUNDS,
+        evals=[(des, "es")],
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        verbose_eval=False,
+    )
+    pred = booster.predict(dval, iteration_range=(0, booster.best_iteration + 1))
+    val_rmse = float(np.sqrt(np.mean((pred - y_val) ** 2)))
+    return model_name, trial, fold_no, val_rmse, int(booster.best_iteration) + 1
+
+
+def tune(n_trials: int = N_TRIALS, n_folds: int = N_FOLDS, workers: int | None = None, seed: int = 42) -> dict:
+    workers = workers or (os.cpu_count() or 1)
+
+    df = _prep_df(load_training_data())
+    if len(df) < (n_folds + 1) * (10 + 2 * MAX_HORIZON):
+        raise RuntimeError(f"Too few rows for {n_folds}-fold walk-forward CV: {len(df)}.")
+
+    folds = _write_cache(df, n_folds)
+
+    rng = np.random.default_rng(seed)
+    trials = [_sample_params(rng) for _ in range(n_trials)]
+
+    tasks = [
+        (model_name, label, t, params, k, fold, 1)
+        for model_name, label in TUNED_MODELS.items()
+        for t, params in enumerate(trials)
+        for k, fold in enumerate(folds)
+    ]
+    print(f"Tuning {len(TUNED_MODELS)} models x {n_trials} trials x {n_folds} folds "
+          f"= {len(tasks)} fits on {workers} processes")
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # one chunk = every fold of one (model, trial); workers keep fold matrices across chunks
+        results = list(pool.map(_run_fold, tasks, chunksize=max(1, n_folds)))
+    print(f"⏱️ Search finished in {time.perf_counter() - t0:.1f}s")
+
+    res = pd.DataFrame(results, columns=["model", "trial", "fold", "val_rmse", "best_rounds"])
+    summary = res.groupby(["model", "trial"]).agg(
+        cv_rmse=("val_rmse", "mean"), n_estimators=("best_rounds", "mean")
+    )
+
+    best = {}
+    for model_name in TUNED_MODELS:
+        row = summary.loc[model_name].sort_values("cv_rmse").iloc[0]
+        trial = int(row.name)
+        best[model_name] = {
+            **trials[trial],
+            "n_estimators": int(round(row["n_estimators"])),
+            "cv_rmse": float(row["cv_rmse"]),
+        }
+        print(f"✅ {model_name}: cv_rmse={row['cv_rmse']:.3f} params={best[model_name]}")
+
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    with open(BEST_PARAMS_PATH, "w") as f:
+        json.dump(best, f, indent=2)
+    print(f"✅ Saved best params: {BEST_PARAMS_PATH}")
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward CV hyperparameter search.")
+    parser.add_argument("--trials", type=int, default=N_TRIALS)
+    parser.add_argument("--folds", type=int, default=N_FOLDS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tune(n_trials=args.trials, n_folds=args.folds, workers=args.workers, seed=args.seed)
@@ -0,0 +1,207 @@
+# src/walk_forward.py
+"""
+Walk-forward simulation of daily retraining.
+
+    python -m src.walk_forward --days 180 --workers 4
+    python -m src.walk_forward --days 180 --mode cold   # from-scratch fit every step, for comparison
+
+For every simulated day t (the last --days rows of the training dataset)
+and every horizon model: train on the rows whose label was already known
+on day t (event_time + h <= t), predict t's label, advance one day.
+
+Warm mode keeps each step's booster and continues it on the next step's
+data with ROUNDS_PER_STEP extra trees (xgb.train(..., xgb_model=booster))
+instead of refitting n_estimators trees. Every REFIT_EVERY steps the
+chain restarts from a full fit, which bounds model growth and splits the
+simulation into independent segments; segments x horizons run in
+separate processes over memory-mapped X / y.
+
+Per-step rows (prediction, actual, training rows, trees, fit time) go to
+artifacts/walk_forward/steps.csv, per-model MAE / RMSE / fit time to
+artifacts/walk_forward/summary.json.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.metrics import current, instrumented
+from src.train import ARTIFACT_DIR, LABELS, _prep_df, _xgb_params
+from src.training_dataset import load_training_data
+
+OUT_DIR = os.path.join(ARTIFACT_DIR, "walk_forward")
+CACHE_DIR = os.path.join(OUT_DIR, "cache")
+STEPS_PATH = os.path.join(OUT_DIR, "steps.csv")
+SUMMARY_PATH = os.path.join(OUT_DIR, "summary.json")
+
+# model name -> (label column, horizon in days)
+SIMULATED_MODELS = {
+    "aqi_xgb_day1": ("label_aqi_day1", 1),
+    "aqi_xgb_day2": ("label_aqi_day2", 2),
+    "aqi_xgb_day3": ("label_aqi_day3", 3),
+}
+
+SIM_DAYS = 180
+REFIT_EVERY = 30
+ROUNDS_PER_STEP = 10
+MIN_TRAIN_ROWS = 30
+
+STEP_COLUMNS = [
+    "model_name", "horizon", "event_time", "segment", "warm",
+    "train_rows", "n_trees", "fit_seconds", "predicted_aqi", "actual_aqi",
+]
+
+
+def _booster_params(model_name: str, nthread: int) -> tuple[dict, int]:
+    """xgb.train params + full-fit rounds from the XGBRegressor config train.py uses."""
+    params = _xgb_params(model_name)
+    rounds = int(params.pop("n_estimators"))
+    return {**params, "objective": "reg:squarederror", "nthread": nthread, "seed": 42}, rounds
+
+
+def _write_cache(df: pd.DataFrame) -> np.ndarray:
+    """Dump X / labels / day numbers as .npy for the workers; returns the day numbers."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    X = df.drop(columns=["event_time"] + LABELS).to_numpy(dtype=np.float32)
+    days = pd.to_datetime(df["event_time"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+    np.save(os.path.join(CACHE_DIR, "X.npy"), X)
+    np.save(os.path.join(CACHE_DIR, "days.npy"), days)
+    for lab in LABELS:
+        np.save(os.path.join(CACHE_DIR, f"{lab}.npy"), df[lab].to_numpy(dtype=np.float32))
+    return days
+
+
+def _run_segment(task: tuple) -> list[tuple]:
+    """Walk one model through consecutive steps, warm-starting each step from the previous booster."""
+    import xgboost as xgb
+
+    model_name, label, horizon, segment, steps, mode, rounds_per_step, nthread = task
+    params, full_rounds = _booster_params(model_name, nthread)
+
+    X = np.load(os.path.join(CACHE_DIR, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(CACHE_DIR, f"{label}.npy"), mmap_mode="r")
+    days = np.load(os.path.join(CACHE_DIR, "days.npy"), mmap_mode="r")
+
+    booster, rows = None, []
+    for t in steps:
+        # labels of rows up to day t - h are realized by day t
+        end = int(np.searchsorted(days, days[t] - horizon, side="right"))
+        if end < MIN_TRAIN_ROWS:
+            continue
+        dtrain = xgb.DMatrix(X[:end], label=y[:end])
+
+        warm = mode == "warm" and booster is not None
+        t0 = time.perf_counter()
+        if warm:
+            booster = xgb.train(params, dtrain, num_boost_round=rounds_per_step, xgb_model=booster)
+        else:
+            booster = xgb.train(params, dtrain, num_boost_round=full_rounds)
+        elapsed = time.perf_counter() - t0
+
+        pred = float(booster.inplace_predict(X[t:t + 1])[0])
+        rows.append((
+            model_name, horizon, int(days[t]), segment, warm,
+            end, booster.num_boosted_rounds(), round(elapsed, 4), pred, float(y[t]),
+        ))
+    return rows
+
+
+def _summarize(steps: pd.DataFrame) -> dict:
+    err = steps["predicted_aqi"] - steps["actual_aqi"]
+    g = steps.assign(abs_err=err.abs(), sq_err=err ** 2).groupby("model_name")
+    summary = pd.DataFrame({
+        "steps": g.size(),
+        "mae": g["abs_err"].mean(),
+        "rmse": np.sqrt(g["sq_err"].mean()),
+        "fit_seconds_total": g["fit_seconds"].sum(),
+        "fit_seconds_mean": g["fit_seconds"].mean(),
+        "max_trees": g["n_trees"].max(),
+    })
+    return summary.to_dict(orient="index")
+
+
+@instrumented("walk_forward")
+def walk_forward(
+    days: int = SIM_DAYS,
+    mode: str = "warm",
+    refit_every: int = REFIT_EVERY,
+    rounds_per_step: int = ROUNDS_PER_STEP,
+    workers: int | None = None,
+) -> pd.DataFrame:
+    if mode not in ("warm", "cold"):
+        raise ValueError(f"Unknown mode {mode!r}; expected 'warm' or 'cold'.")
+    workers = workers or (os.cpu_count() or 1)
+
+    df = _prep_df(load_training_data()).sort_values("event_time", kind="stable").reset_index(drop=True)
+    day_numbers = _write_cache(df)
+    current().rows_in = len(df)
+
+    first = max(0, len(df) - days)
+    steps = np.arange(first, len(df))
+    if len(steps) == 0:
+        raise RuntimeError("No rows to simulate.")
+
+    # a segment restarts from a full fit, so segments are independent tasks
+    seg_len = max(1, refit_every)
+    segments = [steps[i:i + seg_len].tolist() for i in range(0, len(steps), seg_len)]
+    tasks = [
+        (model_name, label, horizon, k, seg, mode, rounds_per_step, 1)
+        for model_name, (label, horizon) in SIMULATED_MODELS.items()
+        for k, seg in enumerate(segments)
+    ]
+    start_day = pd.Timestamp(int(day_numbers[first]), unit="D").date()
+    print(f"Walk-forward ({mode}): {len(steps)} day(s) from {start_day} x {len(SIMULATED_MODELS)} model(s), "
+          f"{len(segments)} segment(s) of <= {seg_len} step(s) on {workers} process(es)")
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = [row for rows in pool.map(_run_segment, tasks) for row in rows]
+    wall = time.perf_counter() - t0
+
+    out = pd.DataFrame(results, columns=STEP_COLUMNS)
+    out["event_time"] = pd.to_datetime(out["event_time"], unit="D", utc=True)
+    out = out.sort_values(["model_name", "event_time"]).reset_index(drop=True)
+    current().rows_out = len(out)
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    out.to_csv(STEPS_PATH, index=False)
+    summary = {
+        "mode": mode,
+        "days": int(len(steps)),
+        "refit_every": refit_every,
+        "rounds_per_step": rounds_per_step,
+        "workers": workers,
+        "wall_seconds": round(wall, 3),
+        "models": _summarize(out) if len(out) else {},
+    }
+    with open(SUMMARY_PATH, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"⏱️ Simulation finished in {wall:.1f}s")
+    for name, m in summary["models"].items():
+        print(f"  {name:<14} mae={m['mae']:.3f} rmse={m['rmse']:.3f} "
+              f"fit={m['fit_seconds_total']:.1f}s ({m['fit_seconds_mean'] * 1000:.0f} ms/step)")
+    print(f"✅ Saved per-step metrics: {STEPS_PATH}")
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward simulation of daily retraining.")
+    parser.add_argument("--days", type=int, default=SIM_DAYS, help="number of most recent days to simulate")
+    parser.add_argument("--mode", choices=["warm", "cold"], default="warm")
+    parser.add_argument("--refit-every", type=int, default=REFIT_EVERY, help="steps per warm-start chain")
+    parser.add_argument("--rounds-per-step", type=int, default=ROUNDS_PER_STEP)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    walk_forward(
+        days=args.days,
+        mode=args.mode,
+        refit_every=args.refit_every,
+        rounds_per_step=args.rounds_per_step,
+        workers=args.workers,
+    )
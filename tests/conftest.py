@@ -0,0 +1,17 @@
+# tests/conftest.py
+import os
+
+import pytest
+
+from src import metrics
+
+
+@pytest.fixture(autouse=True)
+def _metrics_dir(tmp_path, monkeypatch):
+    """Stage metrics written during a test go to its tmp dir, not artifacts/."""
+    out = tmp_path / "metrics"
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(out))
+    monkeypatch.setattr(metrics, "JSONL_PATH", os.path.join(out, "stages.jsonl"))
+    monkeypatch.setattr(metrics, "PROM_PATH", os.path.join(out, "aqi_pipeline.prom"))
+    monkeypatch.setattr(metrics, "LATEST_PATH", os.path.join(out, "latest.json"))
+    monkeypatch.setattr(metrics, "LOCK_PATH", os.path.join(out, "metrics.lock"))
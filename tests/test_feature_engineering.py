@@ -0,0 +1,69 @@
+# tests/test_feature_engineering.py
+"""Parity of the NumPy aggregation path with the pandas reference."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.feature_engineering import (
+    _DAILY_COLUMNS,
+    hourly_to_daily_features,
+    hourly_to_daily_features_fast,
+    hourly_to_daily_features_many,
+)
+
+
+def _payload(start: str, days: int, seed: int, gaps: float = 0.1) -> dict:
+    """Open-Meteo-like hourly payload with random None gaps."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=24 * days, freq="h")
+    hourly = {"time": times.strftime("%Y-%m-%dT%H:%M").tolist()}
+    for k in _DAILY_COLUMNS:
+        values = rng.uniform(0, 120, len(times)).round(1)
+        hourly[k] = [None if rng.random() < gaps else float(v) for v in values]
+    return hourly
+
+
+def _payloads() -> dict:
+    payloads = {
+        "24.8600_67.0000": _payload("2024-02-25", 10, seed=1),  # crosses a leap day
+        "31.5200_74.3500": _payload("2024-03-01", 5, seed=2, gaps=0.5),
+        "33.6800_73.0500": _payload("2023-12-30", 4, seed=3),
+    }
+    # a day with no AQI at all, and a pollutant missing for a whole day
+    loc = payloads["31.5200_74.3500"]
+    loc["european_aqi"][24:48] = [None] * 24
+    loc["ozone"][48:72] = [None] * 24
+    # a variable the API returned no values for
+    sparse = payloads["33.6800_73.0500"]
+    sparse["sulphur_dioxide"] = [None] * len(sparse["time"])
+    return payloads
+
+
+@pytest.fixture
+def payloads() -> dict:
+    return _payloads()
+
+
+def test_many_matches_reference_per_location(payloads):
+    many = hourly_to_daily_features_many(payloads)
+
+    assert list(many["location_id"].cat.categories) == list(payloads)
+    for loc, hourly in payloads.items():
+        got = many[many["location_id"] == loc].drop(columns="location_id").reset_index(drop=True)
+        pd.testing.assert_frame_equal(got, hourly_to_daily_features(hourly), check_exact=False, rtol=1e-6)
+
+
+def test_fast_matches_reference(payloads):
+    for hourly in payloads.values():
+        pd.testing.assert_frame_equal(
+            hourly_to_daily_features_fast(hourly), hourly_to_daily_features(hourly), check_exact=False, rtol=1e-6
+        )
+
+
+def test_unordered_hours(payloads):
+    hourly = payloads["24.8600_67.0000"]
+    order = np.random.default_rng(0).permutation(len(hourly["time"]))
+    shuffled = {k: [v[i] for i in order] for k, v in hourly.items()}
+
+    got = hourly_to_daily_features_many({"x": shuffled}).drop(columns="location_id")
+    pd.testing.assert_frame_equal(got, hourly_to_daily_features(hourly), check_exact=False, rtol=1e-6)
@@ -0,0 +1,100 @@
+# tests/test_fg_writer.py
+"""Coalescing, failure propagation and job polling of the shared writer."""
+import pandas as pd
+import pytest
+
+from src import fg_writer
+from src.fg_writer import FeatureGroupWriter, wait_for_materialization
+from src.local_store import LocalFeatureStore
+
+
+@pytest.fixture
+def fg(tmp_path):
+    return LocalFeatureStore(str(tmp_path)).get_or_create_feature_group(
+        name="t", version=1, primary_key=["location_id", "event_time"], event_time="event_time"
+    )
+
+
+def _frame(loc: str, value: float, days: int = 5) -> pd.DataFrame:
+    return pd.DataFrame({
+        "location_id": loc,
+        "event_time": pd.date_range("2024-01-01", periods=days, freq="D", tz="UTC"),
+        "aqi_daily": value,
+    })
+
+
+def test_flush_coalesces_queued_frames_into_one_insert(fg, monkeypatch):
+    inserts = []
+    real_insert = fg.insert
+    monkeypatch.setattr(fg, "insert", lambda df, **kw: inserts.append(len(df)) or real_insert(df, **kw))
+
+    writer = FeatureGroupWriter(coalesce_window_s=0.1)
+    futures = [
+        writer.submit(fg, _frame("a", 1.0)),
+        writer.submit(fg, _frame("b", 2.0)),
+        writer.submit(fg, _frame("a", 3.0)),  # same keys as the first: later frame wins
+    ]
+    writer.flush(timeout=10)
+
+    assert inserts == [10]
+    assert [f.result() for f in futures] == [10, 10, 10]
+    out = fg.read().sort_values(["location_id", "event_time"])
+    assert out.groupby("location_id")["aqi_daily"].unique().map(list).to_dict() == {"a": [3.0], "b": [2.0]}
+
+
+def test_insert_failure_reaches_every_caller(fg, monkeypatch):
+    def broken(df, **kwargs):
+        raise ValueError("schema mismatch")
+
+    monkeypatch.setattr(fg, "insert", broken)
+    writer = FeatureGroupWriter(coalesce_window_s=0.05)
+    futures = [writer.submit(fg, _frame("a", 1.0)), writer.submit(fg, _frame("b", 2.0))]
+
+    for f in futures:
+        with pytest.raises(ValueError, match="schema mismatch"):
+            f.result(timeout=10)
+    with pytest.raises(ValueError):
+        writer.flush(timeout=10)
+
+    # the writer keeps working after a failed round
+    monkeypatch.undo()
+    assert writer.submit(fg, _frame("c", 1.0)).result(timeout=10) == 5
+    writer.flush(timeout=10)  # the failure was reported once
+
+
+class _Job:
+    def __init__(self, states: list[str]):
+        self.states = list(states)
+        self.polls = 0
+
+    def get_state(self):
+        self.polls += 1
+        return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+
+    def get_final_state(self):
+        return self.states[-1]
+
+
+def test_waits_for_the_inserts_own_job_not_the_previous_one(monkeypatch):
+    monkeypatch.setattr(fg_writer, "POLL_BACKOFF", 1.0)
+
+    class FG:
+        materialization_job = _Job(["SUCCEEDED"])  # the previous run, already finished
+
+    job = _Job(["RUNNING", "RUNNING", "SUCCEEDED"])
+    wait_for_materialization(FG, job=job, initial_poll_s=0.01)
+
+    assert job.polls == 3
+    assert FG.materialization_job.polls == 0
+
+
+def test_without_a_handle_the_first_poll_waits(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(fg_writer.time, "sleep", sleeps.append)
+
+    class FG:
+        materialization_job = _Job(["SUCCEEDED"])
+
+    wait_for_materialization(FG, initial_poll_s=2.0)
+    assert sleeps[0] == 2.0
+    assert FG.materialization_job.polls == 1
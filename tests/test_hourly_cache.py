@@ -0,0 +1,110 @@
+# tests/test_hourly_cache.py
+"""Concurrent writes, lookups and eviction of the on-disk hourly cache."""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from src import hourly_cache
+
+VARS = "european_aqi,pm10"
+LAT, LON = 24.86, 67.0
+
+
+def _payload(start: str, days: int) -> dict:
+    times = pd.date_range(start, periods=24 * days, freq="h")
+    return {
+        "time": times.strftime("%Y-%m-%dT%H:%M").tolist(),
+        "european_aqi": [float(i % 97) for i in range(len(times))],
+        "pm10": [float(i % 13) for i in range(len(times))],
+    }
+
+
+def _files(root) -> list[str]:
+    return [os.path.join(r, f) for r, _, fs in os.walk(root) for f in fs]
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(hourly_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(hourly_cache, "_evict_state", {"written": 0, "last": 0.0})
+    return tmp_path
+
+
+def test_concurrent_writers_lookups_and_evictions(cache_dir):
+    payload = _payload("2024-01-01", 30)
+
+    def work(i: int):
+        if i % 3 == 0:
+            hourly_cache.store_hourly(LAT, LON, payload, VARS)
+        elif i % 3 == 1:
+            hourly_cache.missing_range(LAT, LON, "2024-01-01", "2024-01-30", VARS)
+        else:
+            hourly_cache.evict(max_bytes=0)  # everything is inside the grace period
+        return i
+
+    with ThreadPoolExecutor(16) as pool:
+        assert len(list(pool.map(work, range(300)))) == 300
+
+    files = _files(cache_dir)
+    assert not [f for f in files if f.endswith(".tmp")]
+    assert len(files) == 30
+    assert hourly_cache.missing_range(LAT, LON, "2024-01-01", "2024-01-30", VARS) is None
+
+
+def test_concurrent_evictions_remove_each_file_once(cache_dir):
+    hourly_cache.store_hourly(LAT, LON, _payload("2024-01-01", 30), VARS)
+    for f in _files(cache_dir):
+        os.utime(f, (1, 1))
+
+    with ThreadPoolExecutor(16) as pool:
+        removed = sum(pool.map(lambda _: hourly_cache.evict(max_bytes=0), range(40)))
+
+    assert removed == 30
+    assert _files(cache_dir) == []
+
+
+def test_days_of_an_inflight_request_survive_size_pressure(cache_dir):
+    hourly_cache.store_hourly(LAT, LON, _payload("2024-01-01", 30), VARS)
+    for f in _files(cache_dir):
+        os.utime(f, (1, 1))  # least recently used
+
+    calls = []
+
+    def fetch_raw(lat, lon, start_date, end_date):
+        calls.append((start_date, end_date))
+        days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+        # another request evicts under size pressure while this one is fetching
+        hourly_cache.evict(max_bytes=0)
+        return {"hourly": _payload(start_date, days)}
+
+    hourly = hourly_cache.get_hourly(LAT, LON, "2024-01-01", "2024-02-15", VARS, fetch_raw)
+
+    assert calls == [("2024-01-31", "2024-02-15")]
+    assert len(hourly["time"]) == 46 * 24
+    assert hourly["time"] == sorted(hourly["time"])
+
+
+def test_orphaned_temp_files_are_evicted(cache_dir):
+    hourly_cache.store_hourly(LAT, LON, _payload("2024-01-01", 2), VARS)
+    orphan = cache_dir / "crashed.parquet.tmp"
+    orphan.write_bytes(b"partial")
+    os.utime(orphan, (1, 1))
+
+    assert hourly_cache.evict() == 1
+    assert not orphan.exists()
+    assert len(_files(cache_dir)) == 2
+
+
+def test_eviction_is_throttled(cache_dir, monkeypatch):
+    runs = []
+    monkeypatch.setattr(hourly_cache, "evict", lambda: runs.append(1) or 0)
+
+    hourly_cache.maybe_evict()  # nothing written yet
+    hourly_cache.store_hourly(LAT, LON, _payload("2024-01-01", 2), VARS)
+    hourly_cache.maybe_evict()  # first run: interval elapsed
+    hourly_cache.store_hourly(LAT, LON, _payload("2024-01-03", 2), VARS)
+    hourly_cache.maybe_evict()  # small write within EVICT_INTERVAL_S
+
+    assert runs == [1]
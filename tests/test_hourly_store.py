@@ -0,0 +1,31 @@
+# tests/test_hourly_store.py
+"""Month files keep NaN as values, so reads are zero-copy views of the mapped file."""
+import numpy as np
+import pandas as pd
+
+from src import hourly_store
+
+
+def _hourly(start: str, hours: int) -> dict:
+    times = pd.date_range(start, periods=hours, freq="h")
+    payload = {"time": times.strftime("%Y-%m-%dT%H:%M").tolist()}
+    for j, v in enumerate(hourly_store.VARS):
+        payload[v] = [None if i % 5 == j % 5 else float(i + j) for i in range(hours)]
+    return payload
+
+
+def test_missing_hours_are_stored_as_nan_not_null(tmp_path):
+    loc = "24.8600,67.0000"
+    hourly_store.write_hourly(loc, _hourly("2024-01-31T00:00", 48), root=str(tmp_path))
+    hourly_store.write_hourly(loc, _hourly("2024-02-01T12:00", 24), root=str(tmp_path))  # upsert
+
+    for month in ("2024-01", "2024-02"):
+        table = hourly_store._read_table(hourly_store._month_path(loc, month, str(tmp_path)))
+        for v in hourly_store.VARS:
+            assert table.column(v).null_count == 0
+            table.column(v).chunk(0).to_numpy(zero_copy_only=True)  # raises if a copy is needed
+
+    times, values = hourly_store.read_series(loc, root=str(tmp_path))
+    assert len(times) == 48 + 12
+    assert np.isnan(values[0, 0]) and values[1, 0] == 1.0
+    assert values.dtype == np.float32
@@ -0,0 +1,75 @@
+# tests/test_jobs.py
+"""Single-flight job submission."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.jobs import JobManager
+
+
+def _wait(job, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not job.done:
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.005)
+    return job
+
+
+def test_concurrent_submits_of_one_key_run_once_and_share_the_outcome():
+    manager = JobManager(max_threads=4)
+    calls = []
+    release = threading.Event()
+
+    def work(progress):
+        calls.append(1)
+        release.wait(5)
+        return "forecast"
+
+    barrier = threading.Barrier(8)
+
+    def submit(_):
+        barrier.wait()
+        return manager.submit("batch_inference", work)
+
+    with ThreadPoolExecutor(8) as pool:
+        jobs = list(pool.map(submit, range(8)))
+    release.set()
+
+    assert len({j.id for j in jobs}) == 1
+    for job in jobs:
+        _wait(job)
+        assert job.status == "succeeded"
+        assert job.result == "forecast"
+        assert job.finished_at is not None
+    assert calls == [1]
+
+
+def test_failure_is_shared_and_the_key_can_run_again():
+    manager = JobManager(max_threads=2)
+    release = threading.Event()
+
+    def boom(progress):
+        release.wait(5)
+        raise ValueError("fetch failed")
+
+    first, second = manager.submit("k", boom), manager.submit("k", boom)
+    release.set()
+
+    assert first is second
+    _wait(first)
+    assert first.status == "failed"
+    assert "fetch failed" in first.error
+
+    again = manager.submit("k", lambda progress: 1)
+    assert again is not first
+    assert _wait(again).status == "succeeded"
+
+
+def test_finished_job_is_never_reused_or_seen_without_finished_at():
+    manager = JobManager(max_threads=2)
+    for _ in range(200):
+        job = manager.submit("k", lambda progress: None)
+        while not job.done:
+            pass
+        assert job.finished_at is not None
+        assert manager.submit("k", lambda progress: None) is not job
@@ -0,0 +1,91 @@
+# tests/test_lag_features.py
+"""Incremental lag / rolling updates equal the full recompute, day by day."""
+import pandas as pd
+import pytest
+
+from src import lag_features as lf
+from src.feature_engineering import hourly_to_daily_features_many
+from src.synthetic import synthetic_hourly, synthetic_locations
+from src.training_dataset import REVISION_DAYS
+
+# calendar days with no stored row (an outage), per location index
+GAPS = {
+    0: ["2024-01-10", "2024-01-20", "2024-01-21", "2024-01-22"],
+    1: ["2024-02-01", "2024-02-02", "2024-02-03", "2024-02-04", "2024-02-05", "2024-02-06",
+        "2024-02-07", "2024-02-08", "2024-02-09"],  # longer than every window
+}
+
+
+@pytest.fixture(scope="module")
+def daily() -> pd.DataFrame:
+    payloads = {
+        f"{lat:.4f}_{lon:.4f}": synthetic_hourly(lat, lon, "2024-01-01", "2024-02-29")
+        for lat, lon in synthetic_locations(2, seed=7)
+    }
+    df = hourly_to_daily_features_many(payloads)
+    df["location_id"] = df["location_id"].astype(str)
+    locs = sorted(df["location_id"].unique())
+    day = df["event_time"].dt.strftime("%Y-%m-%d")
+    gap = pd.Series(False, index=df.index)
+    for i, days in GAPS.items():
+        gap |= (df["location_id"] == locs[i]) & day.isin(days)
+    return df[~gap].reset_index(drop=True)
+
+
+def _assert_matches(expected: pd.DataFrame, actual: pd.DataFrame):
+    keys = ["location_id", "event_time"]
+    expected = expected.merge(actual[keys], on=keys)
+    assert len(expected) == len(actual)
+    assert lf.compare(expected, actual) == []
+
+
+def test_each_update_matches_the_full_recompute_of_the_history_so_far(daily):
+    state = {}
+    for d in sorted(daily["event_time"].unique()):
+        seen = daily[daily["event_time"] <= d]
+        # every run re-sends the last REVISION_DAYS days, like the daily upload
+        batch = seen[seen["event_time"] > d - pd.Timedelta(days=REVISION_DAYS)]
+
+        _assert_matches(lf.full_lag_features(seen), lf.update_state(state, batch))
+
+
+def test_gap_days_give_nan_lags_and_windows(daily):
+    feats = lf.full_lag_features(daily)
+    loc = sorted(daily["location_id"].unique())[0]
+    after = feats[(feats["location_id"] == loc) & (feats["event_time"] == pd.Timestamp("2024-01-23", tz="UTC"))]
+
+    assert after["aqi_lag_1"].isna().all()  # 2024-01-22 is missing
+    assert after[["aqi_lag_2", "aqi_lag_3"]].isna().all(axis=None)
+    assert after["aqi_lag_4"].notna().all()
+    assert after["aqi_daily_roll3_mean"].isna().all()
+    assert len(lf.replay(daily)) == len(feats)
+    assert lf.compare(feats, lf.replay(daily)) == []
+
+
+def test_revised_day_is_propagated_to_every_window_containing_it(daily):
+    cut = pd.Timestamp("2024-02-15", tz="UTC")
+    state = lf.seed_state(daily[daily["event_time"] <= cut])
+
+    revised = daily.copy()
+    revised.loc[revised["event_time"] == cut - pd.Timedelta(days=1), "aqi_daily"] += 50.0
+    batch = revised[revised["event_time"] > cut - pd.Timedelta(days=REVISION_DAYS)]
+    batch = batch[batch["event_time"] <= cut + pd.Timedelta(days=5)]
+
+    out = lf.update_state(state, batch)
+    _assert_matches(lf.full_lag_features(revised[revised["event_time"] <= cut + pd.Timedelta(days=5)]), out)
+
+
+def test_state_survives_a_save_load_round_trip(daily, tmp_path):
+    cut = pd.Timestamp("2024-02-10", tz="UTC")  # right after location 1's outage
+    path = str(tmp_path / "lag_state.json")
+    lf.save_state(lf.seed_state(daily[daily["event_time"] <= cut]), path)
+
+    state = lf.load_state(path)
+    batch = daily[daily["event_time"] > cut - pd.Timedelta(days=REVISION_DAYS)]
+    _assert_matches(lf.full_lag_features(daily), lf.update_state(state, batch))
+
+
+def test_rows_older_than_the_state_are_rejected(daily):
+    state = lf.seed_state(daily)
+    with pytest.raises(ValueError, match="--full"):
+        lf.update_state(state, daily[daily["event_time"] < pd.Timestamp("2024-01-05", tz="UTC")])
@@ -0,0 +1,43 @@
+# tests/test_local_store.py
+"""Concurrent writers of the local feature store / model registry."""
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from src.local_store import LocalFeatureStore, LocalModelRegistry
+
+
+def _fg(root):
+    # a new store + handle per call, like storage.get_feature_store()
+    return LocalFeatureStore(str(root)).get_or_create_feature_group(
+        name="t", version=1, primary_key=["location_id", "event_time"], event_time="event_time"
+    )
+
+
+def test_concurrent_upserts_through_separate_handles_keep_every_row(tmp_path):
+    days = pd.date_range("2024-01-01", periods=20, freq="D", tz="UTC")
+
+    def write(i: int):
+        df = pd.DataFrame({"location_id": f"loc{i}", "event_time": days, "aqi_daily": float(i)})
+        _fg(tmp_path).insert(df)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(write, range(40)))
+
+    out = _fg(tmp_path).read()
+    assert len(out) == 40 * 20
+    assert out.groupby("location_id")["aqi_daily"].nunique().eq(1).all()
+
+
+def test_concurrent_model_saves_get_distinct_versions(tmp_path):
+    artifact = tmp_path / "model.joblib"
+    artifact.write_bytes(b"model")
+
+    def save(_):
+        mr = LocalModelRegistry(str(tmp_path))
+        return mr.python.create_model("m").save(str(artifact)).version
+
+    with ThreadPoolExecutor(8) as pool:
+        versions = list(pool.map(save, range(20)))
+
+    assert sorted(versions) == list(range(1, 21))
@@ -0,0 +1,48 @@
+# tests/test_schema.py
+"""The v1 -> v2 feature group migration is safe to run before every upload."""
+import pandas as pd
+import pytest
+
+from src import schema, storage
+from src.local_store import LocalFeatureStore
+
+
+@pytest.fixture
+def fs(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "get_feature_store", lambda: LocalFeatureStore(str(tmp_path)))
+    return LocalFeatureStore(str(tmp_path))
+
+
+def _daily(start: str, days: int, aqi: float) -> pd.DataFrame:
+    event_time = pd.date_range(start, periods=days, freq="D", tz="UTC")
+    df = pd.DataFrame({"event_time": event_time, "weekday": event_time.day_name()})
+    for c in schema.POLLUTANT_COLUMNS:
+        df[c] = aqi
+    return df[schema.DAILY_COLUMNS]
+
+
+def _group(fs, version: int):
+    return fs.get_or_create_feature_group(
+        name=schema.FEATURE_FG_NAME, version=version, primary_key=["event_time"], event_time="event_time"
+    )
+
+
+def test_migrate_without_v1_is_a_noop(fs):
+    schema.migrate_feature_group()
+    assert schema._find_feature_group(fs, schema.FEATURE_FG_VERSION) is None
+
+
+def test_migrate_copies_missing_days_once_and_keeps_newer_v2_rows(fs):
+    _group(fs, schema.LEGACY_FEATURE_FG_VERSION).insert(_daily("2024-01-01", 10, aqi=1.0))
+    # the daily upload already wrote the last 3 days to v2
+    _group(fs, schema.FEATURE_FG_VERSION).insert(schema.enforce_daily_schema(_daily("2024-01-08", 5, aqi=2.0)))
+
+    schema.migrate_feature_group()
+    first = _group(fs, schema.FEATURE_FG_VERSION).read().sort_values("event_time").reset_index(drop=True)
+    schema.migrate_feature_group()
+    second = _group(fs, schema.FEATURE_FG_VERSION).read().sort_values("event_time").reset_index(drop=True)
+
+    assert len(first) == 12
+    assert first["aqi_daily"].tolist() == [1.0] * 7 + [2.0] * 5
+    assert first["weekday"].dtype == "int8"
+    pd.testing.assert_frame_equal(first, second)
@@ -0,0 +1,137 @@
+# tests/test_serve.py
+"""Feature single-flight / cache bounds and micro-batcher fault isolation."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src import data_fetcher, serve
+from src.serve import ForecastService, MicroBatcher, ScoringTimeout
+
+
+class _SumModel:
+    def predict(self, X):
+        return X.sum(axis=1)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(data_fetcher, "_data_source", "synthetic")
+
+    def load_models(self):
+        self._models = [(f"aqi_xgb_day{h}", h, _SumModel(), 1) for h in (1, 2, 3)]
+
+    monkeypatch.setattr(ForecastService, "load_models", load_models)
+    return ForecastService(max_wait_ms=1.0, predict_timeout_s=5.0)
+
+
+@pytest.fixture
+def counted_fetch(monkeypatch):
+    calls = []
+    real = serve.fetch_daily_features
+
+    def fetch(lat, lon, days):
+        calls.append((lat, lon))
+        time.sleep(0.2)  # long enough for every request to miss concurrently
+        return real(lat, lon, days=days)
+
+    monkeypatch.setattr(serve, "fetch_daily_features", fetch)
+    return calls
+
+
+def test_concurrent_misses_for_one_location_share_one_fetch(service, counted_fetch):
+    barrier = threading.Barrier(16)
+
+    def request(_):
+        barrier.wait()
+        return service.predict(24.86, 67.0)
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(request, range(16)))
+
+    assert counted_fetch == [(24.86, 67.0)]
+    assert len({r["forecast"][0]["predicted_aqi"] for r in results}) == 1
+    cache = service.metrics()["feature_cache"]
+    assert (cache["misses"], cache["shared_fetches"]) == (1, 15)
+
+
+def test_failed_fetch_reaches_every_waiter_and_is_retried(service, monkeypatch):
+    calls = []
+
+    def down(lat, lon, days):
+        calls.append(1)
+        time.sleep(0.1)
+        raise OSError("open-meteo down")
+
+    monkeypatch.setattr(serve, "fetch_daily_features", down)
+    barrier = threading.Barrier(4)
+
+    def request(_):
+        barrier.wait()
+        with pytest.raises(OSError):
+            service.features(1.0, 2.0)
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(request, range(4)))
+    assert len(calls) == 1
+
+    with pytest.raises(OSError):
+        service.features(1.0, 2.0)
+    assert len(calls) == 2
+
+
+def test_feature_cache_is_bounded(service, counted_fetch):
+    service.feature_cache_size = 3
+    for i in range(6):
+        service.features(10.0 + i, 20.0)
+    service.features(13.0, 20.0)  # recent: still cached
+
+    assert len(service._features) == 3
+    assert len(counted_fetch) == 6
+    service.features(10.0, 20.0)  # evicted: fetched again
+    assert len(counted_fetch) == 7
+
+
+def test_expired_features_are_dropped_on_insert(service, counted_fetch):
+    service.feature_ttl_s = 0.05
+    service.features(10.0, 20.0)
+    time.sleep(0.1)
+    service.features(11.0, 20.0)
+    assert list(service._features) == [data_fetcher.location_id(11.0, 20.0)]
+
+
+def test_bad_batch_does_not_kill_the_batcher():
+    batcher = MicroBatcher(lambda X: X.sum(axis=1), max_batch=8, max_wait_ms=20.0)
+
+    # rows of different widths cannot be stacked: that batch fails...
+    bad = [batcher.submit(np.ones((1, 3))), batcher.submit(np.ones((1, 4)))]
+    for fut in bad:
+        with pytest.raises(ValueError):
+            fut.result(timeout=5)
+
+    # ...and the next one is still scored
+    assert batcher.submit(np.ones((1, 3))).result(timeout=5) == 3.0
+
+
+def test_failing_predict_fails_only_its_batch():
+    calls = []
+
+    def predict(X):
+        calls.append(len(X))
+        if len(calls) == 1:
+            raise RuntimeError("model crashed")
+        return X.sum(axis=1)
+
+    batcher = MicroBatcher(predict, max_wait_ms=1.0)
+    with pytest.raises(RuntimeError):
+        batcher.submit(np.ones((1, 2))).result(timeout=5)
+    assert batcher.submit(np.ones((1, 2))).result(timeout=5) == 2.0
+
+
+def test_stuck_scorer_times_out(service):
+    service.batcher.predict_fn = lambda X: time.sleep(1) or X.sum(axis=1)
+    service.predict_timeout_s = 0.1
+    with pytest.raises(ScoringTimeout):
+        service.predict(24.86, 67.0)